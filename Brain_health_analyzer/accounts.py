@@ -0,0 +1,194 @@
+"""
+Patient, doctor and caretaker accounts: one repository for the three tables.
+
+Each role is described once in ROLES (table, key column, session key), so
+lookups, password checks and TOTP updates are written once for all of
+them instead of per role. Reads of a single account go through
+identity_cache; get_many() loads a list of accounts in a few IN (...)
+queries. Writes take the cursor of the caller's db.transaction() and
+drop the cached copy once it commits.
+
+Nothing selects *. Every read names a projection: CARD for list rows and
+contact details, PROFILE for the profile page, LOGIN (the only one with
+the password hash, TOTP secret and backup codes) for authentication.
+Lookups run as prepared statements.
+
+The doctor directory (search, a patient's selected doctors) lives here
+too, because doctor changes must invalidate it.
+"""
+
+import json
+from collections import namedtuple
+
+import db
+import identity_cache
+import passwords
+
+Role = namedtuple('Role', 'name table id_column session_key projections')
+
+CARD = 'card'
+PROFILE = 'profile'
+LOGIN = 'login'
+
+ROLES = {
+    'patient': Role('patient', 'patients', 'aadhar_id', 'patient_aadhar', {
+        CARD: ('aadhar_id', 'name', 'email', 'phone', 'blood_group'),
+        PROFILE: ('aadhar_id', 'name', 'email', 'phone', 'date_of_birth', 'address',
+                  'blood_group', 'emergency_contact', 'totp_enabled'),
+        LOGIN: ('aadhar_id', 'name', 'email', 'password', 'totp_enabled', 'totp_secret', 'backup_codes'),
+    }),
+    'doctor': Role('doctor', 'doctors', 'doctor_id', 'doctor_id', {
+        CARD: ('doctor_id', 'name', 'email', 'phone', 'specialization'),
+        PROFILE: ('doctor_id', 'name', 'email', 'phone', 'specialization', 'license_number', 'totp_enabled'),
+        LOGIN: ('doctor_id', 'name', 'email', 'password', 'totp_enabled', 'totp_secret', 'backup_codes'),
+    }),
+    'caretaker': Role('caretaker', 'caretaker', 'caretaker_id', 'caretaker_id', {
+        CARD: ('caretaker_id', 'name', 'email', 'phone'),
+        PROFILE: ('caretaker_id', 'name', 'email', 'phone', 'totp_enabled'),
+        LOGIN: ('caretaker_id', 'name', 'email', 'password', 'totp_enabled', 'totp_secret', 'backup_codes'),
+    }),
+}
+
+# Columns of a doctor that any logged-in user may see
+DOCTOR_DIRECTORY_COLUMNS = 'doctor_id, name, specialization'
+
+# InnoDB ignores full-text tokens shorter than this (innodb_ft_min_token_size)
+FULLTEXT_MIN_TOKEN = 3
+
+
+def columns(role, projection, alias=None):
+    """The projection's column list for a SELECT, optionally as alias.column."""
+    names = ROLES[role].projections[projection]
+    return ', '.join(f'{alias}.{name}' for name in names) if alias else ', '.join(names)
+
+
+def get(role, user_id, projection=PROFILE, version=0):
+    """The account row as a dict (cached per projection), or None.
+
+    version is the account_version session counter: the session is shared
+    by every worker, so after the user changes their account no worker
+    serves them its old copy.
+    """
+    spec = ROLES[role]
+    return identity_cache.cached(role, (user_id, projection, version), lambda: db.fetch_one(
+        f'SELECT {columns(role, projection)} FROM {spec.table} WHERE {spec.id_column} = %s',
+        (user_id,), prepared=True))
+
+
+def get_many(role, user_ids, projection=CARD):
+    """{user_id: row} for every id that exists, in one query per batch."""
+    spec = ROLES[role]
+    rows = db.fetch_in(f'SELECT {columns(role, projection)} FROM {spec.table} '
+                       f'WHERE {spec.id_column} IN ({{keys}})', user_ids, prepared=True)
+    return {row[spec.id_column]: row for row in rows}
+
+
+def load(cursor, role, user_id, column=None, projection=LOGIN):
+    """The current row, read on the caller's cursor (by column, default the key)."""
+    spec = ROLES[role]
+    cursor.execute(f'SELECT {columns(role, projection)} FROM {spec.table} '
+                   f'WHERE {column or spec.id_column} = %s', (user_id,))
+    return db.first(cursor)
+
+
+def invalidate(role, user_id):
+    """An account row changed; drop it (and, for doctors, every list that embeds it)."""
+    identity_cache.invalidate_where(role, lambda key: key[0] == user_id)
+    if role == 'doctor':
+        identity_cache.invalidate('doctor_directory')
+        identity_cache.invalidate('selected_doctors')
+
+
+def update(cursor, role, user_id, **columns):
+    """UPDATE the given columns of one account; its cached copy goes on commit."""
+    spec = ROLES[role]
+    assignments = ', '.join(f'{name} = %s' for name in columns)
+    cursor.execute(f'UPDATE {spec.table} SET {assignments} WHERE {spec.id_column} = %s',
+                   (*columns.values(), user_id))
+    db.after_commit(lambda: invalidate(role, user_id))
+
+
+def password_matches(cursor, role, user_id, password, stored):
+    """Check a password against its stored hash (or legacy plaintext).
+
+    On a match, plaintext and under-strength hashes are replaced with a
+    current hash (committed with the caller's transaction).
+    """
+    matches, needs_rehash = passwords.verify(password, stored)
+    if matches and needs_rehash:
+        update(cursor, role, user_id, password=passwords.make(password))
+    return matches
+
+
+def enable_totp(cursor, role, user_id, secret, backup_codes):
+    update(cursor, role, user_id, totp_secret=secret, totp_enabled=True,
+           backup_codes=json.dumps(backup_codes))
+
+
+def disable_totp(cursor, role, user_id):
+    update(cursor, role, user_id, totp_secret=None, totp_enabled=False, backup_codes=None)
+
+
+# -------------------- DOCTOR DIRECTORY -------------------- #
+
+def _like_prefix(term):
+    """Escape LIKE wildcards and turn term into a prefix pattern."""
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def search_doctors(query='', page=1, per_page=20):
+    """One page of the doctor directory, matching name or specialization.
+
+    Short queries use prefix LIKE on the name/specialization indexes;
+    longer ones use the FULLTEXT index in boolean prefix mode. One extra row
+    is fetched to tell whether another page exists.
+    """
+    query = (query or '').strip()
+    offset = (page - 1) * per_page
+    terms = [''.join(ch for ch in word if ch.isalnum()) for word in query.split()]
+    terms = [t for t in terms if t]
+
+    if not terms:
+        sql = f'''
+            SELECT {DOCTOR_DIRECTORY_COLUMNS} FROM doctors
+            ORDER BY name, doctor_id
+            LIMIT %s OFFSET %s
+        '''
+        params = (per_page + 1, offset)
+    elif len(query) < FULLTEXT_MIN_TOKEN or any(len(t) < FULLTEXT_MIN_TOKEN for t in terms):
+        pattern = _like_prefix(query)
+        sql = f'''
+            SELECT {DOCTOR_DIRECTORY_COLUMNS} FROM doctors
+            WHERE name LIKE %s OR specialization LIKE %s
+            ORDER BY name, doctor_id
+            LIMIT %s OFFSET %s
+        '''
+        params = (pattern, pattern, per_page + 1, offset)
+    else:
+        boolean_query = ' '.join(f'+{t}*' for t in terms)
+        sql = f'''
+            SELECT {DOCTOR_DIRECTORY_COLUMNS} FROM doctors
+            WHERE MATCH(name, specialization) AGAINST (%s IN BOOLEAN MODE)
+            ORDER BY MATCH(name, specialization) AGAINST (%s IN BOOLEAN MODE) DESC, name, doctor_id
+            LIMIT %s OFFSET %s
+        '''
+        params = (boolean_query, boolean_query, per_page + 1, offset)
+
+    rows = identity_cache.cached('doctor_directory', (query.lower(), page, per_page),
+                                 lambda: db.fetch_all(sql, params))
+    return rows[:per_page], len(rows) > per_page
+
+
+def get_selected_doctors(aadhar_id, version=0):
+    """Doctors the patient has selected, with the connection date.
+
+    version is the patient's doctors_version session counter: the session
+    is shared by every worker, so a select/remove is seen at once even by
+    workers whose process cache still holds the old list.
+    """
+    return identity_cache.cached('selected_doctors', (aadhar_id, version), lambda: db.fetch_all(f'''
+        SELECT {columns('doctor', CARD, 'd')}, pd.created_at as connected_date
+        FROM patient_doctors pd
+        JOIN doctors d ON pd.doctor_id = d.doctor_id
+        WHERE pd.patient_aadhar = %s AND pd.is_active = TRUE
+    ''', (aadhar_id,), prepared=True))
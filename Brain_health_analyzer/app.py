@@ -1,27 +1,60 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file
+from flask import Flask, Request, render_template, request, redirect, url_for, session, flash, jsonify, send_file, abort
+import click
 import mysql.connector
-import random
 import os
+import sys
+import time
 import json
-import hashlib
-import base64
-from datetime import datetime
-from werkzeug.utils import secure_filename
-import joblib
-import pandas as pd
-import io
-import pyotp
-import qrcode
-from io import BytesIO
-
-# Load environment variables (optional)
+import mimetypes
+from functools import wraps
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from werkzeug.http import is_resource_modified
+
+# Load environment variables (optional) before the modules below read their settings
 try:
     from dotenv import load_dotenv
     load_dotenv()
 except ImportError:
     pass  # dotenv not installed, will use environment variables or defaults
 
+import db
+import accounts
+import ids
+import inference_pool
+import patient_summary
+import uploads
+import prescription_store
+import integrity
+import image_variants
+import server_session
+import passwords
+import rate_limit
+import otp_store
+import assets
+import vendor
+import template_cache
+import compression
+
+if __name__ == '__main__':
+    # `python app.py`: the blueprints' `from app import ...` must find this
+    # module rather than import a second copy of it
+    sys.modules['app'] = sys.modules['__main__']
+
+class UploadRequest(Request):
+    """Parse prescription uploads straight into a hashing temp file.
+
+    The file lands in the store's spool directory already hashed, so the
+    view only has to move it into place (see uploads.spool_upload).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint == 'doctor.create_prescription':
+            return uploads.HashingSpoolFile(blob_store.spool_dir)
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
 app = Flask(__name__)
+app.request_class = UploadRequest
+app.jinja_env.add_extension(template_cache.FragmentCacheExtension)
 
 # Configuration from environment variables with fallbacks
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your_secret_key_here_change_in_production')
@@ -37,26 +70,178 @@ if not IS_PRODUCTION:
     app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
     app.jinja_env.auto_reload = True
     app.jinja_env.cache = {}
+    app.jinja_env.fragment_cache = None  # template edits show up immediately
 else:
     # Production settings
     app.config['TEMPLATES_AUTO_RELOAD'] = False
     app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 31536000  # 1 year
+    # Compiled templates survive restarts; precompiled at the end of this module
+    app.jinja_env.bytecode_cache = template_cache.bytecode_cache(
+        os.path.join(app.instance_path, 'jinja_bytecode'))
+
+# Fingerprinted static assets. Production (re)builds static/dist on first
+# use or in preload(), which only writes files whose content changed;
+# development links the plain files with a content-hash query string.
+asset_resolver = assets.Assets(app.static_folder, build=IS_PRODUCTION)
+
+@app.template_global()
+def asset_url(filename):
+    """URL for a static asset that changes whenever its content does."""
+    path, version = asset_resolver.path_for(filename)
+    if version:
+        return url_for('static', filename=path, v=version)
+    return url_for('static', filename=path)
+
+# Bootstrap, Font Awesome, Inter and Chart.js are self-hosted once
+# flask vendor-assets has written static/vendor/; until then, the CDN
+vendored_assets = vendor.available(app.static_folder)
+
+def warn_missing_vendor_assets():
+    """Say at startup which third-party assets production loads from a CDN."""
+    missing = sorted(set(vendor.FILES) - vendored_assets)
+    if missing:
+        print(f"WARNING: static/{vendor.VENDOR_DIR} has no copy of {', '.join(missing)}; "
+              f"pages load them from public CDNs. Run 'flask vendor-assets' and commit "
+              f"static/{vendor.VENDOR_DIR}.")
+    return missing
+
+if IS_PRODUCTION:
+    warn_missing_vendor_assets()
+
+@app.template_global()
+def vendor_url(name):
+    """URL for a third-party asset: the self-hosted copy if present, else its CDN."""
+    if name in vendored_assets:
+        return asset_url(vendor.FILES[name].path)
+    return vendor.FILES[name].cdn
+
+# gzip/brotli for HTML and JSON; turn off when a front-end server compresses
+COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+if COMPRESSION_ENABLED:
+    app.wsgi_app = compression.CompressionMiddleware(
+        app.wsgi_app,
+        min_size=int(os.getenv('COMPRESSION_MIN_SIZE', 500)),
+        gzip_level=int(os.getenv('COMPRESSION_LEVEL', 6)),
+    )
 
-# Load ML model
-clf = joblib.load('Brain_health_analyzer/Best_Model.pkl')
+# Server-side sessions (SESSION_BACKEND=sqlite|redis, or cookie for Flask's
+# default signed cookies)
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+
+def session_user_key(sess):
+    """'doctor:DR123'-style owner of a session, used to revoke all of a user's sessions."""
+    user_type = sess.get('user_type')
+    user_id = {
+        'patient': sess.get('patient_aadhar'),
+        'doctor': sess.get('doctor_id'),
+        'caretaker': sess.get('caretaker_id'),
+    }.get(user_type)
+    return f"{user_type}:{user_id}" if user_id else None
+
+session_store = None
+if SESSION_BACKEND != 'cookie':
+    session_store = server_session.store_from_env(app.instance_path)
+    app.session_interface = server_session.ServerSessionInterface(session_store, user_key=session_user_key)
+
+def rotate_session():
+    """Give the session a fresh id (on login/logout) so an old id cannot be reused."""
+    if hasattr(session, 'regenerate'):
+        session.regenerate()
+
+def account_changed():
+    """New key for the signed-in user's cached account row, seen by every worker via the session."""
+    session['account_version'] = session.get('account_version', 0) + 1
+
+def revoke_sessions(user_key, keep_current=True):
+    """Log a user out everywhere (except, by default, this browser)."""
+    if session_store is None:
+        return 0
+    keep_sid = getattr(session, 'sid', None) if keep_current else None
+    return session_store.revoke_user(user_key, keep_sid=keep_sid)
+
+# Login/OTP throttling shared by all workers on this host
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# Number of reverse proxies in front of the app that append X-Forwarded-For
+RATE_LIMIT_PROXY_HOPS = int(os.getenv('RATE_LIMIT_PROXY_HOPS', 0))
+rate_buckets = rate_limit.buckets_from_env(app.instance_path) if RATE_LIMIT_ENABLED else None
+
+def client_ip():
+    if RATE_LIMIT_PROXY_HOPS and len(request.access_route) >= RATE_LIMIT_PROXY_HOPS:
+        return request.access_route[-RATE_LIMIT_PROXY_HOPS]
+    return request.remote_addr
+
+def rate_limited(kind, account, template=None, redirect_endpoint=None):
+    """Throttle POSTs to a view by client IP and by account.
+
+    kind picks the rules ('login', 'otp' or 'totp'); account() returns the
+    targeted account id from the form or session. Rejected attempts get a
+    429 (or a redirect to redirect_endpoint, which may be a function
+    returning the endpoint) before the view and the database are touched.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if rate_buckets is None or request.method != 'POST':
+                return view(*args, **kwargs)
+
+            checks = []
+            if f'{kind}:ip' in rate_buckets.rules:
+                checks.append((f'{kind}:ip', client_ip()))
+            account_id = account()
+            if account_id:
+                checks.append((f'{kind}:account', str(account_id).strip().lower()))
+
+            allowed, retry_after = rate_buckets.hit(checks)
+            if allowed:
+                return view(*args, **kwargs)
+
+            wait = max(1, int(retry_after + 0.999))
+            flash(f'Too many attempts. Please try again in {wait} seconds.', 'error')
+            headers = {'Retry-After': str(wait)}
+            if redirect_endpoint:
+                endpoint = redirect_endpoint() if callable(redirect_endpoint) else redirect_endpoint
+                return redirect(url_for(endpoint)), 303, headers
+            return render_template(template), 429, headers
+        return wrapper
+    return decorator
+
+def role_required(role=None):
+    """Send anyone not logged in as role to that role's login page.
+
+    Without a role, the view's role URL argument is required (the shared
+    TOTP routes).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            required = role or kwargs['role']
+            if session.get('user_type') != required:
+                return redirect(url_for(f'{required}.login'))
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+# EEG model, next to this file. Parsing and scoring run in child processes
+# that load it; this process loads it only when jobs run inline
+# (INFERENCE_WORKERS=0), on first use or in preload().
+MODEL_PATH = os.getenv('MODEL_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Best_Model.pkl')
+inference_executor = inference_pool.pool_from_env(MODEL_PATH)
 
 # -------------------- CONFIG -------------------- #
 
-db_config = {
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'user': os.getenv('DB_USER', 'root'),
-    'password': os.getenv('DB_PASSWORD', 'root')
-}
-
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx'}
 
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+# Content-addressed prescription files (PRESCRIPTION_STORE=local|s3)
+blob_store = prescription_store.store_from_env(app.config['UPLOAD_FOLDER'])
+
+# How /prescriptions/<id>/file hands files over: 'direct' (Python streams
+# them), 'x-sendfile' (Apache/lighttpd) or 'x-accel' (nginx)
+FILE_SEND_MODE = os.getenv('FILE_SEND_MODE', 'direct')
+X_ACCEL_PREFIX = os.getenv('X_ACCEL_PREFIX', '/protected-prescriptions/')
+app.config['USE_X_SENDFILE'] = FILE_SEND_MODE == 'x-sendfile'
+
 # -------------------- HELPERS -------------------- #
 
 def allowed_file(filename):
@@ -64,80 +249,41 @@ def allowed_file(filename):
 
 def generate_file_hash(file_path):
     """Generate SHA-256 hash for a given file path."""
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(chunk)
-    return sha256_hash.hexdigest()
-
-def get_db_connection():
-    config = db_config.copy()
-    config['database'] = 'healthcare_system'
-    return mysql.connector.connect(**config)
-
-# -------------------- TOTP HELPERS -------------------- #
-
-def generate_totp_secret():
-    """Generate a new TOTP secret for a user."""
-    return pyotp.random_base32()
-
-def generate_qr_code(secret, user_email, issuer_name="Healthcare App"):
-    """Generate QR code for TOTP setup."""
-    totp = pyotp.TOTP(secret)
-    provisioning_uri = totp.provisioning_uri(
-        name=user_email,
-        issuer_name=issuer_name
-    )
-    
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(provisioning_uri)
-    qr.make(fit=True)
-    
-    img = qr.make_image(fill_color="black", back_color="white")
-    
-    # Convert to base64 for display in HTML
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    qr_code_base64 = base64.b64encode(buffer.getvalue()).decode()
-    
-    return qr_code_base64
+    return integrity.hash_file(file_path)[0]
 
-def verify_totp_code(secret, user_code):
-    """Verify TOTP code entered by user."""
-    if not secret or not user_code:
-        return False
-    
-    totp = pyotp.TOTP(secret)
-    # Allow for 1 time step tolerance (30 seconds before/after)
-    return totp.verify(user_code, valid_window=1)
-
-def generate_backup_codes():
-    """Generate backup codes for account recovery."""
-    codes = []
-    for _ in range(10):
-        code = ''.join([str(random.randint(0, 9)) for _ in range(8)])
-        codes.append(code)
-    return codes
-
-def verify_backup_code(stored_codes, entered_code):
-    """Verify and consume a backup code."""
-    if not stored_codes or not entered_code:
-        return False, stored_codes
-    
-    try:
-        codes_list = json.loads(stored_codes) if isinstance(stored_codes, str) else stored_codes
-        if entered_code in codes_list:
-            codes_list.remove(entered_code)  # Use code only once
-            return True, json.dumps(codes_list)
-        return False, stored_codes
-    except (json.JSONDecodeError, TypeError):
-        return False, stored_codes
+def prescription_digest(file_path):
+    """(sha256, bytes_read) of a stored prescription file.
 
+    Local files go through the integrity cache; blobs in a remote store are
+    streamed.
+    """
+    if prescription_store.is_local_location(file_path):
+        return integrity.file_digest(file_path)
+    stream = blob_store.open(file_path)
+    try:
+        return integrity.hash_stream(stream)
+    finally:
+        stream.close()
 
-import requests
-
+def delete_prescription_file(location):
+    """Remove a prescription file whose last reference has been committed away.
 
+    Queue it with db.after_commit() from the deleting transaction. The
+    location is re-checked under lock first, so an upload of the same file
+    committed in between keeps its blob.
+    """
+    try:
+        with db.transaction() as cursor:
+            if prescription_store.is_referenced(cursor, location):
+                return
+            if prescription_store.is_local_location(location):
+                if os.path.exists(location):
+                    os.remove(location)
+                image_variants.delete(location)
+            else:
+                blob_store.delete(location)
+    except Exception as e:
+        print(f"Delete prescription file error: {e}")
 
 # -------------------- DB SETUP & ALTER -------------------- #
 
@@ -147,16 +293,14 @@ def setup_database():
     cursor = None
     try:
         # Create database if not exists
-        conn = mysql.connector.connect(**db_config)
+        conn = db.connect(database=None)
         cursor = conn.cursor()
         cursor.execute("CREATE DATABASE IF NOT EXISTS healthcare_system")
         cursor.close()
         conn.close()
 
         # Connect to DB and create tables (will not drop existing data)
-        config = db_config.copy()
-        config['database'] = 'healthcare_system'
-        conn = mysql.connector.connect(**config)
+        conn = db.connect()
         cursor = conn.cursor()
 
         # patients
@@ -166,7 +310,7 @@ def setup_database():
                 aadhar_id VARCHAR(16) UNIQUE NOT NULL,
                 name VARCHAR(100) NOT NULL,
                 email VARCHAR(100) NOT NULL,
-                password VARCHAR(100) NOT NULL,
+                password VARCHAR(255) NOT NULL,
                 phone VARCHAR(15),
                 date_of_birth DATE,
                 address TEXT,
@@ -183,7 +327,7 @@ def setup_database():
                 doctor_id VARCHAR(20) UNIQUE NOT NULL,
                 name VARCHAR(100) NOT NULL,
                 email VARCHAR(100) NOT NULL,
-                password VARCHAR(100) NOT NULL,
+                password VARCHAR(255) NOT NULL,
                 specialization VARCHAR(100),
                 license_number VARCHAR(50),
                 phone VARCHAR(15),
@@ -198,7 +342,7 @@ def setup_database():
                 caretaker_id VARCHAR(20) UNIQUE NOT NULL,
                 name VARCHAR(100) NOT NULL,
                 email VARCHAR(100) UNIQUE NOT NULL,
-                password VARCHAR(100) NOT NULL,
+                password VARCHAR(255) NOT NULL,
                 phone VARCHAR(15),
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
@@ -253,17 +397,8 @@ def setup_database():
             )
         ''')
 
-        # patient_otp
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS patient_otp (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                aadhar_id VARCHAR(16) NOT NULL,
-                otp VARCHAR(6) NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP,
-                is_used BOOLEAN DEFAULT FALSE
-            )
-        ''')
+        # patient_otp (one active code per aadhar/purpose)
+        cursor.execute(otp_store.CREATE_TABLE)
 
         # brain_reports
         cursor.execute('''
@@ -279,6 +414,13 @@ def setup_database():
             )
         ''')
 
+        # patient_summary / patient_seizure_days (incremental dashboard summary)
+        for ddl in patient_summary.CREATE_TABLES:
+            cursor.execute(ddl)
+
+        # prescription_blobs (reference counts for deduplicated files)
+        cursor.execute(prescription_store.CREATE_TABLE)
+
         conn.commit()
         print("All tables created (if they didn't already exist).")
     except mysql.connector.Error as e:
@@ -292,10 +434,22 @@ def setup_database():
     # Add TOTP columns
     alter_tables_for_totp()
 
+    # Indexes for the doctor directory search
+    alter_tables_for_doctor_directory()
+
+    # Indexes for the dashboard summary counts
+    alter_tables_for_dashboard_indexes()
+
+    # Room for password hashes
+    alter_tables_for_password_hashes()
+
+    # OTP purpose column and indexes
+    alter_tables_for_otp()
+
 def alter_tables_for_digital_signature():
     """Add digital_signature column to prescriptions table if missing."""
     try:
-        conn = get_db_connection()
+        conn = db.get_connection()
         cursor = conn.cursor()
         cursor.execute("""
             SELECT COUNT(*) FROM information_schema.COLUMNS 
@@ -321,7 +475,7 @@ def alter_tables_for_digital_signature():
 def alter_tables_for_totp():
     """Add TOTP columns to user tables if missing."""
     try:
-        conn = get_db_connection()
+        conn = db.get_connection()
         cursor = conn.cursor()
         
         # Add TOTP columns to patients table
@@ -359,10 +513,175 @@ def alter_tables_for_totp():
         if conn:
             conn.close()
 
+def alter_tables_for_doctor_directory():
+    """Add the indexes used by the doctor directory search if missing."""
+    conn = None
+    cursor = None
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        indexes = [
+            ('idx_doctors_name', 'CREATE INDEX idx_doctors_name ON doctors (name)'),
+            ('idx_doctors_specialization', 'CREATE INDEX idx_doctors_specialization ON doctors (specialization)'),
+            ('ft_doctors_name_specialization',
+             'CREATE FULLTEXT INDEX ft_doctors_name_specialization ON doctors (name, specialization)'),
+        ]
+
+        for index_name, ddl in indexes:
+            cursor.execute("""
+                SELECT COUNT(*) FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = 'healthcare_system'
+                AND TABLE_NAME = 'doctors'
+                AND INDEX_NAME = %s
+            """, (index_name,))
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(ddl)
+                print(f"Added '{index_name}' index to doctors table.")
+
+        conn.commit()
+    except mysql.connector.Error as e:
+        print(f"Error adding doctor directory indexes: {e}")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+def alter_tables_for_dashboard_indexes():
+    """Add the indexes behind the dashboard summary counts if missing."""
+    conn = None
+    cursor = None
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        indexes = [
+            # Pending reports: a doctor's reports per patient, and the
+            # prescriptions written since
+            ('brain_reports', 'idx_brain_reports_doctor_patient',
+             'CREATE INDEX idx_brain_reports_doctor_patient ON brain_reports (doctor_email, aadhar_id, created_at)'),
+            ('prescriptions', 'idx_prescriptions_doctor_patient',
+             'CREATE INDEX idx_prescriptions_doctor_patient ON prescriptions (doctor_id, patient_aadhar, created_at)'),
+            # Prescriptions this month, per doctor and per patient
+            ('prescriptions', 'idx_prescriptions_doctor_date',
+             'CREATE INDEX idx_prescriptions_doctor_date ON prescriptions (doctor_id, prescription_date)'),
+            ('prescriptions', 'idx_prescriptions_patient_date',
+             'CREATE INDEX idx_prescriptions_patient_date ON prescriptions (patient_aadhar, prescription_date)'),
+        ]
+
+        for table, index_name, ddl in indexes:
+            cursor.execute("""
+                SELECT COUNT(*) FROM information_schema.STATISTICS
+                WHERE TABLE_SCHEMA = 'healthcare_system'
+                AND TABLE_NAME = %s
+                AND INDEX_NAME = %s
+            """, (table, index_name))
+            if cursor.fetchone()[0] == 0:
+                cursor.execute(ddl)
+                print(f"Added '{index_name}' index to {table} table.")
+
+        conn.commit()
+    except mysql.connector.Error as e:
+        print(f"Error adding dashboard indexes: {e}")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+def alter_tables_for_password_hashes():
+    """Widen password columns that are too short for a hash."""
+    conn = None
+    cursor = None
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        for table in ('patients', 'doctors', 'caretaker'):
+            cursor.execute("""
+                SELECT CHARACTER_MAXIMUM_LENGTH FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = 'healthcare_system'
+                AND TABLE_NAME = %s
+                AND COLUMN_NAME = 'password'
+            """, (table,))
+            row = cursor.fetchone()
+            if row and row[0] < 255:
+                cursor.execute(f"ALTER TABLE {table} MODIFY password VARCHAR(255) NOT NULL")
+                print(f"Widened {table}.password for password hashes.")
+
+        conn.commit()
+    except mysql.connector.Error as e:
+        print(f"Error widening password columns: {e}")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
+def alter_tables_for_otp():
+    """Give patient_otp its purpose column and one-code-per-purpose index if missing."""
+    conn = None
+    cursor = None
+    try:
+        conn = db.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT COLUMN_DEFAULT FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = 'healthcare_system'
+            AND TABLE_NAME = 'patient_otp'
+            AND COLUMN_NAME = 'purpose'
+        """)
+        column = cursor.fetchone()
+        if column is None:
+            cursor.execute(f"ALTER TABLE patient_otp ADD COLUMN purpose VARCHAR(32) NOT NULL "
+                           f"DEFAULT '{otp_store.PATIENT_ACCESS}' AFTER aadhar_id")
+            print("Added 'purpose' column to patient_otp table.")
+        elif column[0] != otp_store.PATIENT_ACCESS:
+            # Codes issued under the former per-role purposes are what consume() now looks up
+            cursor.execute(f"ALTER TABLE patient_otp ALTER COLUMN purpose SET DEFAULT '{otp_store.PATIENT_ACCESS}'")
+            cursor.execute("UPDATE IGNORE patient_otp SET purpose = %s WHERE purpose <> %s",
+                           (otp_store.PATIENT_ACCESS, otp_store.PATIENT_ACCESS))
+            print("Set patient_otp purpose default to the shared patient access code.")
+
+        cursor.execute("""
+            SELECT INDEX_NAME FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = 'healthcare_system'
+            AND TABLE_NAME = 'patient_otp'
+        """)
+        existing = {row[0] for row in cursor.fetchall()}
+
+        if 'uq_patient_otp_purpose' not in existing:
+            # Old rows would break the unique key: drop spent codes, then keep
+            # only the newest code per aadhar/purpose
+            cursor.execute("DELETE FROM patient_otp WHERE is_used = TRUE OR expires_at IS NULL OR expires_at <= NOW()")
+            cursor.execute("""
+                DELETE older FROM patient_otp older
+                JOIN patient_otp newer
+                ON older.aadhar_id = newer.aadhar_id AND older.purpose = newer.purpose
+                AND older.id < newer.id
+            """)
+            cursor.execute("ALTER TABLE patient_otp ADD UNIQUE KEY uq_patient_otp_purpose (aadhar_id, purpose)")
+            print("Added 'uq_patient_otp_purpose' index to patient_otp table.")
+
+        if 'idx_patient_otp_expires' not in existing:
+            cursor.execute("CREATE INDEX idx_patient_otp_expires ON patient_otp (expires_at)")
+            print("Added 'idx_patient_otp_expires' index to patient_otp table.")
+
+        conn.commit()
+    except mysql.connector.Error as e:
+        print(f"Error updating patient_otp table: {e}")
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
+
 def alter_tables():
     """Older alter logic preserved (safe, checks for columns before altering)."""
     try:
-        conn = get_db_connection()
+        conn = db.get_connection()
         cursor = conn.cursor()
 
         # Example: ensure patients.aadhar_id length
@@ -380,7 +699,7 @@ def alter_tables():
         """)
         if cursor.fetchone()[0] == 0:
             try:
-                cursor.execute("ALTER TABLE patients ADD COLUMN password VARCHAR(100) NOT NULL AFTER email")
+                cursor.execute("ALTER TABLE patients ADD COLUMN password VARCHAR(255) NOT NULL AFTER email")
             except mysql.connector.Error:
                 pass
 
@@ -428,1965 +747,496 @@ def test_design():
 def test_css():
     return send_file('static/test.html')
 
-# -------------------- PATIENT ROUTES -------------------- #
-
-@app.route('/patient/signup', methods=['GET', 'POST'])
-def patient_signup():
-    if request.method == 'POST':
-        aadhar_id = request.form['aadhar_id']
-        name = request.form['name']
-        email = request.form['email']
-        password = request.form['password']  # plaintext per your request
-        phone = request.form['phone']
-        date_of_birth = request.form['date_of_birth']
-        address = request.form['address']
-        blood_group = request.form['blood_group']
-        emergency_contact = request.form['emergency_contact']
-
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO patients (aadhar_id, name, email, password, phone, date_of_birth, address, blood_group, emergency_contact)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (aadhar_id, name, email, password, phone, date_of_birth, address, blood_group, emergency_contact))
-            conn.commit()
-            flash('Patient registered successfully! Please login.', 'success')
-            return redirect(url_for('patient_login'))
-        except mysql.connector.Error as e:
-            flash('Error during registration. Patient might already exist.', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
-    return render_template('patient_signup.html')
-
-@app.route('/patient/login', methods=['GET', 'POST'])
-def patient_login():
-    if request.method == 'POST':
-        aadhar_id = request.form['aadhar_id']
-        password = request.form['password']
-        totp_code = request.form.get('totp_code', '')
-        backup_code = request.form.get('backup_code', '')
-        
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-
-            cursor.execute("SELECT * FROM patients WHERE aadhar_id = %s", (aadhar_id,))
-            patient = cursor.fetchone()
-            
-            if not patient:
-                flash("User not found! Please sign up first.", "error")
-                return render_template("patient_login.html")
-            
-            dbpass = patient["password"]
-            
-            if dbpass != password:
-                flash("Incorrect password!", "error")
-                return render_template("patient_login.html")
-            
-            # Check if TOTP is enabled
-            if patient.get('totp_enabled', False):
-                totp_secret = patient.get('totp_secret')
-                
-                # Try TOTP code first
-                if totp_code and verify_totp_code(totp_secret, totp_code):
-                    # TOTP verified successfully
-                    pass
-                elif backup_code:
-                    # Try backup code
-                    is_valid, updated_codes = verify_backup_code(patient.get('backup_codes'), backup_code)
-                    if is_valid:
-                        # Update backup codes in database
-                        cursor.execute("UPDATE patients SET backup_codes = %s WHERE aadhar_id = %s", 
-                                     (updated_codes, aadhar_id))
-                        conn.commit()
-                        flash("Backup code used successfully. Please consider regenerating backup codes.", "warning")
-                    else:
-                        flash("Invalid backup code!", "error")
-                        return render_template("patient_login.html", show_totp=True)
-                else:
-                    flash("Please enter TOTP code or backup code!", "error")
-                    return render_template("patient_login.html", show_totp=True)
-            
-            # Login successful
-            session["user_type"] = "patient"
-            session["patient_aadhar"] = aadhar_id
-            flash("Login successful!", "success")
-            return redirect(url_for("patient_dashboard"))
-
-        finally:
-            cursor.close()
-            conn.close()
+DOCTOR_DIRECTORY_MAX_PAGE_SIZE = 50
 
-    return render_template("patient_login.html")
+@app.route('/api/doctors')
+def doctor_directory():
+    """Paginated doctor search for the dashboard typeahead."""
+    if 'user_type' not in session:
+        return jsonify({"status": "error", "message": "Login required"}), 401
 
-@app.route("/doctor/view_reports/<aadhar_id>")
-def view_reports(aadhar_id):
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
+    query = request.args.get('q', '')
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), DOCTOR_DIRECTORY_MAX_PAGE_SIZE)
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-
-        cursor.execute("SELECT email FROM doctors WHERE doctor_id = %s", (session['doctor_id'],))
-        result = cursor.fetchone()
-
-        doc_email= result['email']
-        cursor.execute("""
-            SELECT * FROM brain_reports 
-            WHERE aadhar_id = %s AND doctor_email = %s
-            ORDER BY created_at DESC
-        """, (aadhar_id, doc_email))
-
-        reports = cursor.fetchall()
-
-    except mysql.connector.Error as e:
-        flash("Error loading reports", "error")
-        reports = []
-    finally:
-        cursor.close()
-        conn.close()
+        doctors, has_more = accounts.search_doctors(query, page, per_page)
+    except db.Error as e:
+        print(f"Doctor directory error: {e}")
+        return jsonify({"status": "error", "message": "Database error occurred"}), 500
+
+    return jsonify({
+        "status": "ok",
+        "doctors": doctors,
+        "page": page,
+        "per_page": per_page,
+        "has_more": has_more,
+    })
 
-    return render_template("view_reports.html", 
-                           reports=reports,
-                           aadhar_id=aadhar_id)
-
-
-
-
-
-
-@app.route('/patient/dashboard')
-def patient_dashboard():
-    if 'user_type' not in session or session['user_type'] != 'patient':
-        return redirect(url_for('patient_login'))
+# -------------------- VERIFY SIGNATURE ROUTE -------------------- #
 
+@app.route('/verify-signature/<int:prescription_id>')
+def verify_signature(prescription_id):
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+        record = db.fetch_one("SELECT file_path, digital_signature FROM prescriptions WHERE id = %s",
+                              (prescription_id,))
+    except db.Error as e:
+        print(f"Verify signature DB error: {e}")
+        record = None
 
-        # Get patient's selected doctors
-        cursor.execute('''
-            SELECT d.*, pd.created_at as connected_date 
-            FROM patient_doctors pd 
-            JOIN doctors d ON pd.doctor_id = d.doctor_id 
-            WHERE pd.patient_aadhar = %s AND pd.is_active = TRUE
-        ''', (session['patient_aadhar'],))
-        selected_doctors = cursor.fetchall()
-
-        # Get all available doctors
-        cursor.execute('SELECT * FROM doctors')
-        all_doctors = cursor.fetchall()
-
-        # Get patient's prescriptions
-        cursor.execute('''
-            SELECT p.*, d.name as doctor_name, d.specialization
-            FROM prescriptions p
-            JOIN doctors d ON p.doctor_id = d.doctor_id
-            WHERE p.patient_aadhar = %s
-            ORDER BY p.prescription_date DESC
-        ''', (session['patient_aadhar'],))
-        prescriptions = cursor.fetchall()
+    if not record or not record.get('file_path'):
+        return jsonify({"status": "error", "message": "File not found"})
 
-    except mysql.connector.Error as e:
-        flash('Database error occurred', 'error')
-        selected_doctors = []
-        all_doctors = []
-        prescriptions = []
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+    # The answer only changes with the file or the stored signature, so a
+    # client holding a current ETag gets a 304 before anything is hashed
+    etag = last_modified = None
+    if prescription_store.is_local_location(record['file_path']):
+        try:
+            etag, last_modified = integrity.validator(record['file_path'], record.get('digital_signature'))
+        except FileNotFoundError:
+            return jsonify({"status": "error", "message": "File not found"})
+        except OSError as e:
+            print(f"Verify signature file error: {e}")
+            return jsonify({"status": "error", "message": "File could not be read"}), 503
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+
+    # Unchanged files are answered from the digest cache without a re-read
+    status, _, _ = integrity.verify(record['file_path'], record.get('digital_signature'),
+                                    prescription_digest)
+    if status == integrity.MISSING:
+        return jsonify({"status": "error", "message": "File not found"})
+    if status == integrity.UNREADABLE:
+        return jsonify({"status": "error", "message": "File could not be read"}), 503
+    if status == integrity.VERIFIED:
+        response = jsonify({"status": "verified", "message": "File integrity verified"})
+    else:
+        response = jsonify({"status": "tampered", "message": "File integrity check failed"})
+
+    response.headers['Cache-Control'] = 'private, no-cache'
+    if etag:
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        return response
+    # Remote blobs: validate on the body instead
+    return response.make_conditional(request, add_etag=True)
+
+# -------------------- STATIC ASSETS -------------------- #
+
+@app.route('/static/dist/<path:filename>')
+def dist_asset(filename):
+    """Fingerprinted assets: precompressed when possible, cached forever."""
+    dist_folder = os.path.join(app.static_folder, assets.DIST_DIR)
+    path = os.path.realpath(os.path.join(dist_folder, filename))
+    if not path.startswith(os.path.realpath(dist_folder) + os.sep) or not os.path.isfile(path):
+        abort(404)
+
+    served, encoding = assets.negotiate(path, request.accept_encodings)
+    response = send_file(served, mimetype=mimetypes.guess_type(filename)[0], conditional=True,
+                         etag=os.path.basename(served))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = assets.IMMUTABLE
+    return response
+
+# -------------------- PRESCRIPTION DOWNLOAD ROUTE -------------------- #
+
+@app.before_request
+def block_static_uploads():
+    """Prescription files are only served through prescription_file()."""
+    if request.endpoint == 'static' and request.view_args.get('filename', '').startswith('uploads/'):
+        abort(404)
+
+def can_access_prescription(cursor, prescription):
+    """Whether the logged-in user may read this prescription's file."""
+    user_type = session.get('user_type')
+    patient_aadhar = prescription['patient_aadhar']
+
+    if user_type == 'patient':
+        return session.get('patient_aadhar') == patient_aadhar
+
+    if user_type == 'doctor':
+        if prescription['doctor_id'] == session.get('doctor_id'):
+            return True
+        if session.get('verified_aadhar') == patient_aadhar:
+            return True
+        cursor.execute('''
+            SELECT 1 FROM patient_doctors
+            WHERE doctor_id = %s AND patient_aadhar = %s AND is_active = TRUE
+        ''', (session.get('doctor_id'), patient_aadhar))
+        return cursor.fetchone() is not None
 
-    return render_template('patient_dashboard.html',
-                           patient_aadhar=session['patient_aadhar'],
-                           selected_doctors=selected_doctors,
-                           all_doctors=all_doctors,
-                           prescriptions=prescriptions)
+    if user_type == 'caretaker':
+        cursor.execute('''
+            SELECT 1 FROM caretaker_patients
+            WHERE caretaker_id = %s AND patient_aadhar = %s AND is_active = TRUE
+        ''', (session.get('caretaker_id'), patient_aadhar))
+        return cursor.fetchone() is not None
 
-@app.route('/patient/select-doctor', methods=['POST'])
-def select_doctor():
-    if 'user_type' not in session or session['user_type'] != 'patient':
-        return redirect(url_for('patient_login'))
+    return False
 
-    doctor_id = request.form['doctor_id']
+@app.route('/prescriptions/<int:prescription_id>/file')
+def prescription_file(prescription_id):
+    if 'user_type' not in session:
+        return redirect(url_for('index'))
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id FROM patient_doctors 
-            WHERE patient_aadhar = %s AND doctor_id = %s
-        ''', (session['patient_aadhar'], doctor_id))
-        existing = cursor.fetchone()
-
-        if not existing:
+        with db.cursor(dictionary=True) as cursor:
             cursor.execute('''
-                INSERT INTO patient_doctors (patient_aadhar, doctor_id)
-                VALUES (%s, %s)
-            ''', (session['patient_aadhar'], doctor_id))
-            conn.commit()
-            flash('Doctor added successfully!', 'success')
+                SELECT patient_aadhar, doctor_id, file_name, file_path, digital_signature
+                FROM prescriptions WHERE id = %s
+            ''', (prescription_id,))
+            prescription = cursor.fetchone()
+            allowed = prescription is not None and can_access_prescription(cursor, prescription)
+    except db.Error as e:
+        print(f"Prescription file DB error: {e}")
+        abort(500)
+
+    if not allowed:
+        abort(404)
+    if not prescription['file_path']:
+        abort(404)
+
+    file_path = prescription['file_path']
+    download_name = prescription['file_name'] or os.path.basename(file_path)
+    as_attachment = request.args.get('download') == '1'
+    etag = prescription['digital_signature']
+
+    if not prescription_store.is_local_location(file_path):
+        return redirect(blob_store.presigned_url(file_path, download_name if as_attachment else None))
+
+    if not os.path.exists(file_path):
+        abort(404)
+
+    # ?variant=thumb|display serves the downscaled WebP once it exists
+    variant = request.args.get('variant')
+    if variant in image_variants.VARIANTS:
+        variant_path = image_variants.variant_path(file_path, variant)
+        if os.path.exists(variant_path):
+            file_path = variant_path
+            download_name = f"{os.path.splitext(download_name)[0]}.{variant}.webp"
+            etag = f"{etag}-{variant}" if etag else None
+
+    if FILE_SEND_MODE == 'x-accel':
+        # nginx serves the body (and any Range) from an internal location
+        if etag and request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
         else:
-            flash('Doctor is already in your list!', 'warning')
-    except mysql.connector.Error as e:
-        print(f"Select doctor error: {e}")
-        flash('Error selecting doctor', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
-    return redirect(url_for('patient_dashboard'))
+            relative = os.path.relpath(file_path, app.config['UPLOAD_FOLDER']).replace("\\", "/")
+            response = app.response_class(mimetype=mimetypes.guess_type(download_name)[0]
+                                          or 'application/octet-stream')
+            response.headers['X-Accel-Redirect'] = X_ACCEL_PREFIX + relative
+            disposition = 'attachment' if as_attachment else 'inline'
+            response.headers.set('Content-Disposition', disposition, filename=download_name)
+    else:
+        # The stored SHA-256 is the strong ETag; send_file answers
+        # If-None-Match with 304 and Range with 206 (or X-Sendfile)
+        response = send_file(os.path.abspath(file_path), download_name=download_name, as_attachment=as_attachment,
+                             etag=etag or True, conditional=True, max_age=0)
 
-@app.route('/patient/remove-doctor/<doctor_id>')
-def remove_doctor(doctor_id):
-    if 'user_type' not in session or session['user_type'] != 'patient':
-        return redirect(url_for('patient_login'))
+    if etag:
+        response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            DELETE FROM patient_doctors 
-            WHERE patient_aadhar = %s AND doctor_id = %s
-        ''', (session['patient_aadhar'], doctor_id))
-        conn.commit()
-        flash('Doctor removed successfully!', 'success')
-    except mysql.connector.Error as e:
-        print(f"Remove doctor error: {e}")
-        flash('Error removing doctor', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+def analyze_brain_signal(features):
+    """Score 85 EEG features on the calling thread with the loaded model."""
+    inference_pool.load_model(MODEL_PATH)
+    return inference_pool.analyze_features(features)
 
-    return redirect(url_for('patient_dashboard'))
+def run_inference(fn, *args):
+    """Run a parsing/scoring job on the inference pool.
 
-@app.route('/patient/setup-totp', methods=['GET', 'POST'])
-def patient_setup_totp():
-    if 'user_type' not in session or session['user_type'] != 'patient':
-        return redirect(url_for('patient_login'))
-    
-    if request.method == 'POST':
-        totp_code = request.form.get('totp_code')
-        
-        if 'temp_totp_secret' not in session:
-            flash('TOTP setup session expired. Please try again.', 'error')
-            return redirect(url_for('patient_setup_totp'))
-        
-        secret = session['temp_totp_secret']
-        
-        if verify_totp_code(secret, totp_code):
-            # Generate backup codes
-            backup_codes = generate_backup_codes()
-            
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE patients 
-                    SET totp_secret = %s, totp_enabled = TRUE, backup_codes = %s 
-                    WHERE aadhar_id = %s
-                ''', (secret, json.dumps(backup_codes), session['patient_aadhar']))
-                conn.commit()
-                
-                # Clear temp secret
-                session.pop('temp_totp_secret', None)
-                
-                flash('TOTP enabled successfully!', 'success')
-                return render_template('totp_backup_codes.html', 
-                                     backup_codes=backup_codes, 
-                                     user_type='patient')
-                
-            except mysql.connector.Error as e:
-                flash('Error enabling TOTP. Please try again.', 'error')
-            finally:
-                if cursor:
-                    cursor.close()
-                if conn:
-                    conn.close()
-        else:
-            flash('Invalid TOTP code. Please try again.', 'error')
-    
-    # Generate new secret and QR code
-    secret = generate_totp_secret()
-    session['temp_totp_secret'] = secret
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT email FROM patients WHERE aadhar_id = %s", (session['patient_aadhar'],))
-        patient = cursor.fetchone()
-        user_email = patient['email'] if patient else session['patient_aadhar']
-    except:
-        user_email = session['patient_aadhar']
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    qr_code = generate_qr_code(secret, user_email)
-    
-    return render_template('setup_totp.html', 
-                         qr_code=qr_code, 
-                         secret=secret,
-                         user_type='patient')
-
-@app.route('/patient/disable-totp', methods=['POST'])
-def patient_disable_totp():
-    if 'user_type' not in session or session['user_type'] != 'patient':
-        return redirect(url_for('patient_login'))
-    
-    password = request.form.get('password')
-    totp_code = request.form.get('totp_code')
-    
+    Returns (value, None) on success or (None, response) when the pool is
+    saturated or the job timed out.
+    """
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM patients WHERE aadhar_id = %s", (session['patient_aadhar'],))
-        patient = cursor.fetchone()
-        
-        if not patient or patient['password'] != password:
-            flash('Incorrect password!', 'error')
-            return redirect(url_for('patient_profile'))
-        
-        if patient.get('totp_enabled') and not verify_totp_code(patient.get('totp_secret'), totp_code):
-            flash('Invalid TOTP code!', 'error')
-            return redirect(url_for('patient_profile'))
-        
-        cursor.execute('''
-            UPDATE patients 
-            SET totp_secret = NULL, totp_enabled = FALSE, backup_codes = NULL 
-            WHERE aadhar_id = %s
-        ''', (session['patient_aadhar'],))
-        conn.commit()
-        
-        flash('TOTP disabled successfully!', 'success')
-        
-    except mysql.connector.Error as e:
-        flash('Error disabling TOTP. Please try again.', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(url_for('patient_profile'))
+        return inference_executor.run(fn, *args), None
+    except inference_pool.InferenceBusy:
+        return None, ("Analysis queue is full. Please try again shortly.", 503, {'Retry-After': '5'})
+    except FuturesTimeoutError:
+        return None, ("Analysis timed out. Please try a smaller file.", 503, {'Retry-After': '5'})
+
+# -------------------- CLI COMMANDS -------------------- #
+
+@app.cli.command('rebuild-patient-summary')
+def rebuild_patient_summary_command():
+    """Recompute patient_summary from brain_reports and prescriptions."""
+    with db.connection() as conn:
+        summary_rows, day_rows = patient_summary.rebuild(conn)
+    print(f"Rebuilt {summary_rows} patient summaries and {day_rows} seizure-day buckets.")
+
+@app.cli.command('prune-patient-summary')
+def prune_patient_summary_command():
+    """Delete seizure-day buckets older than the summary window."""
+    with db.connection() as conn:
+        print(f"Pruned {patient_summary.prune(conn)} seizure-day buckets.")
+
+@app.cli.command('audit-prescriptions')
+@click.option('--workers', default=integrity.AUDIT_WORKERS, show_default=True,
+              help='Files hashed in parallel.')
+@click.option('--report', default='tamper_report.csv', show_default=True,
+              help='CSV file listing missing or tampered prescriptions.')
+def audit_prescriptions_command(workers, report):
+    """Verify every prescription file against its stored signature."""
+    rows = db.fetch_all('''
+        SELECT id, prescription_id, file_path, digital_signature FROM prescriptions
+        WHERE file_path IS NOT NULL AND digital_signature IS NOT NULL
+    ''')
+
+    results, bytes_read, elapsed = integrity.audit(rows, prescription_digest, workers)
+    failed = integrity.write_report(results, report)
+    mb = bytes_read / (1024 * 1024)
+    print(f"Checked {len(results)} prescriptions ({mb:.1f} MB read) in {elapsed:.2f}s, "
+          f"{mb / elapsed if elapsed else 0:.1f} MB/s.")
+    print(f"{failed} missing, unreadable or tampered; report written to {report}.")
+
+@app.cli.command('generate-image-variants')
+def generate_image_variants_command():
+    """Create missing thumbnails/display versions for image prescriptions."""
+    paths = [row['file_path'] for row in db.fetch_all('''
+        SELECT DISTINCT file_path FROM prescriptions
+        WHERE file_type IN ('png', 'jpg', 'jpeg', 'gif') AND file_path IS NOT NULL
+    ''')]
+
+    written = 0
+    for path in paths:
+        if prescription_store.is_local_location(path) and os.path.exists(path):
+            try:
+                written += len(image_variants.generate(path))
+            except Exception as e:
+                print(f"Skipping {path}: {e}")
+    print(f"Wrote {written} image variants for {len(paths)} images.")
+
+@app.errorhandler(passwords.PasswordBusy)
+def password_busy(e):
+    return "Too many sign-in attempts right now. Please try again shortly.", 503, {'Retry-After': '2'}
+
+@app.cli.command('bench-passwords')
+@click.option('--logins', default=200, show_default=True, help='Password checks to run.')
+@click.option('--concurrency', default=16, show_default=True, help='Simultaneous login threads.')
+def bench_passwords_command(logins, concurrency):
+    """Measure password verifications per second at the current work factor."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    start = time.perf_counter()
+    rounds = passwords.iterations()
+    print(f"Work factor: {rounds} iterations (calibrated in {time.perf_counter() - start:.2f}s).")
+
+    stored = passwords.hash_password('correct horse battery staple')
+    start = time.perf_counter()
+    passwords.check_password('correct horse battery staple', stored)
+    print(f"Single verification: {(time.perf_counter() - start) * 1000:.1f} ms.")
+
+    def login(_):
+        return passwords.verify('correct horse battery staple', stored)[0]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        ok = sum(executor.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    print(f"{ok}/{logins} logins with {concurrency} threads and {passwords.WORKERS} hash workers: "
+          f"{logins / elapsed:.1f} logins/s.")
+
+@app.cli.command('bench-queries')
+@click.option('--role', type=click.Choice(sorted(accounts.ROLES)), default='patient', show_default=True)
+@click.option('--projection', type=click.Choice([accounts.CARD, accounts.PROFILE, accounts.LOGIN]),
+              default=accounts.CARD, show_default=True, help='Columns the page needs.')
+@click.option('--lookups', default=500, show_default=True, help='Account lookups per mode.')
+def bench_queries_command(role, projection, lookups):
+    """Compare SELECT * with a projection, as text and as prepared statements."""
+    spec = accounts.ROLES[role]
+    keys = [row[spec.id_column] for row in db.fetch_all(
+        f'SELECT {spec.id_column} FROM {spec.table} LIMIT %s', (lookups,))]
+    if not keys:
+        print(f"No rows in {spec.table}.")
+        return
+    params_list = [(keys[i % len(keys)],) for i in range(lookups)]
+    where = f'FROM {spec.table} WHERE {spec.id_column} = %s'
+    modes = [
+        ('SELECT *', f'SELECT * {where}', False),
+        (f'{projection} columns', f'SELECT {accounts.columns(role, projection)} {where}', False),
+        (f'{projection} columns, prepared', f'SELECT {accounts.columns(role, projection)} {where}', True),
+    ]
+    print(f"{lookups} lookups of {len(keys)} {spec.table} rows:")
+    baseline = None
+    for label, query, prepared in modes:
+        sent, seconds = db.measure(query, params_list, prepared=prepared)
+        baseline = baseline or sent
+        print(f"  {label:<28} {sent:8.0f} bytes/lookup ({sent / baseline:4.0%})  "
+              f"{seconds * 1e6:8.1f} us/lookup")
+
+@app.cli.command('sweep-sessions')
+def sweep_sessions_command():
+    """Delete expired server-side sessions in batches."""
+    if session_store is None:
+        print("Server-side sessions are disabled (SESSION_BACKEND=cookie).")
+        return
+    print(f"Deleted {session_store.sweep()} expired sessions.")
+
+@app.cli.command('revoke-sessions')
+@click.argument('user_key')
+def revoke_sessions_command(user_key):
+    """Log a user out everywhere, e.g. revoke-sessions doctor:DR123456."""
+    print(f"Revoked {revoke_sessions(user_key, keep_current=False)} sessions for {user_key}.")
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprint and precompress static assets into static/dist."""
+    manifest = assets.build(app.static_folder)
+    encodings = 'gzip and brotli' if assets.brotli else 'gzip (install brotli for .br)'
+    print(f"Built {len(manifest)} assets with {encodings} into static/{assets.DIST_DIR}.")
+
+@app.cli.command('vendor-assets')
+def vendor_assets_command():
+    """Download, trim and self-host Bootstrap, Font Awesome, Inter and Chart.js."""
+    written = vendor.vendor_all(app.root_path)
+    for path, size in sorted(written.items()):
+        print(f"{size / 1024:8.1f} KiB  static/{path}")
+    print(f"Wrote {len(written)} files; commit static/{vendor.VENDOR_DIR} and run build-assets.")
+
+@app.cli.command('purge-otps')
+@click.option('--batch-size', default=otp_store.PURGE_BATCH, show_default=True)
+def purge_otps_command(batch_size):
+    """Delete used and expired OTPs in batches (run periodically, e.g. from cron)."""
+    with db.connection() as conn:
+        print(f"Purged {otp_store.purge(conn, batch_size)} used or expired OTPs.")
+
+@app.cli.command('rate-limit-stats')
+@click.option('--prune', is_flag=True, help='Also drop buckets that have refilled completely.')
+def rate_limit_stats_command(prune):
+    """Show allowed/rejected attempts per rate-limit rule (all workers)."""
+    if rate_buckets is None:
+        print("Rate limiting is disabled (RATE_LIMIT_ENABLED=false).")
+        return
+    for rule, counts in rate_buckets.counters().items():
+        print(f"{rule:16} allowed={counts['allowed']:<8} rejected={counts['rejected']}")
+    if prune:
+        print(f"Pruned {rate_buckets.prune()} idle buckets.")
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Create the database and apply all schema changes."""
+    migrate()
+    print("Schema is up to date.")
+
+@app.cli.command('compile-templates')
+def compile_templates_command():
+    """Compile every template into the on-disk bytecode cache."""
+    if app.jinja_env.bytecode_cache is None:
+        app.jinja_env.bytecode_cache = template_cache.bytecode_cache(
+            os.path.join(app.instance_path, 'jinja_bytecode'))
+    print(f"Compiled {template_cache.precompile(app.jinja_env)} templates.")
+
+@app.cli.command('import-accounts')
+@click.argument('role', type=click.Choice(sorted(accounts.ROLES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None,
+              help='Input format (default: from the file extension).')
+@click.option('--batch-size', default=db.BATCH_SIZE, show_default=True, help='Rows per transaction.')
+@click.option('--restart', is_flag=True, help='Ignore the checkpoint of an earlier, interrupted run.')
+def import_accounts_command(role, path, fmt, batch_size, restart):
+    """Bulk-import patients, doctors or caretakers from a CSV or JSONL file."""
+    import bulk_import
 
-@app.route('/patient/regenerate-backup-codes', methods=['POST'])
-def patient_regenerate_backup_codes():
-    if 'user_type' not in session or session['user_type'] != 'patient':
-        return redirect(url_for('patient_login'))
-    
-    password = request.form.get('password')
-    totp_code = request.form.get('totp_code')
-    
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM patients WHERE aadhar_id = %s", (session['patient_aadhar'],))
-        patient = cursor.fetchone()
-        
-        if not patient or patient['password'] != password:
-            flash('Incorrect password!', 'error')
-            return redirect(url_for('patient_profile'))
-        
-        if not patient.get('totp_enabled'):
-            flash('TOTP is not enabled!', 'error')
-            return redirect(url_for('patient_profile'))
-        
-        if not verify_totp_code(patient.get('totp_secret'), totp_code):
-            flash('Invalid TOTP code!', 'error')
-            return redirect(url_for('patient_profile'))
-        
-        # Generate new backup codes
-        backup_codes = generate_backup_codes()
-        
-        cursor.execute('''
-            UPDATE patients SET backup_codes = %s WHERE aadhar_id = %s
-        ''', (json.dumps(backup_codes), session['patient_aadhar']))
-        conn.commit()
-        
-        flash('Backup codes regenerated successfully!', 'success')
-        return render_template('totp_backup_codes.html', 
-                             backup_codes=backup_codes, 
-                             user_type='patient')
-        
-    except mysql.connector.Error as e:
-        flash('Error regenerating backup codes. Please try again.', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(url_for('patient_profile'))
-
-# -------------------- DOCTOR ROUTES -------------------- #
-
-@app.route('/doctor/signup', methods=['GET', 'POST'])
-def doctor_signup():
-    if request.method == 'POST':
-        name = request.form['name']
-        email = request.form['email']
-        password = request.form['password']
-        specialization = request.form['specialization']
-        license_number = request.form['license_number']
-        phone = request.form['phone']
-        
-        # Auto-generate doctor_id
-        doctor_id = f"DR{random.randint(100000, 999999)}"
+        totals = bulk_import.import_file(role, path, batch_size=batch_size, fmt=fmt,
+                                         restart=restart, progress=print)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    if totals['resumed_at']:
+        print(f"Resumed after row {totals['resumed_at']}.")
+    rate = totals['read'] / totals['seconds'] if totals['seconds'] else 0
+    print(f"{totals['read']} rows in {totals['seconds']:.1f}s ({rate:.0f} rows/s): "
+          f"{totals['inserted']} inserted, {totals['existing']} already present, "
+          f"{totals['rejected']} rejected, {totals['linked']} links.")
+    if totals['rejects_path']:
+        print(f"Rejected rows and reasons: {totals['rejects_path']}")
+    if totals['unknown_links']:
+        sample = ', '.join(sorted(totals['unknown_links'])[:10])
+        print(f"{len(totals['unknown_links'])} linked ids not found (e.g. {sample}).")
 
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO doctors (doctor_id, name, email, password, specialization, license_number, phone)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ''', (doctor_id, name, email, password, specialization, license_number, phone))
-            conn.commit()
-            flash('Doctor registered successfully!', 'success')
-            return redirect(url_for('doctor_login'))
-        except mysql.connector.Error as e:
-            flash('Error during registration. Email might already exist.', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
-    return render_template('doctor_signup.html')
-
-@app.route('/doctor/login', methods=['GET', 'POST'])
-def doctor_login():
-    if request.method == 'POST':
-        email = request.form['email']
-        password = request.form['password']
-        totp_code = request.form.get('totp_code', '')
-        backup_code = request.form.get('backup_code', '')
-        
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute('SELECT * FROM doctors WHERE email = %s', (email,))
-            doctor = cursor.fetchone()
-            
-            if not doctor:
-                flash('User not found! Please sign up first.', 'error')
-                return render_template('doctor_login.html')
-            
-            if doctor['password'] != password:
-                flash('Incorrect password!', 'error')
-                return render_template('doctor_login.html')
-            
-            # Check if TOTP is enabled
-            if doctor.get('totp_enabled', False):
-                # If TOTP is enabled but no code provided, show TOTP form
-                if not totp_code and not backup_code:
-                    return render_template("doctor_login.html", show_totp=True, email=email)
-                
-                totp_secret = doctor.get('totp_secret')
-                
-                # Try TOTP code first
-                if totp_code and verify_totp_code(totp_secret, totp_code):
-                    # TOTP verified successfully
-                    pass
-                elif backup_code:
-                    # Try backup code
-                    is_valid, updated_codes = verify_backup_code(doctor.get('backup_codes'), backup_code)
-                    if is_valid:
-                        # Update backup codes in database
-                        cursor.execute("UPDATE doctors SET backup_codes = %s WHERE doctor_id = %s", 
-                                     (updated_codes, doctor['doctor_id']))
-                        conn.commit()
-                        flash("Backup code used successfully. Please consider regenerating backup codes.", "warning")
-                    else:
-                        flash("Invalid backup code!", "error")
-                        return render_template("doctor_login.html", show_totp=True, email=email)
-                else:
-                    flash("Please enter TOTP code or backup code!", "error")
-                    return render_template("doctor_login.html", show_totp=True, email=email)
-            
-            # Login successful
-            session['doctor_id'] = doctor['doctor_id']
-            session['doctor_name'] = doctor['name']
-            session['user_type'] = 'doctor'
-            flash('Login successful!', 'success')
-            return redirect(url_for('doctor_dashboard'))
-                
-        except mysql.connector.Error as e:
-            print(f"Doctor login error: {e}")
-            flash('Database error occurred', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-    
-    return render_template('doctor_login.html')
+# -------------------- LOGOUT -------------------- #
 
-@app.route('/doctor/dashboard')
-def doctor_dashboard():
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
+@app.route('/logout')
+def logout():
+    session.clear()
+    rotate_session()
+    flash('Logged out successfully!', 'success')
+    return redirect(url_for('index'))
 
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+# -------------------- BLUEPRINTS -------------------- #
+
+# Imported last: the views import their shared helpers from this module
+import patient_views
+import doctor_views
+import caretaker_views
+import totp_views
+
+app.register_blueprint(patient_views.bp)
+app.register_blueprint(doctor_views.bp)
+app.register_blueprint(caretaker_views.bp)
+app.register_blueprint(totp_views.bp)
+
+# -------------------- STARTUP -------------------- #
+
+def preload():
+    """Do the slow start-up work now rather than on the first requests.
+
+    Everything here is also initialised lazily, so importing this module
+    (tests, CLI commands) stays fast; servers call it once before serving.
+    """
+    inference_executor.preload()
+    passwords.iterations()
+    if IS_PRODUCTION:
+        asset_resolver.ensure_built()
+        template_cache.precompile(app.jinja_env)
+
+def create_app(warm=True):
+    """Application factory for servers: the configured app, preloaded."""
+    if warm:
+        preload()
+    return app
+
+def migrate():
+    """Create the schema and apply every ALTER step (each one is idempotent)."""
+    setup_database()  # also runs the TOTP, index, password and OTP steps
+    alter_tables()
+    alter_tables_for_digital_signature()
 
-        # Get patients who have selected this doctor
-        cursor.execute('''
-            SELECT p.*, pd.created_at as connected_date 
-            FROM patient_doctors pd 
-            JOIN patients p ON pd.patient_aadhar = p.aadhar_id 
-            WHERE pd.doctor_id = %s AND pd.is_active = TRUE
-        ''', (session['doctor_id'],))
-        my_patients = cursor.fetchall()
-    except mysql.connector.Error as e:
-        print(f"Doctor dashboard error: {e}")
-        flash('Database error occurred', 'error')
-        my_patients = []
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+def after_fork(id_slot=0):
+    """Reset per-process state inherited from a preloading parent.
+
+    Called in each gunicorn worker right after fork: connections, pools
+    and their locks belong to the parent and must be created afresh.
+    id_slot is the worker's slot, which keeps its generated ids apart
+    from every other live worker's.
+    """
+    db.after_fork()
+    ids.after_fork(id_slot)
+    inference_executor.after_fork()
+    passwords.after_fork()
+    image_variants.after_fork()
+    if session_store is not None:
+        session_store.after_fork()
+    if rate_buckets is not None:
+        rate_buckets.after_fork()
 
-    return render_template('doctor_dashboard.html', my_patients=my_patients)
+# -------------------- RUN APP -------------------- #
 
-@app.route('/doctor/setup-totp', methods=['GET', 'POST'])
-def doctor_setup_totp():
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
-    
-    if request.method == 'POST':
-        totp_code = request.form.get('totp_code')
-        
-        if 'temp_totp_secret' not in session:
-            flash('TOTP setup session expired. Please try again.', 'error')
-            return redirect(url_for('doctor_setup_totp'))
-        
-        secret = session['temp_totp_secret']
-        
-        if verify_totp_code(secret, totp_code):
-            # Generate backup codes
-            backup_codes = generate_backup_codes()
-            
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE doctors 
-                    SET totp_secret = %s, totp_enabled = TRUE, backup_codes = %s 
-                    WHERE doctor_id = %s
-                ''', (secret, json.dumps(backup_codes), session['doctor_id']))
-                conn.commit()
-                
-                # Clear temp secret
-                session.pop('temp_totp_secret', None)
-                
-                flash('TOTP enabled successfully!', 'success')
-                return render_template('totp_backup_codes.html', 
-                                     backup_codes=backup_codes, 
-                                     user_type='doctor')
-                
-            except mysql.connector.Error as e:
-                flash('Error enabling TOTP. Please try again.', 'error')
-            finally:
-                if cursor:
-                    cursor.close()
-                if conn:
-                    conn.close()
-        else:
-            flash('Invalid TOTP code. Please try again.', 'error')
-    
-    # Generate new secret and QR code
-    secret = generate_totp_secret()
-    session['temp_totp_secret'] = secret
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT email FROM doctors WHERE doctor_id = %s", (session['doctor_id'],))
-        doctor = cursor.fetchone()
-        user_email = doctor['email'] if doctor else session['doctor_id']
-    except:
-        user_email = session['doctor_id']
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    qr_code = generate_qr_code(secret, user_email)
-    
-    return render_template('setup_totp.html', 
-                         qr_code=qr_code, 
-                         secret=secret,
-                         user_type='doctor')
-
-@app.route('/doctor/disable-totp', methods=['POST'])
-def doctor_disable_totp():
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
-    
-    password = request.form.get('password')
-    totp_code = request.form.get('totp_code')
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM doctors WHERE doctor_id = %s", (session['doctor_id'],))
-        doctor = cursor.fetchone()
-        
-        if not doctor or doctor['password'] != password:
-            flash('Incorrect password!', 'error')
-            return redirect(url_for('doctor_profile'))
-        
-        if doctor.get('totp_enabled') and not verify_totp_code(doctor.get('totp_secret'), totp_code):
-            flash('Invalid TOTP code!', 'error')
-            return redirect(url_for('doctor_profile'))
-        
-        cursor.execute('''
-            UPDATE doctors 
-            SET totp_secret = NULL, totp_enabled = FALSE, backup_codes = NULL 
-            WHERE doctor_id = %s
-        ''', (session['doctor_id'],))
-        conn.commit()
-        
-        flash('TOTP disabled successfully!', 'success')
-        
-    except mysql.connector.Error as e:
-        flash('Error disabling TOTP. Please try again.', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(url_for('doctor_profile'))
-
-@app.route('/doctor/regenerate-backup-codes', methods=['POST'])
-def doctor_regenerate_backup_codes():
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
-    
-    password = request.form.get('password')
-    totp_code = request.form.get('totp_code')
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM doctors WHERE doctor_id = %s", (session['doctor_id'],))
-        doctor = cursor.fetchone()
-        
-        if not doctor or doctor['password'] != password:
-            flash('Incorrect password!', 'error')
-            return redirect(url_for('doctor_profile'))
-        
-        if not doctor.get('totp_enabled'):
-            flash('TOTP is not enabled!', 'error')
-            return redirect(url_for('doctor_profile'))
-        
-        if not verify_totp_code(doctor.get('totp_secret'), totp_code):
-            flash('Invalid TOTP code!', 'error')
-            return redirect(url_for('doctor_profile'))
-        
-        # Generate new backup codes
-        backup_codes = generate_backup_codes()
-        
-        cursor.execute('''
-            UPDATE doctors SET backup_codes = %s WHERE doctor_id = %s
-        ''', (json.dumps(backup_codes), session['doctor_id']))
-        conn.commit()
-        
-        flash('Backup codes regenerated successfully!', 'success')
-        return render_template('totp_backup_codes.html', 
-                             backup_codes=backup_codes, 
-                             user_type='doctor')
-        
-    except mysql.connector.Error as e:
-        flash('Error regenerating backup codes. Please try again.', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(url_for('doctor_profile'))
-
-@app.route('/caretaker/setup-totp', methods=['GET', 'POST'])
-def caretaker_setup_totp():
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-    
-    if request.method == 'POST':
-        totp_code = request.form.get('totp_code')
-        
-        if 'temp_totp_secret' not in session:
-            flash('TOTP setup session expired. Please try again.', 'error')
-            return redirect(url_for('caretaker_setup_totp'))
-        
-        secret = session['temp_totp_secret']
-        
-        if verify_totp_code(secret, totp_code):
-            # Generate backup codes
-            backup_codes = generate_backup_codes()
-            
-            try:
-                conn = get_db_connection()
-                cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE caretaker 
-                    SET totp_secret = %s, totp_enabled = TRUE, backup_codes = %s 
-                    WHERE caretaker_id = %s
-                ''', (secret, json.dumps(backup_codes), session['caretaker_id']))
-                conn.commit()
-                
-                # Clear temp secret
-                session.pop('temp_totp_secret', None)
-                
-                flash('TOTP enabled successfully!', 'success')
-                return render_template('totp_backup_codes.html', 
-                                     backup_codes=backup_codes, 
-                                     user_type='caretaker')
-                
-            except mysql.connector.Error as e:
-                flash('Error enabling TOTP. Please try again.', 'error')
-            finally:
-                if cursor:
-                    cursor.close()
-                if conn:
-                    conn.close()
-        else:
-            flash('Invalid TOTP code. Please try again.', 'error')
-    
-    # Generate new secret and QR code
-    secret = generate_totp_secret()
-    session['temp_totp_secret'] = secret
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT email FROM caretaker WHERE caretaker_id = %s", (session['caretaker_id'],))
-        caretaker = cursor.fetchone()
-        user_email = caretaker['email'] if caretaker else session['caretaker_id']
-    except:
-        user_email = session['caretaker_id']
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    qr_code = generate_qr_code(secret, user_email)
-    
-    return render_template('setup_totp.html', 
-                         qr_code=qr_code, 
-                         secret=secret,
-                         user_type='caretaker')
-
-@app.route('/caretaker/disable-totp', methods=['POST'])
-def caretaker_disable_totp():
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-    
-    password = request.form.get('password')
-    totp_code = request.form.get('totp_code')
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM caretaker WHERE caretaker_id = %s", (session['caretaker_id'],))
-        caretaker = cursor.fetchone()
-        
-        if not caretaker or caretaker['password'] != password:
-            flash('Incorrect password!', 'error')
-            return redirect(url_for('caretaker_profile'))
-        
-        if caretaker.get('totp_enabled') and not verify_totp_code(caretaker.get('totp_secret'), totp_code):
-            flash('Invalid TOTP code!', 'error')
-            return redirect(url_for('caretaker_profile'))
-        
-        cursor.execute('''
-            UPDATE caretaker 
-            SET totp_secret = NULL, totp_enabled = FALSE, backup_codes = NULL 
-            WHERE caretaker_id = %s
-        ''', (session['caretaker_id'],))
-        conn.commit()
-        
-        flash('TOTP disabled successfully!', 'success')
-        
-    except mysql.connector.Error as e:
-        flash('Error disabling TOTP. Please try again.', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(url_for('caretaker_profile'))
-
-@app.route('/caretaker/regenerate-backup-codes', methods=['POST'])
-def caretaker_regenerate_backup_codes():
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-    
-    password = request.form.get('password')
-    totp_code = request.form.get('totp_code')
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM caretaker WHERE caretaker_id = %s", (session['caretaker_id'],))
-        caretaker = cursor.fetchone()
-        
-        if not caretaker or caretaker['password'] != password:
-            flash('Incorrect password!', 'error')
-            return redirect(url_for('caretaker_profile'))
-        
-        if not caretaker.get('totp_enabled'):
-            flash('TOTP is not enabled!', 'error')
-            return redirect(url_for('caretaker_profile'))
-        
-        if not verify_totp_code(caretaker.get('totp_secret'), totp_code):
-            flash('Invalid TOTP code!', 'error')
-            return redirect(url_for('caretaker_profile'))
-        
-        # Generate new backup codes
-        backup_codes = generate_backup_codes()
-        
-        cursor.execute('''
-            UPDATE caretaker SET backup_codes = %s WHERE caretaker_id = %s
-        ''', (json.dumps(backup_codes), session['caretaker_id']))
-        conn.commit()
-        
-        flash('Backup codes regenerated successfully!', 'success')
-        return render_template('totp_backup_codes.html', 
-                             backup_codes=backup_codes, 
-                             user_type='caretaker')
-        
-    except mysql.connector.Error as e:
-        flash('Error regenerating backup codes. Please try again.', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(url_for('caretaker_profile'))
-
-@app.route('/doctor/search-patient', methods=['GET', 'POST'])
-def search_patient():
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
-
-    if request.method == 'POST':
-        aadhar_id = request.form['aadhar_id']
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute('''
-                SELECT p.*, 
-                       CASE WHEN pd.doctor_id IS NOT NULL THEN TRUE ELSE FALSE END as is_my_patient
-                FROM patients p 
-                LEFT JOIN patient_doctors pd ON p.aadhar_id = pd.patient_aadhar AND pd.doctor_id = %s
-                WHERE p.aadhar_id = %s
-            ''', (session['doctor_id'], aadhar_id))
-            patient = cursor.fetchone()
-            if patient:
-                if patient['is_my_patient']:
-                    
-                    session['verified_aadhar'] = aadhar_id
-                    flash('OTP verified successfully!', 'success')
-                    return redirect(url_for('patient_details'))
-                else:
-                    flash('This patient has not selected you as their doctor!', 'error')
-            else:
-                
-                
-                flash('Patient not found. Signup invitation sent!', 'warning')
-        except mysql.connector.Error as e:
-            print(f"Search patient error: {e}")
-            flash('Database error occurred', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
-    return render_template('patient_search.html')
-
-@app.route('/doctor/verify-otp', methods=['GET', 'POST'])
-def verify_otp():
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
-
-    if 'search_aadhar' not in session:
-        return redirect(url_for('search_patient'))
-
-    if request.method == 'POST':
-        otp = request.form['otp']
-        aadhar_id = session['search_aadhar']
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id FROM patient_otp 
-                WHERE aadhar_id = %s AND otp = %s AND expires_at > NOW() AND is_used = FALSE
-            ''', (aadhar_id, otp))
-            result = cursor.fetchone()
-            if result:
-                cursor.execute('UPDATE patient_otp SET is_used = TRUE WHERE id = %s', (result[0],))
-                conn.commit()
-                session['verified_aadhar'] = aadhar_id
-                flash('OTP verified successfully!', 'success')
-                return redirect(url_for('patient_details'))
-            else:
-                flash('Invalid or expired OTP!', 'error')
-        except mysql.connector.Error as e:
-            print(f"Verify OTP error: {e}")
-            flash('Database error occurred', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
-    return render_template('verify_otp.html')
-
-@app.route('/doctor/patient-details')
-def patient_details():
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
-
-    if 'verified_aadhar' not in session:
-        return redirect(url_for('search_patient'))
-
-    aadhar_id = session['verified_aadhar']
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM patients WHERE aadhar_id = %s', (aadhar_id,))
-        patient = cursor.fetchone()
-
-        # Get patient prescriptions (only from this doctor)
-        cursor.execute('''
-            SELECT p.*, d.name as doctor_name 
-            FROM prescriptions p 
-            JOIN doctors d ON p.doctor_id = d.doctor_id 
-            WHERE p.patient_aadhar = %s AND p.doctor_id = %s
-            ORDER BY p.prescription_date DESC
-        ''', (aadhar_id, session['doctor_id']))
-        prescriptions = cursor.fetchall()
-    except mysql.connector.Error as e:
-        print(f"Patient details error: {e}")
-        flash('Database error occurred', 'error')
-        patient = None
-        prescriptions = []
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
-    return render_template('patient_details.html', patient=patient, prescriptions=prescriptions)
-
-@app.route('/doctor/create-prescription', methods=['GET', 'POST'])
-def create_prescription():
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
-
-    if 'verified_aadhar' not in session:
-        return redirect(url_for('search_patient'))
-
-    if request.method == 'POST':
-        diagnosis = request.form.get('diagnosis')
-        instructions = request.form.get('instructions')
-        patient_aadhar = session['verified_aadhar']
-        doctor_id = session['doctor_id']
-        camera_photo = request.form.get('camera_photo')  # base64 data url if present
-
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            prescription_id = f"RX{random.randint(100000, 999999)}"
-
-            filename = None
-            file_path = None
-            file_type = None
-            file_size = 0
-            digital_signature = None
-
-            # File upload (optional)
-            if 'prescription_file' in request.files and request.files['prescription_file'].filename:
-                file = request.files['prescription_file']
-                if file and allowed_file(file.filename):
-                    filename = secure_filename(file.filename)
-                    unique_filename = f"{prescription_id}_{filename}"
-                    file_path = os.path.join(app.config['UPLOAD_FOLDER'], unique_filename)
-                    file_path = file_path.replace("\\", "/")
-                    file.save(file_path)
-                    file_size = os.path.getsize(file_path)
-                    file_type = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'unknown'
-                    digital_signature = generate_file_hash(file_path)
-                else:
-                    flash('Invalid file type. Allowed types: PNG, JPG, JPEG, GIF, PDF, DOC, DOCX', 'error')
-                    return redirect(request.url)
-
-            # Camera photo (optional)
-            elif camera_photo:
-                try:
-                    if camera_photo.startswith('data:image/'):
-                        header, base64_data = camera_photo.split(',', 1)
-                        if 'jpeg' in header or 'jpg' in header:
-                            file_type = 'jpg'
-                            filename = f"{prescription_id}_camera_photo.jpg"
-                        elif 'png' in header:
-                            file_type = 'png'
-                            filename = f"{prescription_id}_camera_photo.png"
-                        else:
-                            file_type = 'jpg'
-                            filename = f"{prescription_id}_camera_photo.jpg"
-
-                        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                        file_path = file_path.replace("\\", "/")
-
-                        image_data = base64.b64decode(base64_data)
-                        with open(file_path, 'wb') as f:
-                            f.write(image_data)
-
-                        file_size = os.path.getsize(file_path)
-                        digital_signature = generate_file_hash(file_path)
-                    else:
-                        flash('Invalid camera photo data', 'error')
-                        return redirect(request.url)
-                except Exception as e:
-                    flash(f'Error processing camera photo: {str(e)}', 'error')
-                    return redirect(request.url)
-
-            # Insert prescription record including digital_signature
-            cursor.execute('''
-                INSERT INTO prescriptions (prescription_id, patient_aadhar, doctor_id, 
-                diagnosis, file_name, file_path, file_type, file_size, digital_signature, instructions, prescription_date)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ''', (prescription_id, patient_aadhar, doctor_id, diagnosis, filename,
-                  file_path, file_type, file_size, digital_signature, instructions, datetime.now().date()))
-            conn.commit()
-
-            
-
-            flash(f'Prescription uploaded successfully! ID: {prescription_id}', 'success')
-            return redirect(url_for('patient_details'))
-
-        except mysql.connector.Error as e:
-            print(f"Create prescription DB error: {e}")
-            flash('Error creating prescription', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
-    return render_template('create_prescription.html')
-
-# -------------------- caretaker ROUTES -------------------- #
-
-@app.route('/caretaker/signup', methods=['GET', 'POST'])
-def caretaker_signup():
-    if request.method == 'POST':
-        name = request.form['name']
-        email = request.form['email']
-        password = request.form['password']
-        patient_aadhar = request.form['patient_aadhar']
-        phone = request.form['phone']
-        
-        # Auto-generate caretaker_id
-        caretaker_id = f"CT{random.randint(100000, 999999)}"
-
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            
-            # Check if patient exists
-            cursor.execute('SELECT * FROM patients WHERE aadhar_id = %s', (patient_aadhar,))
-            patient = cursor.fetchone()
-            
-            if not patient:
-                flash('Patient with this Aadhar ID not found! Patient must sign up first.', 'error')
-                return render_template('caretaker_signup.html')
-            
-            # Insert caretaker
-            cursor.execute('''
-                INSERT INTO caretaker (caretaker_id, name, email, password, phone)
-                VALUES (%s, %s, %s, %s, %s)
-            ''', (caretaker_id, name, email, password, phone))
-            
-            # Link caretaker to patient
-            cursor.execute('''
-                INSERT INTO caretaker_patients (caretaker_id, patient_aadhar)
-                VALUES (%s, %s)
-            ''', (caretaker_id, patient_aadhar))
-            
-            conn.commit()
-            flash('Caretaker registered successfully!', 'success')
-            return redirect(url_for('caretaker_login'))
-        except mysql.connector.Error as e:
-            flash('Error during registration. Email might already exist.', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
-    return render_template('caretaker_signup.html')
-
-@app.route('/caretaker/login', methods=['GET', 'POST'])
-def caretaker_login():
-    if request.method == 'POST':
-        email = request.form['email']
-        password = request.form['password']
-        totp_code = request.form.get('totp_code', '')
-        backup_code = request.form.get('backup_code', '')
-        
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute('SELECT * FROM caretaker WHERE email = %s', (email,))
-            caretaker = cursor.fetchone()
-            
-            if not caretaker:
-                flash('User not found! Please sign up first.', 'error')
-                return render_template('caretaker_login.html')
-            
-            if caretaker['password'] != password:
-                flash('Incorrect password!', 'error')
-                return render_template('caretaker_login.html')
-            
-            # Check if TOTP is enabled
-            if caretaker.get('totp_enabled', False):
-                # If TOTP is enabled but no code provided, show TOTP form
-                if not totp_code and not backup_code:
-                    return render_template("caretaker_login.html", show_totp=True, email=email)
-                
-                totp_secret = caretaker.get('totp_secret')
-                
-                # Try TOTP code first
-                if totp_code and verify_totp_code(totp_secret, totp_code):
-                    # TOTP verified successfully
-                    pass
-                elif backup_code:
-                    # Try backup code
-                    is_valid, updated_codes = verify_backup_code(caretaker.get('backup_codes'), backup_code)
-                    if is_valid:
-                        # Update backup codes in database
-                        cursor.execute("UPDATE caretaker SET backup_codes = %s WHERE caretaker_id = %s", 
-                                     (updated_codes, caretaker['caretaker_id']))
-                        conn.commit()
-                        flash("Backup code used successfully. Please consider regenerating backup codes.", "warning")
-                    else:
-                        flash("Invalid backup code!", "error")
-                        return render_template("caretaker_login.html", show_totp=True, email=email)
-                else:
-                    flash("Please enter TOTP code or backup code!", "error")
-                    return render_template("caretaker_login.html", show_totp=True, email=email)
-            
-            # Login successful
-            session['caretaker_id'] = caretaker['caretaker_id']
-            session['caretaker_name'] = caretaker['name']
-            session['user_type'] = 'caretaker'
-            flash('Login successful!', 'success')
-            return redirect(url_for('caretaker_dashboard'))
-                
-        except mysql.connector.Error as e:
-            print(f"Caretaker login error: {e}")
-            flash('Database error occurred', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-    
-    return render_template('caretaker_login.html')
-
-@app.route('/caretaker/dashboard')
-def caretaker_dashboard():
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get caretaker's patients
-        cursor.execute('''
-            SELECT p.*, cp.created_at as connected_date 
-            FROM caretaker_patients cp 
-            JOIN patients p ON cp.patient_aadhar = p.aadhar_id 
-            WHERE cp.caretaker_id = %s AND cp.is_active = TRUE
-        ''', (session['caretaker_id'],))
-        my_patients = cursor.fetchall()
-    except mysql.connector.Error as e:
-        flash('Database error occurred', 'error')
-        my_patients = []
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return render_template('caretaker_dashboard.html', my_patients=my_patients)
-
-@app.route('/caretaker/profile', methods=['GET', 'POST'])
-def caretaker_profile():
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-    
-    if request.method == 'POST':
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            name = request.form.get('name')
-            email = request.form.get('email')
-            phone = request.form.get('phone')
-            current_password = request.form.get('current_password')
-            new_password = request.form.get('new_password')
-            
-            if new_password:
-                cursor.execute('SELECT password FROM caretaker WHERE caretaker_id = %s', (session['caretaker_id'],))
-                result = cursor.fetchone()
-                if result and result[0] == current_password:
-                    cursor.execute('''
-                        UPDATE caretaker SET name=%s, email=%s, phone=%s, password=%s 
-                        WHERE caretaker_id=%s
-                    ''', (name, email, phone, new_password, session['caretaker_id']))
-                else:
-                    flash('Current password is incorrect!', 'error')
-                    return redirect(url_for('caretaker_profile'))
-            else:
-                cursor.execute('''
-                    UPDATE caretaker SET name=%s, email=%s, phone=%s 
-                    WHERE caretaker_id=%s
-                ''', (name, email, phone, session['caretaker_id']))
-            
-            conn.commit()
-            flash('Profile updated successfully!', 'success')
-            
-        except mysql.connector.Error as e:
-            flash('Error updating profile', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-        
-        return redirect(url_for('caretaker_profile'))
-    
-    # GET request
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM caretaker WHERE caretaker_id = %s', (session['caretaker_id'],))
-        caretaker = cursor.fetchone()
-    except mysql.connector.Error as e:
-        caretaker = None
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return render_template('caretaker_profile.html', caretaker=caretaker)
-
-@app.route('/caretaker/add-patient', methods=['POST'])
-def caretaker_add_patient():
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-    
-    patient_aadhar = request.form['patient_aadhar']
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Check if patient exists
-        cursor.execute('SELECT * FROM patients WHERE aadhar_id = %s', (patient_aadhar,))
-        patient = cursor.fetchone()
-        
-        if not patient:
-            flash('Patient with this Aadhar ID not found!', 'error')
-            return redirect(url_for('caretaker_dashboard'))
-        
-        # Check if already added
-        cursor.execute('''
-            SELECT id FROM caretaker_patients 
-            WHERE caretaker_id = %s AND patient_aadhar = %s
-        ''', (session['caretaker_id'], patient_aadhar))
-        existing = cursor.fetchone()
-        
-        if existing:
-            flash('Patient is already in your list!', 'warning')
-        else:
-            cursor.execute('''
-                INSERT INTO caretaker_patients (caretaker_id, patient_aadhar)
-                VALUES (%s, %s)
-            ''', (session['caretaker_id'], patient_aadhar))
-            conn.commit()
-            flash('Patient added successfully!', 'success')
-            
-    except mysql.connector.Error as e:
-        flash('Error adding patient', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(url_for('caretaker_dashboard'))
-
-@app.route('/caretaker/remove-patient/<patient_aadhar>')
-def caretaker_remove_patient(patient_aadhar):
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            DELETE FROM caretaker_patients 
-            WHERE caretaker_id = %s AND patient_aadhar = %s
-        ''', (session['caretaker_id'], patient_aadhar))
-        conn.commit()
-        flash('Patient removed successfully!', 'success')
-    except mysql.connector.Error as e:
-        flash('Error removing patient', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(url_for('caretaker_dashboard'))
-
-@app.route('/caretaker/patient-prescriptions/<patient_aadhar>')
-def caretaker_patient_prescriptions(patient_aadhar):
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        # Verify caretaker has access to this patient
-        cursor.execute("""
-            SELECT cp.*, p.name as patient_name 
-            FROM caretaker_patients cp
-            JOIN patients p ON cp.patient_aadhar = p.aadhar_id
-            WHERE cp.caretaker_id = %s AND cp.patient_aadhar = %s AND cp.is_active = TRUE
-        """, (session['caretaker_id'], patient_aadhar))
-        access = cursor.fetchone()
-
-        if not access:
-            flash("You don't have access to this patient's records.", "error")
-            return redirect(url_for('caretaker_dashboard'))
-
-        # Get patient details
-        cursor.execute("SELECT * FROM patients WHERE aadhar_id = %s", (patient_aadhar,))
-        patient = cursor.fetchone()
-
-        # Get prescriptions
-        cursor.execute("""
-            SELECT p.*, d.name AS doctor_name, d.specialization
-            FROM prescriptions p
-            JOIN doctors d ON p.doctor_id = d.doctor_id
-            WHERE p.patient_aadhar = %s
-            ORDER BY p.prescription_date DESC
-        """, (patient_aadhar,))
-        prescriptions = cursor.fetchall()
-
-    except mysql.connector.Error as e:
-        flash("Database error", "error")
-        return redirect(url_for('caretaker_dashboard'))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
-    return render_template("caretaker_prescriptions.html", prescriptions=prescriptions, patient=patient)
-
-@app.route('/caretaker/search-prescriptions', methods=['GET', 'POST'])
-def search_prescriptions():
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-
-    if request.method == 'POST':
-        aadhar_id = request.form['aadhar_id']
-        return redirect(url_for('caretaker_patient_prescriptions', patient_aadhar=aadhar_id))
-
-    return render_template("search_prescriptions.html", prescriptions=[], patient=None)
-
-
-@app.route('/caretaker/verify-otp', methods=['GET', 'POST'])
-def caretaker_verify_otp():
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-
-    if 'caretaker_aadhar' not in session:
-        return redirect(url_for('search_prescriptions'))
-
-    aadhar_id = session['caretaker_aadhar']
-
-    if request.method == 'POST':
-        otp = request.form['otp']
-
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-
-            cursor.execute("""
-                SELECT id FROM patient_otp 
-                WHERE aadhar_id = %s AND otp = %s 
-                AND expires_at > NOW() AND is_used = FALSE
-            """, (aadhar_id, otp))
-
-            result = cursor.fetchone()
-
-            if result:
-                # Mark OTP as used
-                cursor.execute("UPDATE patient_otp SET is_used = TRUE WHERE id = %s", (result["id"],))
-                conn.commit()
-
-                # OTP verified → allow showing prescriptions
-                return redirect(url_for("caretaker_view_prescriptions"))
-
-            else:
-                flash("Invalid or expired OTP!", "error")
-
-        except mysql.connector.Error as e:
-            print("Verify OTP error:", e)
-            flash("Database error", "error")
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-
-    return render_template("caretaker_verify_otp.html")
-
-@app.route('/caretaker/view-prescriptions')
-def caretaker_view_prescriptions():
-    if 'user_type' not in session or session['user_type'] != 'caretaker':
-        return redirect(url_for('caretaker_login'))
-
-    if 'caretaker_aadhar' not in session:
-        return redirect(url_for('search_prescriptions'))
-
-    aadhar_id = session['caretaker_aadhar']
-
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        # Verify caretaker has access to this patient
-        cursor.execute("""
-            SELECT id FROM caretaker_patients 
-            WHERE caretaker_id = %s AND patient_aadhar = %s AND is_active = TRUE
-        """, (session['caretaker_id'], aadhar_id))
-        access = cursor.fetchone()
-
-        if not access:
-            flash("You don't have access to this patient's records.", "error")
-            return redirect(url_for('caretaker_dashboard'))
-
-        cursor.execute("SELECT * FROM patients WHERE aadhar_id = %s", (aadhar_id,))
-        patient = cursor.fetchone()
-
-        cursor.execute("""
-            SELECT p.*, d.name AS doctor_name, d.specialization
-            FROM prescriptions p
-            JOIN doctors d ON p.doctor_id = d.doctor_id
-            WHERE p.patient_aadhar = %s
-            ORDER BY p.prescription_date DESC
-        """, (aadhar_id,))
-        prescriptions = cursor.fetchall()
-
-    except mysql.connector.Error as e:
-        flash("Database error", "error")
-        return redirect(url_for('caretaker_dashboard'))
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
-    return render_template("search_prescriptions.html", prescriptions=prescriptions, patient=patient)
-
-
-# -------------------- VERIFY SIGNATURE ROUTE -------------------- #
-
-@app.route('/verify-signature/<int:prescription_id>')
-def verify_signature(prescription_id):
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT file_path, digital_signature FROM prescriptions WHERE id = %s", (prescription_id,))
-        record = cursor.fetchone()
-    except mysql.connector.Error as e:
-        print(f"Verify signature DB error: {e}")
-        record = None
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-
-    if not record or not record.get('file_path') or not os.path.exists(record['file_path']):
-        return jsonify({"status": "error", "message": "File not found"})
-
-    current_hash = generate_file_hash(record['file_path'])
-    if current_hash == record.get('digital_signature'):
-        return jsonify({"status": "verified", "message": "File integrity verified"})
-    else:
-        return jsonify({"status": "tampered", "message": "File integrity check failed"})
-def analyze_brain_signal(features):
-    global clf
-    
-    # Ensure features is a list of 85 numeric values
-    if isinstance(features, str):
-        # If string, try to parse as comma-separated values
-        try:
-            features = [float(x.strip()) for x in features.split(',')]
-        except:
-            return "Error: Invalid input format"
-    
-    # Convert to list if needed
-    if not isinstance(features, list):
-        features = list(features)
-    
-    # Validate feature count
-    if len(features) != 85:
-        return f"Error: Expected 85 features, got {len(features)}"
-    
-    # Ensure all values are numeric
-    try:
-        features = [float(f) for f in features]
-    except:
-        return "Error: All features must be numeric"
-    
-    # Make prediction
-    try:
-        Class = clf.predict([features])
-        
-        if Class[0] == 0:
-            result = "Normal"
-        elif Class[0] == 1:
-            result = "Pre-seizure"
-        elif Class[0] == 2:
-            result = "Seizure"
-        elif Class[0] == 3:
-            result = "Post-seizure"
-        else:
-            result = f"Unknown class: {Class[0]}"
-        
-        return result
-    except Exception as e:
-        return f"Error during prediction: {str(e)}"
-@app.route("/brain_signal_ai/<aadhar_id>", methods=["GET", "POST"])
-def brain_signal_ai(aadhar_id):
-    if request.method == "POST":
-        
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-
-        # Get patient's selected doctors
-        cursor.execute('''
-            SELECT d.*, pd.created_at as connected_date 
-            FROM patient_doctors pd 
-            JOIN doctors d ON pd.doctor_id = d.doctor_id 
-            WHERE pd.patient_aadhar = %s AND pd.is_active = TRUE
-        ''', (session['patient_aadhar'],))
-        selected_doctors = cursor.fetchall()
-        # ------------------------------
-        # MANUAL F1–F85 ENTRIES
-        # ------------------------------
-        manual_features = {}
-        for i in range(1, 86):   # F1 to F85
-            value = request.form.get(f"F{i}")
-            if value and value.strip() != "":
-                manual_features[f"F{i}"] = float(value.strip())
-
-        # If manual fields exist → process them
-        if manual_features:
-            result = analyze_brain_signal(list(manual_features.values()))
-            return render_template(
-                "brain_result.html",
-                result=result,
-                manual_features=manual_features,   # <-- PASS TO TEMPLATE
-                csv_preview=None,
-                features=list(manual_features.values()),
-                doctors=selected_doctors,
-                aadhar_id=aadhar_id
-            )
-
-        # ------------------------------
-        # TEXT-BASED INPUT
-        # ------------------------------
-        text = request.form.get("signal_text")
-        if text and text.strip() != "":
-            # Parse comma-separated values
-            try:
-                features = [float(x.strip()) for x in text.split(',')]
-                result = analyze_brain_signal(features)
-                return render_template(
-                    "brain_result.html",
-                    result=result,
-                    manual_features=None,
-                    csv_preview=None,
-                    features=features,
-                    doctors=selected_doctors,
-                    aadhar_id=aadhar_id
-                )
-            except Exception as e:
-                return f"Text input error: {str(e)}. Please provide 85 comma-separated numeric values."
-
-        # ------------------------------
-        # FILE UPLOAD (CSV)
-        # ------------------------------
-        file = request.files.get("signal_file")
-        if file and file.filename != "":
-            filename = file.filename.lower()
-
-            if filename.endswith(".csv"):
-                try:
-                    # Read file content
-                    file_content = file.read().decode("utf-8")
-                    
-                    # Parse CSV
-                    df = pd.read_csv(io.StringIO(file_content))
-                    
-                    # Extract first row
-                    row = df.iloc[0].to_dict()
-                    features = []
-                    for i in range(1, 86):
-                        key = f"F{i}"
-                        if key in row:
-                            features.append(float(row[key]))
-                        else:
-                            features.append(0.0)
-
-                    result = analyze_brain_signal(features)
-
-                    return render_template(
-                        "brain_result.html",
-                        result=result,
-                        csv_preview=df.to_html(
-                            classes="table table-bordered table-striped"
-                        ),
-                        features=features,       # <-- SEND ORDERED FEATURE VECTOR
-                        manual_features=None,
-                        doctors=selected_doctors,
-                        aadhar_id=aadhar_id
-                    )
-
-                except Exception as e:
-                    return f"CSV parse error: {str(e)}"
-
-        return "No data provided"
-
-    return render_template("brain_signal_ai.html", aadhar_id=aadhar_id)
-
-@app.route("/send_brain_report/<aadhar_id>", methods=["POST"])
-def send_brain_report(aadhar_id):
-    try:
-        doctor_email = request.form.get("doctor_email")
-        result = request.form.get("result")
-        features = request.form.get("features")
-        graph_image = request.form.get("graph_image")  # Base64 encoded graph image
-
-        if not doctor_email:
-            flash("Please select a doctor to send the report.", "error")
-            return redirect(request.referrer or url_for('patient_dashboard'))
-
-        # Store report in database with graph image
-        query = """
-            INSERT INTO brain_reports (aadhar_id, doctor_email, result, features, graph_image)
-            VALUES (%s, %s, %s, %s, %s)
-        """
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        values = (aadhar_id, doctor_email, result, features, graph_image)
-        cursor.execute(query, values)
-        conn.commit()
-        cursor.close()
-        conn.close()
-
-        # OPTIONAL: Email to doctor
-        # send_email(doctor_email, "Brain Signal Report", f"Result:\n{result}")
-
-        flash("Brain signal report with EEG graph successfully sent to the doctor!", "success")
-        return render_template(
-            "success.html",
-            message="Brain signal report with EEG graph successfully sent to the doctor!"
-        )
-    except Exception as e:
-        flash(f"Error sending report: {str(e)}", "error")
-        return redirect(request.referrer or url_for('patient_dashboard'))
-
-
-# -------------------- PROFILE MANAGEMENT ROUTES -------------------- #
-
-@app.route('/patient/profile', methods=['GET', 'POST'])
-def patient_profile():
-    if 'user_type' not in session or session['user_type'] != 'patient':
-        return redirect(url_for('patient_login'))
-    
-    if request.method == 'POST':
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get form data
-            name = request.form.get('name')
-            email = request.form.get('email')
-            phone = request.form.get('phone')
-            address = request.form.get('address')
-            emergency_contact = request.form.get('emergency_contact')
-            current_password = request.form.get('current_password')
-            new_password = request.form.get('new_password')
-            
-            # Verify current password if changing password
-            if new_password:
-                cursor.execute('SELECT password FROM patients WHERE aadhar_id = %s', (session['patient_aadhar'],))
-                result = cursor.fetchone()
-                if result and result[0] == current_password:
-                    cursor.execute('''
-                        UPDATE patients SET name=%s, email=%s, phone=%s, address=%s, 
-                        emergency_contact=%s, password=%s WHERE aadhar_id=%s
-                    ''', (name, email, phone, address, emergency_contact, new_password, session['patient_aadhar']))
-                else:
-                    flash('Current password is incorrect!', 'error')
-                    return redirect(url_for('patient_profile'))
-            else:
-                cursor.execute('''
-                    UPDATE patients SET name=%s, email=%s, phone=%s, address=%s, 
-                    emergency_contact=%s WHERE aadhar_id=%s
-                ''', (name, email, phone, address, emergency_contact, session['patient_aadhar']))
-            
-            conn.commit()
-            flash('Profile updated successfully!', 'success')
-            
-        except mysql.connector.Error as e:
-            print(f"Profile update error: {e}")
-            flash('Error updating profile', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-        
-        return redirect(url_for('patient_profile'))
-    
-    # GET request - show profile
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM patients WHERE aadhar_id = %s', (session['patient_aadhar'],))
-        patient = cursor.fetchone()
-    except mysql.connector.Error as e:
-        print(f"Profile fetch error: {e}")
-        patient = None
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return render_template('patient_profile.html', patient=patient)
-
-@app.route('/doctor/profile', methods=['GET', 'POST'])
-def doctor_profile():
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
-    
-    if request.method == 'POST':
-        try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get form data
-            name = request.form.get('name')
-            email = request.form.get('email')
-            phone = request.form.get('phone')
-            specialization = request.form.get('specialization')
-            current_password = request.form.get('current_password')
-            new_password = request.form.get('new_password')
-            
-            # Verify current password if changing password
-            if new_password:
-                cursor.execute('SELECT password FROM doctors WHERE doctor_id = %s', (session['doctor_id'],))
-                result = cursor.fetchone()
-                if result and result[0] == current_password:
-                    cursor.execute('''
-                        UPDATE doctors SET name=%s, email=%s, phone=%s, specialization=%s, 
-                        password=%s WHERE doctor_id=%s
-                    ''', (name, email, phone, specialization, new_password, session['doctor_id']))
-                else:
-                    flash('Current password is incorrect!', 'error')
-                    return redirect(url_for('doctor_profile'))
-            else:
-                cursor.execute('''
-                    UPDATE doctors SET name=%s, email=%s, phone=%s, specialization=%s 
-                    WHERE doctor_id=%s
-                ''', (name, email, phone, specialization, session['doctor_id']))
-            
-            conn.commit()
-            flash('Profile updated successfully!', 'success')
-            
-        except mysql.connector.Error as e:
-            print(f"Profile update error: {e}")
-            flash('Error updating profile', 'error')
-        finally:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-        
-        return redirect(url_for('doctor_profile'))
-    
-    # GET request - show profile
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute('SELECT * FROM doctors WHERE doctor_id = %s', (session['doctor_id'],))
-        doctor = cursor.fetchone()
-    except mysql.connector.Error as e:
-        print(f"Profile fetch error: {e}")
-        doctor = None
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return render_template('doctor_profile.html', doctor=doctor)
-
-# -------------------- DELETE ROUTES -------------------- #
-
-@app.route('/patient/delete-prescription/<int:prescription_id>', methods=['POST'])
-def delete_prescription(prescription_id):
-    if 'user_type' not in session or session['user_type'] != 'patient':
-        return redirect(url_for('patient_login'))
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get prescription details to delete file
-        cursor.execute('SELECT file_path, patient_aadhar FROM prescriptions WHERE id = %s', (prescription_id,))
-        prescription = cursor.fetchone()
-        
-        if prescription and prescription['patient_aadhar'] == session['patient_aadhar']:
-            # Delete file if exists
-            if prescription['file_path'] and os.path.exists(prescription['file_path']):
-                try:
-                    os.remove(prescription['file_path'])
-                except:
-                    pass
-            
-            # Delete from database
-            cursor.execute('DELETE FROM prescriptions WHERE id = %s', (prescription_id,))
-            conn.commit()
-            flash('Prescription deleted successfully!', 'success')
-        else:
-            flash('Unauthorized to delete this prescription!', 'error')
-            
-    except mysql.connector.Error as e:
-        print(f"Delete prescription error: {e}")
-        flash('Error deleting prescription', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(url_for('patient_dashboard'))
-
-@app.route('/doctor/delete-report/<int:report_id>', methods=['POST'])
-def delete_report(report_id):
-    if 'user_type' not in session or session['user_type'] != 'doctor':
-        return redirect(url_for('doctor_login'))
-    
-    try:
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        
-        # Get doctor's email
-        cursor.execute('SELECT email FROM doctors WHERE doctor_id = %s', (session['doctor_id'],))
-        doctor = cursor.fetchone()
-        
-        if doctor:
-            # Delete report only if it belongs to this doctor
-            cursor.execute('DELETE FROM brain_reports WHERE id = %s AND doctor_email = %s', 
-                         (report_id, doctor['email']))
-            conn.commit()
-            
-            if cursor.rowcount > 0:
-                flash('Report deleted successfully!', 'success')
-            else:
-                flash('Report not found or unauthorized!', 'error')
-        else:
-            flash('Doctor not found!', 'error')
-            
-    except mysql.connector.Error as e:
-        print(f"Delete report error: {e}")
-        flash('Error deleting report', 'error')
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
-    
-    return redirect(request.referrer or url_for('doctor_dashboard'))
-
-# -------------------- LOGOUT -------------------- #
-
-@app.route('/logout')
-def logout():
-    session.clear()
-    flash('Logged out successfully!', 'success')
-    return redirect(url_for('index'))
-
-# -------------------- RUN APP -------------------- #
-
-if __name__ == '__main__':
-    # Ensure DB exists (safe) and then alter prescriptions table if needed
-    setup_database()
-    alter_tables()  # preserve previous alterations (safe)
-    alter_tables_for_digital_signature()  # ensure digital_signature column exists
+if __name__ == '__main__':
+    # Ensure DB exists and every column/index is in place (safe to repeat)
+    migrate()
     
     # Get configuration from environment
     host = os.getenv('HOST', '0.0.0.0')
     port = int(os.getenv('PORT', 5000))
     debug = not IS_PRODUCTION
     
-    app.run(host=host, port=port, debug=debug)
-
-if __name__ == '__main__':
-    setup_database()
-    alter_tables()
-    alter_tables_for_digital_signature()
-    alter_tables_for_totp()
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # The debug reloader re-imports the app; let it initialise lazily
+    create_app(warm=not debug).run(host=host, port=port, debug=debug)
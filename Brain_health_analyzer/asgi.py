@@ -0,0 +1,75 @@
+"""
+ASGI entry point for running the app under an event-loop server.
+
+Run from the repository root (paths such as the model file are resolved
+relative to it):
+
+    uvicorn asgi:application --app-dir Brain_health_analyzer --port 5000
+
+The event loop holds every open client connection, while the Flask views
+run on a bounded thread pool and share the MySQL connection pool from
+app.py. A single process can therefore keep hundreds of dashboard requests
+in flight with only ASGI_THREADS of them touching the database at once.
+
+uvicorn --workers N starts N copies of this module with the same
+environment, so do not set one ID_WORKER for all of them: unset, each
+worker takes its id worker number from its pid and warns (see ids.py).
+"""
+
+import inspect
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import asgiref
+from asgiref.sync import SyncToAsync
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+from app import create_app
+
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 32))
+
+_executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi-view')
+
+# The synchronous body of WsgiToAsgiInstance.run_wsgi_app, and the
+# (app, duplicate_header_limit) constructor. Both are asgiref internals as
+# of the version pinned in requirements.txt (older ones lack the header
+# limit); refuse to start on any other shape instead of failing every request.
+try:
+    _run_wsgi_app = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+    inspect.signature(WsgiToAsgiInstance).bind(None, duplicate_header_limit=100)
+except (KeyError, AttributeError, TypeError) as e:
+    raise ImportError(f"asgi.py needs the asgiref pinned in requirements.txt, "
+                      f"found asgiref {asgiref.__version__}") from e
+
+
+class _PooledWsgiInstance(WsgiToAsgiInstance):
+    """Runs each request on the shared view pool.
+
+    The stock instance uses thread_sensitive=True, which funnels every
+    request through one thread and serialises the whole app.
+    """
+
+    async def run_wsgi_app(self, body):
+        await SyncToAsync(_run_wsgi_app, thread_sensitive=False, executor=_executor)(self, body)
+
+
+class ConcurrentWsgiToAsgi(WsgiToAsgi):
+    """WSGI-to-ASGI adapter with lifespan support and a bounded view pool."""
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    _executor.shutdown(wait=True)
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+
+        await _PooledWsgiInstance(self.wsgi_application, self.duplicate_header_limit)(
+            scope, receive, send
+        )
+
+
+application = ConcurrentWsgiToAsgi(create_app())
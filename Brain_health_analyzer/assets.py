@@ -0,0 +1,167 @@
+"""
+Fingerprinted static assets.
+
+build() copies every file under static/ (except uploads/ and the output
+directory) to static/dist/<name>.<sha256[:12]>.<ext>, writes gzip and,
+when the brotli package is installed, brotli versions next to each copy,
+and records logical name -> fingerprinted name in manifest.json.
+Relative url() references in CSS (fonts, images) are rewritten to the
+fingerprinted names, so a stylesheet's hash also covers what it loads.
+
+Templates call asset_url('style.css'). A changed file gets a new URL, so
+every fingerprinted URL can be cached by browsers forever
+(Cache-Control: immutable). Without a manifest (development) asset_url
+falls back to the plain static URL with a content-hash query string,
+recomputed when the file's mtime changes.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # .br variants are skipped
+
+DIST_DIR = 'dist'
+MANIFEST = 'manifest.json'
+SKIP_DIRS = {'uploads', DIST_DIR}
+COMPRESSIBLE = {'.css', '.js', '.svg', '.json', '.txt', '.html', '.map', '.ttf', '.woff', '.eot'}
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+CSS_URL = re.compile(r"""url\(\s*(['"]?)([^'")]+)\1\s*\)""")
+
+# (encoding, suffix) in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def _digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _fingerprinted(logical, digest):
+    stem, ext = os.path.splitext(logical)
+    return f"{stem}.{digest[:12]}{ext}"
+
+
+def _write(path, data):
+    # Several workers may build at once; readers only ever see whole files
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as out:
+        out.write(data)
+    os.replace(temp_path, path)
+
+
+def _publish(data, target):
+    if os.path.splitext(target)[1].lower() in COMPRESSIBLE:
+        _write(target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(target + '.br', brotli.compress(data, quality=11))
+    # The plain file goes last; its presence marks the asset as built
+    _write(target, data)
+
+
+def rewrite_css_urls(css, logical, manifest):
+    """Point relative url()s in the stylesheet at logical at their fingerprinted names."""
+    base = posixpath.dirname(logical)
+
+    def replace(match):
+        path, suffix = re.match(r'([^?#]*)(.*)', match.group(2).strip()).groups()
+        if ':' in path or path.startswith('/') or not path:
+            return match.group(0)  # absolute, data: or fragment-only
+        target = posixpath.normpath(posixpath.join(base, path))
+        if target not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[target], posixpath.join(DIST_DIR, base))
+        return f'url({relative}{suffix})'
+
+    return CSS_URL.sub(replace, css)
+
+
+def build(static_folder):
+    """Fingerprint and precompress every static asset. Returns the manifest."""
+    dist = os.path.join(static_folder, DIST_DIR)
+    sources = {}
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder:
+            dirs[:] = [d for d in dirs if d not in SKIP_DIRS]
+        for name in files:
+            source = os.path.join(root, name)
+            sources[os.path.relpath(source, static_folder).replace(os.sep, '/')] = source
+
+    # Stylesheets last: their content depends on the names of what they load
+    manifest = {}
+    for logical in sorted(sources, key=lambda name: name.endswith('.css')):
+        with open(sources[logical], 'rb') as f:
+            data = f.read()
+        if logical.endswith('.css'):
+            data = rewrite_css_urls(data.decode('utf-8'), logical, manifest).encode('utf-8')
+        target_name = _fingerprinted(logical, hashlib.sha256(data).hexdigest())
+        target = os.path.join(dist, target_name)
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            _publish(data, target)
+        manifest[logical] = f"{DIST_DIR}/{target_name}"
+
+    os.makedirs(dist, exist_ok=True)
+    _write(os.path.join(dist, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class Assets:
+    """Resolves logical asset names to cacheable URLs for one app.
+
+    With build=True the manifest is built on first use (or ensure_built()).
+    """
+
+    def __init__(self, static_folder, manifest=None, build=False):
+        self.static_folder = static_folder
+        self.manifest = manifest
+        self._build = build
+        self._build_lock = threading.Lock()
+        self._dev_hashes = {}
+
+    def ensure_built(self):
+        if self._build and self.manifest is None:
+            with self._build_lock:
+                if self.manifest is None:
+                    self.manifest = build(self.static_folder)
+        return self.manifest
+
+    def path_for(self, logical):
+        """Static-relative path to link for logical, plus a query version or None."""
+        manifest = self.ensure_built()
+        if manifest is not None and logical in manifest:
+            return manifest[logical], None
+
+        # Unbuilt or new file: version by content, cached per mtime
+        source = os.path.join(self.static_folder, logical)
+        try:
+            mtime = os.stat(source).st_mtime_ns
+        except FileNotFoundError:
+            return logical, None
+        cached = self._dev_hashes.get(logical)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, _digest(source)[:12])
+            self._dev_hashes[logical] = cached
+        return logical, cached[1]
+
+
+def negotiate(dist_path, accept_encoding):
+    """Pick a precompressed variant of dist_path the client accepts.
+
+    Returns (path, encoding) with encoding None for the plain file.
+    """
+    for encoding, suffix in ENCODINGS:
+        if encoding in accept_encoding and os.path.exists(dist_path + suffix):
+            return dist_path + suffix, encoding
+    return dist_path, None
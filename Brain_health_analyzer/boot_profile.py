@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Import-time profile of the app, checked against a boot budget.
+
+Run from the repository root:
+
+    python Brain_health_analyzer/boot_profile.py --budget-ms 1000 --output boot_profile.json
+
+Imports app.py in a fresh interpreter with `python -X importtime`, prints
+the slowest modules by cumulative time and writes them (with the total) as
+JSON for tracking between releases. Exits with status 1 when the import
+takes longer than the budget (BOOT_BUDGET_MS). Heavy libraries (sklearn,
+pandas, PIL/qrcode) are imported lazily and should not show up here.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BUDGET_MS = float(os.getenv('BOOT_BUDGET_MS', 1000))
+HEAVY_MODULES = ('sklearn', 'pandas', 'scipy', 'joblib', 'PIL', 'qrcode')
+
+
+def parse_importtime(stderr):
+    """{module: (self_us, cumulative_us)} from -X importtime output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def profile(python=sys.executable):
+    """Import app in a subprocess. Returns (modules, wall_ms, loaded heavy modules)."""
+    code = (f"import sys; sys.path.insert(0, {APP_DIR!r}); import app; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    start = time.perf_counter()
+    result = subprocess.run([python, '-X', 'importtime', '-c', code], capture_output=True,
+                            text=True, cwd=os.path.dirname(APP_DIR), check=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    heavy = [name for name in result.stdout.strip().splitlines()[-1].split(',') if name] \
+        if result.stdout.strip() else []
+    return parse_importtime(result.stderr), wall_ms, heavy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--output', help='write the profile as JSON')
+    args = parser.parse_args(argv)
+
+    modules, wall_ms, heavy = profile()
+    import_ms = modules.get('app', (0, 0))[1] / 1000
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for name, (self_us, cumulative_us) in slowest:
+        print(f"{cumulative_us / 1000:10.1f}ms {self_us / 1000:8.1f}ms  {name}")
+    print(f"\nimport app: {import_ms:.0f} ms (interpreter total {wall_ms:.0f} ms), budget {args.budget_ms:.0f} ms")
+    if heavy:
+        print(f"Heavy modules loaded at import: {', '.join(heavy)}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'import_ms': round(import_ms, 1),
+                'wall_ms': round(wall_ms, 1),
+                'budget_ms': args.budget_ms,
+                'heavy_modules': heavy,
+                'slowest': [{'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+                            for name, (self_us, cumulative_us) in slowest],
+            }, f, indent=2)
+
+    if import_ms > args.budget_ms:
+        print("Over budget.")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,292 @@
+"""
+Bulk import of patients, doctors and caretakers from CSV or JSONL.
+
+    flask --app Brain_health_analyzer/app.py import-accounts patient patients.csv
+
+The file is streamed in chunks of --batch-size rows. Each chunk is
+validated with column-wise pandas checks (no per-row Python loop), and
+its valid rows are written in one transaction with executemany(), which
+mysql-connector sends as a multi-row INSERT. Rows whose key already exists
+are left untouched, so running an import twice is harmless. A row whose
+email already belongs to another account is rejected (emails are looked
+up with one IN (...) query per chunk), as is a chunk the database refuses.
+
+Doctors and caretakers without an id get a generated one, as at signup
+(give ids in the file if a re-run must recognise those rows).
+
+A patient row may list doctor_ids and a caretaker row patient_aadhars
+(';'-separated). The referenced accounts are looked up with one IN (...)
+query per chunk and the links go into patient_doctors/caretaker_patients
+in the same transaction; unknown ids are counted and reported.
+
+Rejected rows (without the password) go to <file>.rejects.csv with the
+reason. After every committed chunk the number of input rows done is
+written to <file>.import-state.json, and a re-run resumes after them.
+
+LOAD DATA LOCAL INFILE is not used: it needs local_infile enabled on
+both server and client, and passwords must be hashed here anyway.
+"""
+
+import json
+import os
+import time
+from collections import namedtuple
+
+import pandas as pd
+
+import accounts
+import db
+import ids
+import passwords
+
+COLUMNS = {
+    'patient': ('aadhar_id', 'name', 'email', 'password', 'phone', 'date_of_birth',
+                'address', 'blood_group', 'emergency_contact'),
+    'doctor': ('doctor_id', 'name', 'email', 'password', 'specialization', 'license_number', 'phone'),
+    'caretaker': ('caretaker_id', 'name', 'email', 'password', 'phone'),
+}
+
+# Column sizes from the schema in app.setup_database()
+MAX_LENGTH = {
+    'name': 100, 'email': 100, 'phone': 15, 'blood_group': 5, 'emergency_contact': 15,
+    'specialization': 100, 'license_number': 50, 'doctor_id': 20, 'caretaker_id': 20,
+}
+
+BLOOD_GROUPS = {'A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-'}
+
+ID_PATTERN = {
+    'patient': r'\d{12}',
+    'doctor': r'[A-Za-z0-9_-]+',
+    'caretaker': r'[A-Za-z0-9_-]+',
+}
+
+EMAIL_PATTERN = r'[^@\s]+@[^@\s]+\.[^@\s]+'
+
+# Generated when the file has no id (patients always bring their Aadhar)
+ID_PREFIX = {'doctor': 'DR', 'caretaker': 'CT'}
+
+LINK_SEPARATOR = ';'
+
+# A column listing accounts of another role to link each row to
+Link = namedtuple('Link', 'column role insert')
+
+LINKS = {
+    'patient': Link('doctor_ids', 'doctor', '''
+        INSERT INTO patient_doctors (patient_aadhar, doctor_id) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE is_active = TRUE
+    '''),
+    'caretaker': Link('patient_aadhars', 'patient', '''
+        INSERT INTO caretaker_patients (caretaker_id, patient_aadhar) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE is_active = TRUE
+    '''),
+}
+
+
+def required_columns(role):
+    if role in ID_PREFIX:
+        return ('name', 'email', 'password')
+    return (accounts.ROLES[role].id_column, 'name', 'email', 'password')
+
+
+def detect_format(path):
+    return 'jsonl' if path.lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_chunks(path, chunk_size, skip=0, fmt=None):
+    """DataFrames of at most chunk_size rows, all values as stripped strings.
+
+    The first skip data rows are not returned (resuming an import).
+    """
+    if (fmt or detect_format(path)) == 'csv':
+        chunks = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_size,
+                             skiprows=range(1, skip + 1))
+    else:
+        chunks = _skip_rows(pd.read_json(path, lines=True, dtype=False, convert_dates=False,
+                                         chunksize=chunk_size), skip)
+    for chunk in chunks:
+        yield chunk.fillna('').astype(str).apply(lambda column: column.str.strip())
+
+
+def _skip_rows(chunks, skip):
+    for chunk in chunks:
+        if skip >= len(chunk):
+            skip -= len(chunk)
+            continue
+        yield chunk.iloc[skip:]
+        skip = 0
+
+
+def validate(role, frame):
+    """Split a chunk into (valid rows, rejected rows with a 'reason' column).
+
+    Valid rows have every known column; empty optional values become None.
+    """
+    missing = [c for c in required_columns(role) if c not in frame.columns]
+    if missing:
+        raise ValueError(f"{role} import needs column(s): {', '.join(missing)}")
+
+    link = LINKS.get(role)
+    columns = list(COLUMNS[role]) + ([link.column] if link else [])
+    frame = frame.reindex(columns=columns, fill_value='')
+    id_column = accounts.ROLES[role].id_column
+    reasons = pd.Series('', index=frame.index)
+
+    def reject(mask, reason):
+        reasons[mask & (reasons == '')] = reason
+
+    if role in ID_PREFIX:
+        unnamed = frame[id_column] == ''
+        frame.loc[unnamed, id_column] = [ids.new(ID_PREFIX[role]) for _ in range(unnamed.sum())]
+    for column in required_columns(role):
+        reject(frame[column] == '', f'missing {column}')
+    reject(~frame[id_column].str.fullmatch(ID_PATTERN[role]), f'invalid {id_column}')
+    reject(~frame['email'].str.fullmatch(EMAIL_PATTERN), 'invalid email')
+    for column, limit in MAX_LENGTH.items():
+        if column in frame.columns:
+            reject(frame[column].str.len() > limit, f'{column} longer than {limit}')
+    if 'blood_group' in frame.columns:
+        reject((frame['blood_group'] != '') & ~frame['blood_group'].str.upper().isin(BLOOD_GROUPS),
+               'invalid blood_group')
+        frame['blood_group'] = frame['blood_group'].str.upper()
+    if 'date_of_birth' in frame.columns:
+        born = pd.to_datetime(frame['date_of_birth'], format='%Y-%m-%d', errors='coerce')
+        reject((frame['date_of_birth'] != '') & born.isna(), 'invalid date_of_birth')
+    reject(frame[id_column].duplicated(), f'duplicate {id_column} in file')
+    # caretaker.email is UNIQUE, and doctors are found by email when reports are sent
+    reject(frame['email'].str.lower().duplicated(), 'duplicate email in file')
+
+    rejected = frame[reasons != ''].drop(columns='password').assign(reason=reasons[reasons != ''])
+    valid = frame[reasons == '']
+    return valid.astype(object).where(valid != '', None), rejected
+
+
+def reject_taken_emails(role, valid):
+    """Split off rows whose email already belongs to an account with another id."""
+    if valid.empty:
+        return valid, valid.iloc[:0].drop(columns='password').assign(reason='')
+    spec = accounts.ROLES[role]
+    owners = {row['email'].lower(): row[spec.id_column] for row in db.fetch_in(
+        f'SELECT {spec.id_column}, email FROM {spec.table} WHERE email IN ({{keys}})',
+        valid['email'].tolist())}
+    owner = valid['email'].str.lower().map(owners)
+    taken = owner.notna() & (owner != valid[spec.id_column])
+    rejected = valid[taken].drop(columns='password').assign(reason='email already used by another account')
+    return valid[~taken], rejected
+
+
+def insert_accounts(cursor, role, valid):
+    """Insert the chunk's accounts; existing keys are skipped. Returns rows inserted."""
+    spec = accounts.ROLES[role]
+    columns = COLUMNS[role]
+    rows = valid[list(columns)].assign(password=passwords.make_many(valid['password'].tolist()))
+    return db.execute_many(cursor, f'''
+        INSERT INTO {spec.table} ({', '.join(columns)})
+        VALUES ({', '.join(['%s'] * len(columns))})
+        ON DUPLICATE KEY UPDATE {spec.id_column} = {spec.id_column}
+    ''', list(rows.itertuples(index=False, name=None)))
+
+
+def link_pairs(role, valid):
+    """(account id, linked id) pairs listed in the chunk, and the ids that do not exist."""
+    link = LINKS.get(role)
+    if link is None or valid.empty:
+        return [], set()
+    id_column = accounts.ROLES[role].id_column
+    listed = valid[[id_column, link.column]].dropna()
+    listed = listed.assign(**{link.column: listed[link.column].str.split(LINK_SEPARATOR)}).explode(link.column)
+    listed[link.column] = listed[link.column].str.strip()
+    listed = listed[listed[link.column] != ''].drop_duplicates()
+    if listed.empty:
+        return [], set()
+
+    target = accounts.ROLES[link.role]
+    found = {row[target.id_column] for row in db.fetch_in(
+        f'SELECT {target.id_column} FROM {target.table} WHERE {target.id_column} IN ({{keys}})',
+        listed[link.column].tolist())}
+    known = listed[link.column].isin(found)
+    return (list(listed[known].itertuples(index=False, name=None)),
+            set(listed.loc[~known, link.column]))
+
+
+class Checkpoint:
+    """Input rows already imported, kept next to the input file."""
+
+    def __init__(self, path, role):
+        self.path = path
+        self.role = role
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if state.get('role') != self.role:
+            raise ValueError(f"{self.path} belongs to a {state.get('role')} import")
+        return state['rows_done']
+
+    def save(self, rows_done):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'role': self.role, 'rows_done': rows_done}, f)
+        os.replace(tmp, self.path)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def import_file(role, path, batch_size=None, fmt=None, restart=False, progress=None):
+    """Import every row of path as role accounts. Returns the totals as a dict."""
+    batch_size = batch_size or db.BATCH_SIZE
+    checkpoint = Checkpoint(path + '.import-state.json', role)
+    rejects_path = path + '.rejects.csv'
+    if restart:
+        checkpoint.clear()
+    done = checkpoint.load()
+    if done == 0 and os.path.exists(rejects_path):
+        os.remove(rejects_path)
+    link = LINKS.get(role)
+
+    totals = dict(resumed_at=done, read=0, inserted=0, existing=0, rejected=0,
+                  linked=0, unknown_links=set())
+    start = time.perf_counter()
+    for chunk in read_chunks(path, batch_size, skip=done, fmt=fmt):
+        valid, rejected = validate(role, chunk)
+        linked = 0
+        try:
+            valid, taken = reject_taken_emails(role, valid)
+            rejected = pd.concat([rejected, taken])
+            # Every remaining row is inserted or already present under its id
+            pairs, unknown = link_pairs(role, valid)
+
+            with db.transaction() as cursor:
+                inserted = insert_accounts(cursor, role, valid) if not valid.empty else 0
+                if pairs:
+                    linked = db.execute_many(cursor, link.insert, pairs)
+        except db.Error as e:
+            failed = valid.drop(columns='password').assign(reason=f'database error: {e}')
+            rejected = pd.concat([rejected, failed])
+            valid = valid.iloc[:0]
+            inserted = linked = 0
+            unknown = set()
+
+        if not rejected.empty:
+            rejected.to_csv(rejects_path, mode='a', index=False, header=not os.path.exists(rejects_path))
+        done += len(chunk)
+        checkpoint.save(done)
+
+        totals['read'] += len(chunk)
+        totals['inserted'] += inserted
+        totals['existing'] += len(valid) - inserted
+        totals['linked'] += linked
+        totals['rejected'] += len(rejected)
+        totals['unknown_links'] |= unknown
+        if progress:
+            elapsed = time.perf_counter() - start
+            progress(f"{done} rows done, {totals['read'] / elapsed:.0f} rows/s")
+
+    totals['seconds'] = time.perf_counter() - start
+    totals['rejects_path'] = rejects_path if totals['rejected'] else None
+    checkpoint.clear()
+    return totals
@@ -0,0 +1,337 @@
+"""
+Caretaker routes: signup/login, dashboard, the patients they look after
+and those patients' prescriptions.
+"""
+
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+
+import accounts
+import dashboard_data
+import db
+import ids
+import otp_store
+import passwords
+from app import account_changed, rate_limited, revoke_sessions, role_required, rotate_session, session_user_key
+from totp_views import check_second_factor
+
+bp = Blueprint('caretaker', __name__)
+
+# A patient's prescriptions with the prescribing doctor
+PRESCRIPTIONS_QUERY = f"""
+    SELECT {dashboard_data.PRESCRIPTION_COLUMNS}, d.name AS doctor_name, d.specialization
+    FROM prescriptions p
+    JOIN doctors d ON p.doctor_id = d.doctor_id
+    WHERE p.patient_aadhar = %s
+    ORDER BY p.prescription_date DESC
+"""
+
+PATIENT_QUERY = f"SELECT {accounts.columns('patient', accounts.CARD)} FROM patients WHERE aadhar_id = %s"
+
+
+@bp.route('/caretaker/signup', methods=['GET', 'POST'])
+def signup():
+    if request.method == 'POST':
+        name = request.form['name']
+        email = request.form['email']
+        password = request.form['password']
+        patient_aadhar = request.form['patient_aadhar']
+        phone = request.form['phone']
+
+        # Auto-generate caretaker_id (time-ordered, unique without a lookup)
+        caretaker_id = ids.new('CT')
+
+        try:
+            with db.transaction(prepared=True) as cursor:
+                # Check if patient exists
+                cursor.execute('SELECT aadhar_id FROM patients WHERE aadhar_id = %s', (patient_aadhar,))
+                patient = db.first(cursor)
+
+                if not patient:
+                    flash('Patient with this Aadhar ID not found! Patient must sign up first.', 'error')
+                    return render_template('caretaker_signup.html')
+
+                # Insert caretaker
+                cursor.execute('''
+                    INSERT INTO caretaker (caretaker_id, name, email, password, phone)
+                    VALUES (%s, %s, %s, %s, %s)
+                ''', (caretaker_id, name, email, passwords.make(password), phone))
+
+                # Link caretaker to patient
+                cursor.execute('''
+                    INSERT INTO caretaker_patients (caretaker_id, patient_aadhar)
+                    VALUES (%s, %s)
+                ''', (caretaker_id, patient_aadhar))
+
+            accounts.invalidate('caretaker', caretaker_id)
+            flash('Caretaker registered successfully!', 'success')
+            return redirect(url_for('caretaker.login'))
+        except db.Error as e:
+            flash('Error during registration. Email might already exist.', 'error')
+
+    return render_template('caretaker_signup.html')
+
+
+@bp.route('/caretaker/login', methods=['GET', 'POST'])
+@rate_limited('login', lambda: request.form.get('email'), template='caretaker_login.html')
+def login():
+    if request.method == 'POST':
+        email = request.form['email']
+        password = request.form['password']
+        totp_code = request.form.get('totp_code', '')
+        backup_code = request.form.get('backup_code', '')
+
+        try:
+            with db.transaction(dictionary=True, prepared=True) as cursor:
+                caretaker = accounts.load(cursor, 'caretaker', email, column='email')
+
+                if not caretaker:
+                    flash('User not found! Please sign up first.', 'error')
+                    return render_template('caretaker_login.html')
+
+                if not accounts.password_matches(cursor, 'caretaker', caretaker['caretaker_id'],
+                                                 password, caretaker['password']):
+                    flash('Incorrect password!', 'error')
+                    return render_template('caretaker_login.html')
+
+                # If TOTP is enabled but no code provided, show TOTP form
+                if caretaker.get('totp_enabled', False) and not totp_code and not backup_code:
+                    return render_template("caretaker_login.html", show_totp=True, email=email)
+
+                error = check_second_factor(cursor, 'caretaker', caretaker, totp_code, backup_code)
+                if error:
+                    flash(error, "error")
+                    return render_template("caretaker_login.html", show_totp=True, email=email)
+
+            # Login successful
+            rotate_session()
+            session['caretaker_id'] = caretaker['caretaker_id']
+            session['caretaker_name'] = caretaker['name']
+            session['user_type'] = 'caretaker'
+            flash('Login successful!', 'success')
+            return redirect(url_for('caretaker.dashboard'))
+
+        except db.Error as e:
+            print(f"Caretaker login error: {e}")
+            flash('Database error occurred', 'error')
+
+    return render_template('caretaker_login.html')
+
+
+@bp.route('/caretaker/dashboard')
+@role_required('caretaker')
+def dashboard():
+    # Patients plus summary counts, one round trip
+    try:
+        with db.connection() as conn:
+            data = dashboard_data.caretaker_dashboard(conn, session['caretaker_id'])
+    except db.Error as e:
+        flash('Database error occurred', 'error')
+        data = {'my_patients': [], 'summary': {'recent_seizures': 0, 'prescriptions_this_month': 0}}
+
+    return render_template('caretaker_dashboard.html',
+                           my_patients=data['my_patients'],
+                           summary=data['summary'])
+
+
+@bp.route('/caretaker/profile', methods=['GET', 'POST'])
+@role_required('caretaker')
+def profile():
+    if request.method == 'POST':
+        name = request.form.get('name')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        current_password = request.form.get('current_password')
+        new_password = request.form.get('new_password')
+
+        try:
+            with db.transaction() as cursor:
+                changes = dict(name=name, email=email, phone=phone)
+
+                if new_password:
+                    cursor.execute('SELECT password FROM caretaker WHERE caretaker_id = %s', (session['caretaker_id'],))
+                    result = cursor.fetchone()
+                    if not (result and passwords.verify(current_password, result[0])[0]):
+                        flash('Current password is incorrect!', 'error')
+                        return redirect(url_for('caretaker.profile'))
+                    changes['password'] = passwords.make(new_password)
+
+                accounts.update(cursor, 'caretaker', session['caretaker_id'], **changes)
+
+            account_changed()
+            if new_password:
+                # Other browsers signed in with the old password are logged out
+                revoke_sessions(session_user_key(session))
+            flash('Profile updated successfully!', 'success')
+
+        except db.Error as e:
+            flash('Error updating profile', 'error')
+
+        return redirect(url_for('caretaker.profile'))
+
+    # GET request
+    try:
+        caretaker = accounts.get('caretaker', session['caretaker_id'], version=session.get('account_version', 0))
+    except db.Error as e:
+        caretaker = None
+
+    return render_template('caretaker_profile.html', caretaker=caretaker)
+
+
+@bp.route('/caretaker/add-patient', methods=['POST'])
+@role_required('caretaker')
+def add_patient():
+    patient_aadhar = request.form['patient_aadhar']
+
+    try:
+        with db.transaction(prepared=True) as cursor:
+            # Check if patient exists
+            cursor.execute('SELECT aadhar_id FROM patients WHERE aadhar_id = %s', (patient_aadhar,))
+            patient = db.first(cursor)
+
+            if not patient:
+                flash('Patient with this Aadhar ID not found!', 'error')
+                return redirect(url_for('caretaker.dashboard'))
+
+            # Check if already added
+            cursor.execute('''
+                SELECT id FROM caretaker_patients
+                WHERE caretaker_id = %s AND patient_aadhar = %s
+            ''', (session['caretaker_id'], patient_aadhar))
+            existing = db.first(cursor)
+
+            if not existing:
+                cursor.execute('''
+                    INSERT INTO caretaker_patients (caretaker_id, patient_aadhar)
+                    VALUES (%s, %s)
+                ''', (session['caretaker_id'], patient_aadhar))
+
+        if existing:
+            flash('Patient is already in your list!', 'warning')
+        else:
+            flash('Patient added successfully!', 'success')
+
+    except db.Error as e:
+        flash('Error adding patient', 'error')
+
+    return redirect(url_for('caretaker.dashboard'))
+
+
+@bp.route('/caretaker/remove-patient/<patient_aadhar>')
+@role_required('caretaker')
+def remove_patient(patient_aadhar):
+    try:
+        with db.transaction() as cursor:
+            cursor.execute('''
+                DELETE FROM caretaker_patients
+                WHERE caretaker_id = %s AND patient_aadhar = %s
+            ''', (session['caretaker_id'], patient_aadhar))
+        flash('Patient removed successfully!', 'success')
+    except db.Error as e:
+        flash('Error removing patient', 'error')
+
+    return redirect(url_for('caretaker.dashboard'))
+
+
+@bp.route('/caretaker/patient-prescriptions/<patient_aadhar>')
+@role_required('caretaker')
+def patient_prescriptions(patient_aadhar):
+    try:
+        with db.cursor(dictionary=True) as cursor:
+            # Verify caretaker has access to this patient
+            cursor.execute("""
+                SELECT cp.id, p.name as patient_name
+                FROM caretaker_patients cp
+                JOIN patients p ON cp.patient_aadhar = p.aadhar_id
+                WHERE cp.caretaker_id = %s AND cp.patient_aadhar = %s AND cp.is_active = TRUE
+            """, (session['caretaker_id'], patient_aadhar))
+            access = cursor.fetchone()
+
+            if not access:
+                flash("You don't have access to this patient's records.", "error")
+                return redirect(url_for('caretaker.dashboard'))
+
+            # Get patient details
+            cursor.execute(PATIENT_QUERY, (patient_aadhar,))
+            patient = cursor.fetchone()
+
+            cursor.execute(PRESCRIPTIONS_QUERY, (patient_aadhar,))
+            prescriptions = cursor.fetchall()
+
+    except db.Error as e:
+        flash("Database error", "error")
+        return redirect(url_for('caretaker.dashboard'))
+
+    return render_template("caretaker_prescriptions.html", prescriptions=prescriptions, patient=patient)
+
+
+@bp.route('/caretaker/search-prescriptions', methods=['GET', 'POST'])
+@role_required('caretaker')
+def search_prescriptions():
+    if request.method == 'POST':
+        aadhar_id = request.form['aadhar_id']
+        return redirect(url_for('caretaker.patient_prescriptions', patient_aadhar=aadhar_id))
+
+    return render_template("search_prescriptions.html", prescriptions=[], patient=None)
+
+
+@bp.route('/caretaker/verify-otp', methods=['GET', 'POST'])
+@rate_limited('otp', lambda: session.get('caretaker_aadhar'), redirect_endpoint='caretaker.search_prescriptions')
+@role_required('caretaker')
+def verify_otp():
+    if 'caretaker_aadhar' not in session:
+        return redirect(url_for('caretaker.search_prescriptions'))
+
+    aadhar_id = session['caretaker_aadhar']
+
+    if request.method == 'POST':
+        otp = request.form['otp']
+
+        try:
+            # Checks and marks the code used in one statement
+            with db.transaction() as cursor:
+                verified = otp_store.consume(cursor, aadhar_id, otp_store.PATIENT_ACCESS, otp)
+            if verified:
+                # OTP verified → allow showing prescriptions
+                return redirect(url_for("caretaker.view_prescriptions"))
+            else:
+                flash("Invalid or expired OTP!", "error")
+
+        except db.Error as e:
+            print("Verify OTP error:", e)
+            flash("Database error", "error")
+
+    return render_template("caretaker_verify_otp.html")
+
+
+@bp.route('/caretaker/view-prescriptions')
+@role_required('caretaker')
+def view_prescriptions():
+    if 'caretaker_aadhar' not in session:
+        return redirect(url_for('caretaker.search_prescriptions'))
+
+    aadhar_id = session['caretaker_aadhar']
+
+    try:
+        with db.cursor(dictionary=True) as cursor:
+            # Verify caretaker has access to this patient
+            cursor.execute("""
+                SELECT id FROM caretaker_patients
+                WHERE caretaker_id = %s AND patient_aadhar = %s AND is_active = TRUE
+            """, (session['caretaker_id'], aadhar_id))
+            access = cursor.fetchone()
+
+            if not access:
+                flash("You don't have access to this patient's records.", "error")
+                return redirect(url_for('caretaker.dashboard'))
+
+            cursor.execute(PATIENT_QUERY, (aadhar_id,))
+            patient = cursor.fetchone()
+
+            cursor.execute(PRESCRIPTIONS_QUERY, (aadhar_id,))
+            prescriptions = cursor.fetchall()
+
+    except db.Error as e:
+        flash("Database error", "error")
+        return redirect(url_for('caretaker.dashboard'))
+
+    return render_template("search_prescriptions.html", prescriptions=prescriptions, patient=patient)
@@ -0,0 +1,174 @@
+"""
+WSGI middleware that compresses text responses on the fly.
+
+HTML pages here can be large (full CSV preview tables, base64 graph
+images), so HTML, JSON, CSS, JS and other text types are compressed with
+brotli when the client accepts it and the optional brotli package is
+installed, otherwise with gzip. The body is compressed chunk by chunk
+as the app yields it; streamed responses stay streamed.
+
+Responses are left alone when they are small (known Content-Length below
+min_size), already encoded (precompressed static assets), partial (Range),
+bodiless (HEAD, 204, 304) or marked Cache-Control: no-transform.
+
+A compressed response gets an ETag with the encoding appended
+("abc-gzip"), because its bytes differ from the plain body. The suffix is
+removed from If-None-Match on the way in, so the app's own conditional
+handling still answers 304.
+"""
+
+import re
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None  # gzip only
+
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/json', 'application/javascript', 'application/xml',
+    'image/svg+xml',
+)
+ETAG_SUFFIX = re.compile(r'-(?:gzip|br)(?=")')
+
+
+def _accepts(accept_encoding, coding):
+    """True when Accept-Encoding lists coding with a non-zero q-value.
+
+    Any parameter may carry the q-value; one that does not parse counts as 0.
+    """
+    for part in accept_encoding.split(','):
+        name, *params = part.split(';')
+        if name.strip().lower() != coding:
+            continue
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+class _Gzip:
+    encoding = 'gzip'
+
+    def __init__(self, level):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        # A sync flush per chunk keeps streamed responses flowing
+        return self._z.compress(chunk) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush()
+
+
+class _Brotli:
+    encoding = 'br'
+
+    def __init__(self, quality):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, chunk):
+        return self._c.process(chunk) + self._c.flush()
+
+    def finish(self):
+        return self._c.finish()
+
+
+class CompressionMiddleware:
+    def __init__(self, app, min_size=500, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compressor(self, environ):
+        if environ.get('REQUEST_METHOD') == 'HEAD' or environ.get('HTTP_RANGE'):
+            return None
+        accept = environ.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and _accepts(accept, 'br'):
+            return lambda: _Brotli(self.brotli_quality)
+        if _accepts(accept, 'gzip'):
+            return lambda: _Gzip(self.gzip_level)
+        return None
+
+    def _should_compress(self, code, values):
+        if code < 200 or code in (204, 206, 304):
+            return False
+        if 'no-transform' in values.get('cache-control', ''):
+            return False
+        length = values.get('content-length')
+        return length is None or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        make_compressor = self._compressor(environ)
+        if make_compressor is None:
+            return self.app(environ, start_response)
+
+        # Validators we handed out for compressed bodies carry a suffix
+        if_none_match = environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            environ['HTTP_IF_NONE_MATCH'] = ETAG_SUFFIX.sub('', if_none_match)
+        state = {}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            state['started'] = True
+            code = int(status.split(' ', 1)[0])
+            values = {name.lower(): value for name, value in headers}
+            if code == 304 and if_none_match and ETAG_SUFFIX.search(if_none_match):
+                # Confirm the validator the client actually holds
+                encoding = ETAG_SUFFIX.search(if_none_match).group(0)[1:]
+                headers = [(name, _suffixed(value, encoding) if name.lower() == 'etag' else value)
+                           for name, value in headers]
+            elif values.get('content-type', '').startswith(COMPRESSIBLE_TYPES) and \
+                    'content-encoding' not in values:
+                if self._should_compress(code, values):
+                    compressor = state['compressor'] = make_compressor()
+                    headers = [(name, _suffixed(value, compressor.encoding) if name.lower() == 'etag' else value)
+                               for name, value in headers if name.lower() != 'content-length']
+                    headers.append(('Content-Encoding', compressor.encoding))
+                # Another client may get the compressed form
+                headers = _with_vary(list(headers))
+            return start_response(status, headers, exc_info)
+
+        body = self.app(environ, compressing_start_response)
+        if state.get('started') and 'compressor' not in state:
+            return body  # untouched, so wsgi.file_wrapper still works
+        return self._compress(body, state)
+
+    @staticmethod
+    def _compress(body, state):
+        # Apps may call start_response lazily, on their first chunk
+        compressor = None
+        try:
+            for chunk in body:
+                compressor = state.get('compressor')
+                if compressor is None:
+                    yield chunk
+                elif chunk:
+                    data = compressor.compress(chunk)
+                    if data:
+                        yield data
+            compressor = state.get('compressor')
+            if compressor is not None:
+                yield compressor.finish()
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+
+def _with_vary(headers):
+    for i, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            if 'accept-encoding' not in value.lower():
+                headers[i] = (name, f'{value}, Accept-Encoding')
+            return headers
+    return headers + [('Vary', 'Accept-Encoding')]
+
+
+def _suffixed(etag, encoding):
+    return re.sub(r'"$', f'-{encoding}"', etag)
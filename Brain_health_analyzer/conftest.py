@@ -0,0 +1,111 @@
+"""
+Shared test fixtures.
+
+fake_db replaces db.get_connection with connections to a FakeDatabase,
+which records every statement and answers queries from handlers.
+"""
+
+import pytest
+
+import db
+
+
+class FakeDatabase:
+    """Records statements and answers them; stands in for MySQL in tests.
+
+    log holds, in order: 'cursor' / 'prepared cursor', (sql, params) for
+    each statement with its whitespace collapsed, 'commit', 'rollback',
+    'close cursor' and 'close'. on(fragment, answer) makes statements
+    containing fragment return answer, a list of rows or a function of
+    the params returning one; the first matching handler wins and other
+    statements return rows. rowcount is the length of the answer
+    (executemany: the number of rows sent).
+    """
+
+    def __init__(self):
+        self.log = []
+        self.rows = []
+        self.handlers = []
+        self.fail_on = None
+        self.fail_commit = False
+        self.lastrowid = 1
+
+    def on(self, fragment, answer):
+        self.handlers.append((fragment, answer))
+        return self
+
+    def connect(self):
+        return FakeConn(self)
+
+    def cursor(self):
+        """A cursor outside any connection, for functions that take one."""
+        return FakeCursor(self)
+
+    def statements(self, prefix=''):
+        """(sql, params) entries whose SQL starts with prefix."""
+        return [entry for entry in self.log if isinstance(entry, tuple) and entry[0].startswith(prefix)]
+
+    def answer(self, sql, params):
+        if self.fail_on and self.fail_on in sql:
+            raise db.Error(f'failed: {self.fail_on}')
+        for fragment, answer in self.handlers:
+            if fragment in sql:
+                return list(answer(params) if callable(answer) else answer)
+        return list(self.rows)
+
+
+class FakeConn:
+    def __init__(self, database):
+        self.database = database
+
+    def cursor(self, dictionary=False, prepared=False):
+        self.database.log.append('prepared cursor' if prepared else 'cursor')
+        return FakeCursor(self.database)
+
+    def commit(self):
+        if self.database.fail_commit:
+            raise db.Error('commit failed')
+        self.database.log.append('commit')
+
+    def rollback(self):
+        self.database.log.append('rollback')
+
+    def close(self):
+        self.database.log.append('close')
+
+
+class FakeCursor:
+    def __init__(self, database):
+        self.database = database
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = database.lastrowid
+
+    def execute(self, sql, params=()):
+        sql = ' '.join(sql.split())
+        self.database.log.append((sql, params))
+        self.rows = self.database.answer(sql, params)
+        self.rowcount = len(self.rows)
+
+    def executemany(self, sql, rows):
+        sql = ' '.join(sql.split())
+        self.database.log.append((sql, list(rows)))
+        self.database.answer(sql, rows)
+        self.rows = []
+        self.rowcount = len(rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def close(self):
+        self.database.log.append('close cursor')
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(db, 'get_connection', database.connect)
+    return database
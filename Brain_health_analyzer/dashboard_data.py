@@ -0,0 +1,143 @@
+"""
+Data access for the patient, doctor and caretaker dashboards.
+
+Each dashboard is assembled from one multi-statement batch, so a page load
+costs a single round trip to MySQL regardless of how many lists and
+summary counts it shows. Lists select only the columns their templates
+render (multi-statement batches cannot use prepared statements, so the
+projection is what keeps them small).
+
+Summary counts never scan a table: seizure totals add up the
+patient_seizure_days buckets (at most RECENT_DAYS per patient) and the
+other counts are range reads on the indexes from
+app.alter_tables_for_dashboard_indexes().
+"""
+
+import accounts
+import patient_summary
+
+# First day of the current month, written without '%' so it is safe inside
+# parameterised queries
+MONTH_START = "DATE_SUB(CURDATE(), INTERVAL DAYOFMONTH(CURDATE()) - 1 DAY)"
+
+RECENT_DAYS = patient_summary.WINDOW_DAYS
+
+# Prescription list columns (prescriptions aliased as p); the signature and
+# owner ids stay in the database
+PRESCRIPTION_COLUMNS = ('p.id, p.prescription_id, p.diagnosis, p.instructions, p.file_name, '
+                        'p.file_path, p.file_type, p.file_size, p.prescription_date, p.created_at')
+
+
+def run_batch(conn, statements):
+    """Execute [(name, sql, params), ...] in one round trip.
+
+    Returns {name: rows} with every statement's rows as dicts.
+    """
+    sql = ";\n".join(stmt.strip().rstrip(';') for _, stmt, _ in statements)
+    params = tuple(p for _, _, stmt_params in statements for p in stmt_params)
+    names = iter(name for name, _, _ in statements)
+
+    results = {}
+    cursor = conn.cursor(dictionary=True)
+    try:
+        for result in cursor.execute(sql, params, multi=True):
+            if result.with_rows:
+                results[next(names)] = result.fetchall()
+    finally:
+        cursor.close()
+    return results
+
+
+def patient_dashboard(conn, aadhar_id):
+    """Selected doctors, prescriptions and summary counts for a patient."""
+    results = run_batch(conn, [
+        ('selected_doctors', f'''
+            SELECT {accounts.columns('doctor', accounts.CARD, 'd')}, pd.created_at as connected_date
+            FROM patient_doctors pd
+            JOIN doctors d ON pd.doctor_id = d.doctor_id
+            WHERE pd.patient_aadhar = %s AND pd.is_active = TRUE
+        ''', (aadhar_id,)),
+        ('prescriptions', f'''
+            SELECT {PRESCRIPTION_COLUMNS}, d.name as doctor_name, d.specialization
+            FROM prescriptions p
+            JOIN doctors d ON p.doctor_id = d.doctor_id
+            WHERE p.patient_aadhar = %s
+            ORDER BY p.prescription_date DESC
+        ''', (aadhar_id,)),
+        ('summary', f'''
+            SELECT
+                (SELECT COUNT(*) FROM brain_reports
+                 WHERE aadhar_id = %s) AS reports_sent,
+                (SELECT COALESCE(SUM(sd.seizure_count), 0) FROM patient_seizure_days sd
+                 WHERE sd.patient_aadhar = %s
+                 AND sd.day >= CURDATE() - INTERVAL {RECENT_DAYS} DAY) AS recent_seizures,
+                (SELECT COUNT(*) FROM prescriptions
+                 WHERE patient_aadhar = %s AND prescription_date >= {MONTH_START}) AS prescriptions_this_month
+        ''', (aadhar_id, aadhar_id, aadhar_id)),
+    ])
+    results['summary'] = results['summary'][0]
+    return results
+
+
+def doctor_dashboard(conn, doctor_id):
+    """Patients (with their patient_summary row) and counts for a doctor.
+
+    A report is pending when the doctor has not written a prescription for
+    that patient since the report arrived. Recent seizures are those of the
+    doctor's patients, matching the per-patient seizures_30d column.
+    """
+    results = run_batch(conn, [
+        ('my_patients', f'''
+            SELECT {accounts.columns('patient', accounts.CARD, 'p')}, pd.created_at as connected_date,
+                   {patient_summary.SUMMARY_COLUMNS}
+            FROM patient_doctors pd
+            JOIN patients p ON pd.patient_aadhar = p.aadhar_id
+            {patient_summary.SUMMARY_JOIN}
+            WHERE pd.doctor_id = %s AND pd.is_active = TRUE
+        ''', (doctor_id,)),
+        ('summary', f'''
+            SELECT
+                (SELECT COUNT(*) FROM brain_reports br
+                 JOIN doctors d ON d.email = br.doctor_email
+                 WHERE d.doctor_id = %s
+                 AND NOT EXISTS (
+                     SELECT 1 FROM prescriptions rx
+                     WHERE rx.doctor_id = d.doctor_id
+                     AND rx.patient_aadhar = br.aadhar_id
+                     AND rx.created_at >= br.created_at
+                 )) AS reports_pending,
+                (SELECT COALESCE(SUM(sd.seizure_count), 0) FROM patient_seizure_days sd
+                 JOIN patient_doctors pd ON pd.patient_aadhar = sd.patient_aadhar
+                 WHERE pd.doctor_id = %s AND pd.is_active = TRUE
+                 AND sd.day >= CURDATE() - INTERVAL {RECENT_DAYS} DAY) AS recent_seizures,
+                (SELECT COUNT(*) FROM prescriptions
+                 WHERE doctor_id = %s AND prescription_date >= {MONTH_START}) AS prescriptions_this_month
+        ''', (doctor_id, doctor_id, doctor_id)),
+    ])
+    results['summary'] = results['summary'][0]
+    return results
+
+
+def caretaker_dashboard(conn, caretaker_id):
+    """Patients and summary counts for a caretaker."""
+    results = run_batch(conn, [
+        ('my_patients', f'''
+            SELECT {accounts.columns('patient', accounts.CARD, 'p')}, cp.created_at as connected_date
+            FROM caretaker_patients cp
+            JOIN patients p ON cp.patient_aadhar = p.aadhar_id
+            WHERE cp.caretaker_id = %s AND cp.is_active = TRUE
+        ''', (caretaker_id,)),
+        ('summary', f'''
+            SELECT
+                (SELECT COALESCE(SUM(sd.seizure_count), 0) FROM patient_seizure_days sd
+                 JOIN caretaker_patients cp ON cp.patient_aadhar = sd.patient_aadhar
+                 WHERE cp.caretaker_id = %s AND cp.is_active = TRUE
+                 AND sd.day >= CURDATE() - INTERVAL {RECENT_DAYS} DAY) AS recent_seizures,
+                (SELECT COUNT(*) FROM prescriptions rx
+                 JOIN caretaker_patients cp ON cp.patient_aadhar = rx.patient_aadhar
+                 WHERE cp.caretaker_id = %s AND cp.is_active = TRUE
+                 AND rx.prescription_date >= {MONTH_START}) AS prescriptions_this_month
+        ''', (caretaker_id, caretaker_id)),
+    ])
+    results['summary'] = results['summary'][0]
+    return results
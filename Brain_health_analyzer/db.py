@@ -0,0 +1,254 @@
+"""
+MySQL access shared by the app and its blueprints.
+
+Connections come from one pool per process (DB_POOL_SIZE, 0 disables
+pooling). Views borrow them through context managers instead of
+try/get_db_connection/finally/close blocks:
+
+    with db.cursor(dictionary=True) as cursor:      # reads
+        cursor.execute('SELECT ...', params)
+
+    with db.transaction() as cursor:                # writes
+        cursor.execute('UPDATE ...', params)
+
+transaction() commits when the block finishes (including an early return)
+and rolls back if it raises. Both always close the cursor and hand the
+connection back to the pool. Errors surface as db.Error. Work that must
+wait for the commit (cache invalidation) is queued with after_commit().
+
+prepared=True gives a server-side prepared statement cursor: parameters
+travel separately from the SQL and rows come back in the binary protocol,
+so ints and dates are not re-parsed from text. A statement is prepared
+once per cursor, which pays off most when one cursor runs it repeatedly
+(fetch_in batches). `flask bench-queries` measures the difference.
+
+For many rows at once, fetch_in() looks up a list of keys with a few
+IN (...) queries, and execute_many() sends executemany() batches, which
+mysql-connector folds into multi-row INSERTs.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+import mysql.connector
+from mysql.connector import Error, pooling
+
+DATABASE = 'healthcare_system'
+
+config = {
+    'host': os.getenv('DB_HOST', 'localhost'),
+    'user': os.getenv('DB_USER', 'root'),
+    'password': os.getenv('DB_PASSWORD', 'root')
+}
+
+# Connection pool shared by all request threads (0 disables pooling)
+POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))
+# Rows per executemany() / keys per IN (...) list
+BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 1000))
+
+_pool = None
+_pool_lock = threading.Lock()
+# Commit hooks of the transaction() running on this thread
+_local = threading.local()
+
+
+def connect(database=DATABASE):
+    """A fresh, unpooled connection (database=None for server-level setup)."""
+    settings = config.copy()
+    if database:
+        settings['database'] = database
+    return mysql.connector.connect(**settings)
+
+
+def get_pool():
+    """Create the shared connection pool on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name='healthcare_pool',
+                    pool_size=POOL_SIZE,
+                    database=DATABASE,
+                    **config
+                )
+    return _pool
+
+
+def get_connection():
+    """Borrow a connection from the pool; conn.close() hands it back."""
+    if POOL_SIZE <= 0:
+        return connect()
+
+    # The pool raises immediately when exhausted, so wait for a free
+    # connection instead of failing requests under concurrent load.
+    pool = get_pool()
+    deadline = time.monotonic() + POOL_TIMEOUT
+    while True:
+        try:
+            return pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+
+
+@contextmanager
+def connection():
+    """A pooled connection for the duration of the block."""
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def cursor(dictionary=False, prepared=False):
+    """A cursor for reads; nothing is committed."""
+    with connection() as conn:
+        cur = conn.cursor(dictionary=dictionary, prepared=prepared)
+        try:
+            yield cur
+        finally:
+            cur.close()
+
+
+@contextmanager
+def transaction(dictionary=False, prepared=False):
+    """A cursor whose statements are committed together, or rolled back on error."""
+    outer_hooks = getattr(_local, 'hooks', None)
+    hooks = _local.hooks = []
+    try:
+        with connection() as conn:
+            cur = conn.cursor(dictionary=dictionary, prepared=prepared)
+            try:
+                yield cur
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+    finally:
+        _local.hooks = outer_hooks
+    for hook in hooks:
+        hook()
+
+
+def after_commit(hook):
+    """Call hook() once the enclosing transaction() commits (now, outside one).
+
+    Cache invalidation goes here, so no other request can re-cache the old
+    row between the invalidation and the commit.
+    """
+    hooks = getattr(_local, 'hooks', None)
+    if hooks is None:
+        hook()
+    else:
+        hooks.append(hook)
+
+
+def first(cur):
+    """The first row of the last result (or None), reading the result to the end.
+
+    Key lookups return at most one row; draining the result leaves no
+    unread packets on a pooled or prepared-statement connection.
+    """
+    rows = cur.fetchall()
+    return rows[0] if rows else None
+
+
+def fetch_one(query, params=(), prepared=False):
+    """Run a query and return the first row as a dict (or None)."""
+    with cursor(dictionary=True, prepared=prepared) as cur:
+        cur.execute(query, params)
+        return first(cur)
+
+
+def fetch_all(query, params=(), prepared=False):
+    """Run a query and return all rows as dicts."""
+    with cursor(dictionary=True, prepared=prepared) as cur:
+        cur.execute(query, params)
+        return cur.fetchall()
+
+
+def batches(items, size=None):
+    """Yield lists of at most size (BATCH_SIZE) items; works on any iterable."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size or BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+def fetch_in(query, keys, params=(), batch_size=None, prepared=False):
+    """Rows for many keys with one query per batch.
+
+    query has a single {keys} placeholder where the IN list goes, e.g.
+    'SELECT doctor_id, name FROM doctors WHERE doctor_id IN ({keys})';
+    params are bound after the keys. Duplicate keys are looked up once.
+    With prepared=True every full batch reuses one prepared statement.
+    """
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return []
+    rows = []
+    with cursor(dictionary=True, prepared=prepared) as cur:
+        for batch in batches(keys, batch_size):
+            cur.execute(query.format(keys=', '.join(['%s'] * len(batch))), (*batch, *params))
+            rows.extend(cur.fetchall())
+    return rows
+
+
+def execute_many(cur, query, rows, batch_size=None):
+    """executemany() in batches on an open cursor. Returns the affected row count."""
+    affected = 0
+    for batch in batches(rows, batch_size):
+        cur.executemany(query, batch)
+        affected += max(cur.rowcount, 0)
+    return affected
+
+
+def _bytes_sent(cur):
+    cur.execute("SHOW SESSION STATUS LIKE 'Bytes_sent'")
+    return int(cur.fetchall()[0][1])
+
+
+def measure(query, params_list, prepared=False):
+    """Run query once per params on one connection.
+
+    Returns (bytes the server sent per query, seconds per query including
+    fetching and decoding the rows on this side). Bytes come from the
+    server's session Bytes_sent counter, less the cost of reading it.
+    """
+    with connection() as conn:
+        status = conn.cursor()
+        run = conn.cursor(dictionary=True, prepared=prepared)
+        try:
+            start_bytes = _bytes_sent(status)
+            overhead = _bytes_sent(status) - start_bytes
+            start_bytes += overhead
+            start = time.perf_counter()
+            for params in params_list:
+                run.execute(query, params)
+                run.fetchall()
+            elapsed = time.perf_counter() - start
+            sent = _bytes_sent(status) - start_bytes - overhead
+        finally:
+            run.close()
+            status.close()
+    count = max(len(params_list), 1)
+    return sent / count, elapsed / count
+
+
+def after_fork():
+    """Drop the parent's pool; the worker opens its own connections."""
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
@@ -0,0 +1,426 @@
+"""
+Doctor routes: signup/login, dashboard, patient lookup with OTP consent,
+prescriptions, brain reports and profile.
+"""
+
+import os
+from datetime import datetime
+
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+from werkzeug.utils import secure_filename
+
+import accounts
+import dashboard_data
+import db
+import identity_cache
+import ids
+import image_variants
+import otp_store
+import passwords
+import patient_summary
+import prescription_store
+import uploads
+from app import (account_changed, allowed_file, blob_store, delete_prescription_file, rate_limited,
+                 revoke_sessions, role_required, rotate_session, session_user_key)
+from totp_views import check_second_factor
+
+bp = Blueprint('doctor', __name__)
+
+
+@bp.route('/doctor/signup', methods=['GET', 'POST'])
+def signup():
+    if request.method == 'POST':
+        name = request.form['name']
+        email = request.form['email']
+        password = request.form['password']
+        specialization = request.form['specialization']
+        license_number = request.form['license_number']
+        phone = request.form['phone']
+
+        # Auto-generate doctor_id (time-ordered, unique without a lookup)
+        doctor_id = ids.new('DR')
+
+        try:
+            with db.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO doctors (doctor_id, name, email, password, specialization, license_number, phone)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ''', (doctor_id, name, email, passwords.make(password), specialization, license_number, phone))
+            identity_cache.invalidate('doctor_directory')
+            flash('Doctor registered successfully!', 'success')
+            return redirect(url_for('doctor.login'))
+        except db.Error as e:
+            flash('Error during registration. Email might already exist.', 'error')
+
+    return render_template('doctor_signup.html')
+
+
+@bp.route('/doctor/login', methods=['GET', 'POST'])
+@rate_limited('login', lambda: request.form.get('email'), template='doctor_login.html')
+def login():
+    if request.method == 'POST':
+        email = request.form['email']
+        password = request.form['password']
+        totp_code = request.form.get('totp_code', '')
+        backup_code = request.form.get('backup_code', '')
+
+        try:
+            with db.transaction(dictionary=True, prepared=True) as cursor:
+                doctor = accounts.load(cursor, 'doctor', email, column='email')
+
+                if not doctor:
+                    flash('User not found! Please sign up first.', 'error')
+                    return render_template('doctor_login.html')
+
+                if not accounts.password_matches(cursor, 'doctor', doctor['doctor_id'],
+                                                 password, doctor['password']):
+                    flash('Incorrect password!', 'error')
+                    return render_template('doctor_login.html')
+
+                # If TOTP is enabled but no code provided, show TOTP form
+                if doctor.get('totp_enabled', False) and not totp_code and not backup_code:
+                    return render_template("doctor_login.html", show_totp=True, email=email)
+
+                error = check_second_factor(cursor, 'doctor', doctor, totp_code, backup_code)
+                if error:
+                    flash(error, "error")
+                    return render_template("doctor_login.html", show_totp=True, email=email)
+
+            # Login successful
+            rotate_session()
+            session['doctor_id'] = doctor['doctor_id']
+            session['doctor_name'] = doctor['name']
+            session['user_type'] = 'doctor'
+            flash('Login successful!', 'success')
+            return redirect(url_for('doctor.dashboard'))
+
+        except db.Error as e:
+            print(f"Doctor login error: {e}")
+            flash('Database error occurred', 'error')
+
+    return render_template('doctor_login.html')
+
+
+@bp.route('/doctor/dashboard')
+@role_required('doctor')
+def dashboard():
+    # Patients who selected this doctor plus summary counts, one round trip
+    try:
+        with db.connection() as conn:
+            data = dashboard_data.doctor_dashboard(conn, session['doctor_id'])
+    except db.Error as e:
+        print(f"Doctor dashboard error: {e}")
+        flash('Database error occurred', 'error')
+        data = {'my_patients': [], 'summary': {'reports_pending': 0, 'recent_seizures': 0, 'prescriptions_this_month': 0}}
+
+    return render_template('doctor_dashboard.html',
+                           my_patients=data['my_patients'],
+                           summary=data['summary'])
+
+
+@bp.route("/doctor/view_reports/<aadhar_id>")
+@role_required('doctor')
+def view_reports(aadhar_id):
+    reports = []
+    try:
+        doctor = accounts.get('doctor', session['doctor_id'], accounts.CARD, session.get('account_version', 0))
+
+        if doctor:
+            with db.cursor(dictionary=True) as cursor:
+                cursor.execute("""
+                    SELECT id, result, features, graph_image, created_at FROM brain_reports
+                    WHERE aadhar_id = %s AND doctor_email = %s
+                    ORDER BY created_at DESC
+                """, (aadhar_id, doctor['email']))
+                reports = cursor.fetchall()
+        else:
+            flash('Doctor not found!', 'error')
+
+    except db.Error as e:
+        flash("Error loading reports", "error")
+
+    return render_template("view_reports.html",
+                           reports=reports,
+                           aadhar_id=aadhar_id)
+
+
+@bp.route('/doctor/search-patient', methods=['GET', 'POST'])
+@role_required('doctor')
+def search_patient():
+    if request.method == 'POST':
+        aadhar_id = request.form['aadhar_id']
+        try:
+            with db.cursor(dictionary=True) as cursor:
+                cursor.execute('''
+                    SELECT p.aadhar_id,
+                           CASE WHEN pd.doctor_id IS NOT NULL THEN TRUE ELSE FALSE END as is_my_patient
+                    FROM patients p
+                    LEFT JOIN patient_doctors pd ON p.aadhar_id = pd.patient_aadhar AND pd.doctor_id = %s
+                    WHERE p.aadhar_id = %s
+                ''', (session['doctor_id'], aadhar_id))
+                patient = cursor.fetchone()
+            if patient:
+                if patient['is_my_patient']:
+                    session['verified_aadhar'] = aadhar_id
+                    flash('OTP verified successfully!', 'success')
+                    return redirect(url_for('doctor.patient_details'))
+                else:
+                    flash('This patient has not selected you as their doctor!', 'error')
+            else:
+                flash('Patient not found. Signup invitation sent!', 'warning')
+        except db.Error as e:
+            print(f"Search patient error: {e}")
+            flash('Database error occurred', 'error')
+
+    return render_template('patient_search.html')
+
+
+@bp.route('/doctor/verify-otp', methods=['GET', 'POST'])
+@rate_limited('otp', lambda: session.get('search_aadhar'), template='verify_otp.html')
+@role_required('doctor')
+def verify_otp():
+    if 'search_aadhar' not in session:
+        return redirect(url_for('doctor.search_patient'))
+
+    if request.method == 'POST':
+        otp = request.form['otp']
+        aadhar_id = session['search_aadhar']
+        try:
+            with db.transaction() as cursor:
+                verified = otp_store.consume(cursor, aadhar_id, otp_store.PATIENT_ACCESS, otp)
+            if verified:
+                session['verified_aadhar'] = aadhar_id
+                flash('OTP verified successfully!', 'success')
+                return redirect(url_for('doctor.patient_details'))
+            else:
+                flash('Invalid or expired OTP!', 'error')
+        except db.Error as e:
+            print(f"Verify OTP error: {e}")
+            flash('Database error occurred', 'error')
+
+    return render_template('verify_otp.html')
+
+
+@bp.route('/doctor/patient-details')
+@role_required('doctor')
+def patient_details():
+    if 'verified_aadhar' not in session:
+        return redirect(url_for('doctor.search_patient'))
+
+    aadhar_id = session['verified_aadhar']
+    try:
+        with db.cursor(dictionary=True) as cursor:
+            cursor.execute(f"SELECT {accounts.columns('patient', accounts.PROFILE)} FROM patients WHERE aadhar_id = %s",
+                           (aadhar_id,))
+            patient = cursor.fetchone()
+
+            # Get patient prescriptions (only from this doctor)
+            cursor.execute(f'''
+                SELECT {dashboard_data.PRESCRIPTION_COLUMNS}, d.name as doctor_name
+                FROM prescriptions p
+                JOIN doctors d ON p.doctor_id = d.doctor_id
+                WHERE p.patient_aadhar = %s AND p.doctor_id = %s
+                ORDER BY p.prescription_date DESC
+            ''', (aadhar_id, session['doctor_id']))
+            prescriptions = cursor.fetchall()
+    except db.Error as e:
+        print(f"Patient details error: {e}")
+        flash('Database error occurred', 'error')
+        patient = None
+        prescriptions = []
+
+    return render_template('patient_details.html', patient=patient, prescriptions=prescriptions)
+
+
+def withdraw_prescription(prescription_id, patient_aadhar, prescription_date, file_path):
+    """Delete a just-committed prescription whose file could not be placed."""
+    with db.transaction() as cursor:
+        cursor.execute('DELETE FROM prescriptions WHERE prescription_id = %s', (prescription_id,))
+        patient_summary.forget_prescription(cursor, patient_aadhar, prescription_date)
+        if prescription_store.release(cursor, file_path):
+            db.after_commit(lambda: delete_prescription_file(file_path))
+
+
+@bp.route('/doctor/create-prescription', methods=['GET', 'POST'])
+@role_required('doctor')
+def create_prescription():
+    if 'verified_aadhar' not in session:
+        return redirect(url_for('doctor.search_patient'))
+
+    if request.method == 'POST':
+        diagnosis = request.form.get('diagnosis')
+        instructions = request.form.get('instructions')
+        patient_aadhar = session['verified_aadhar']
+        doctor_id = session['doctor_id']
+        camera_photo = request.form.get('camera_photo')  # base64 data url if present
+
+        spooled = None  # (temp_path, size, sha256) until the blob is placed
+        try:
+            prescription_id = ids.new('RX')
+
+            filename = None
+            file_path = None
+            file_type = None
+            file_size = 0
+            digital_signature = None
+
+            # File upload (optional)
+            if 'prescription_file' in request.files and request.files['prescription_file'].filename:
+                file = request.files['prescription_file']
+                if file and allowed_file(file.filename):
+                    filename = secure_filename(file.filename)
+                    # Size and SHA-256 were computed while the upload was written
+                    spooled = uploads.spool_upload(file, blob_store.spool_dir)
+                    file_type = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'unknown'
+                else:
+                    flash('Invalid file type. Allowed types: PNG, JPG, JPEG, GIF, PDF, DOC, DOCX', 'error')
+                    return redirect(request.url)
+
+            # Camera photo (optional)
+            elif camera_photo:
+                try:
+                    if camera_photo.startswith('data:image/'):
+                        header, base64_data = camera_photo.split(',', 1)
+                        if 'jpeg' in header or 'jpg' in header:
+                            file_type = 'jpg'
+                            filename = f"{prescription_id}_camera_photo.jpg"
+                        elif 'png' in header:
+                            file_type = 'png'
+                            filename = f"{prescription_id}_camera_photo.png"
+                        else:
+                            file_type = 'jpg'
+                            filename = f"{prescription_id}_camera_photo.jpg"
+
+                        # Decoded and hashed slice by slice
+                        spooled = uploads.spool_base64(base64_data, blob_store.spool_dir)
+                    else:
+                        flash('Invalid camera photo data', 'error')
+                        return redirect(request.url)
+                except Exception as e:
+                    flash(f'Error processing camera photo: {str(e)}', 'error')
+                    return redirect(request.url)
+
+            with db.transaction() as cursor:
+                # Identical files share one blob, located by their digest
+                if spooled:
+                    _, file_size, digital_signature = spooled
+                    file_path = blob_store.location_for(digital_signature, file_type)
+                    prescription_store.acquire(cursor, file_path, digital_signature, file_size)
+
+                # Insert prescription record including digital_signature
+                prescription_date = datetime.now().date()
+                cursor.execute('''
+                    INSERT INTO prescriptions (prescription_id, patient_aadhar, doctor_id,
+                    diagnosis, file_name, file_path, file_type, file_size, digital_signature, instructions, prescription_date)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ''', (prescription_id, patient_aadhar, doctor_id, diagnosis, filename,
+                      file_path, file_type, file_size, digital_signature, instructions, prescription_date))
+                patient_summary.record_prescription(cursor, patient_aadhar, prescription_date)
+
+            # Placed only after commit, so a concurrent delete of the last
+            # reference cannot remove it underneath us
+            if spooled:
+                try:
+                    blob_store.put(spooled[0], file_path)
+                except Exception as e:
+                    print(f"Create prescription file error: {e}")
+                    withdraw_prescription(prescription_id, patient_aadhar, prescription_date, file_path)
+                    flash('Could not store the prescription file. Please try again.', 'error')
+                    return redirect(request.url)
+                spooled = None
+                # Thumbnails are made off the request; views fall back to the original
+                if image_variants.is_image(file_type) and prescription_store.is_local_location(file_path):
+                    image_variants.schedule(file_path)
+
+            flash(f'Prescription uploaded successfully! ID: {prescription_id}', 'success')
+            return redirect(url_for('doctor.patient_details'))
+
+        except db.Error as e:
+            print(f"Create prescription DB error: {e}")
+            flash('Error creating prescription', 'error')
+        finally:
+            if spooled and os.path.exists(spooled[0]):
+                os.unlink(spooled[0])
+
+    return render_template('create_prescription.html')
+
+
+@bp.route('/doctor/profile', methods=['GET', 'POST'])
+@role_required('doctor')
+def profile():
+    if request.method == 'POST':
+        # Get form data
+        name = request.form.get('name')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        specialization = request.form.get('specialization')
+        current_password = request.form.get('current_password')
+        new_password = request.form.get('new_password')
+
+        try:
+            with db.transaction() as cursor:
+                changes = dict(name=name, email=email, phone=phone, specialization=specialization)
+
+                # Verify current password if changing password
+                if new_password:
+                    cursor.execute('SELECT password FROM doctors WHERE doctor_id = %s', (session['doctor_id'],))
+                    result = cursor.fetchone()
+                    if not (result and passwords.verify(current_password, result[0])[0]):
+                        flash('Current password is incorrect!', 'error')
+                        return redirect(url_for('doctor.profile'))
+                    changes['password'] = passwords.make(new_password)
+
+                accounts.update(cursor, 'doctor', session['doctor_id'], **changes)
+
+            account_changed()
+            if new_password:
+                revoke_sessions(session_user_key(session))
+            flash('Profile updated successfully!', 'success')
+
+        except db.Error as e:
+            print(f"Profile update error: {e}")
+            flash('Error updating profile', 'error')
+
+        return redirect(url_for('doctor.profile'))
+
+    # GET request - show profile
+    try:
+        doctor = accounts.get('doctor', session['doctor_id'], version=session.get('account_version', 0))
+    except db.Error as e:
+        print(f"Profile fetch error: {e}")
+        doctor = None
+
+    return render_template('doctor_profile.html', doctor=doctor)
+
+
+@bp.route('/doctor/delete-report/<int:report_id>', methods=['POST'])
+@role_required('doctor')
+def delete_report(report_id):
+    try:
+        # Get doctor's email
+        doctor = accounts.get('doctor', session['doctor_id'], accounts.CARD, session.get('account_version', 0))
+
+        if doctor:
+            with db.transaction(dictionary=True) as cursor:
+                # Delete report only if it belongs to this doctor
+                cursor.execute('''
+                    SELECT id, aadhar_id, result, created_at FROM brain_reports
+                    WHERE id = %s AND doctor_email = %s
+                ''', (report_id, doctor['email']))
+                report = cursor.fetchone()
+
+                if report:
+                    cursor.execute('DELETE FROM brain_reports WHERE id = %s', (report_id,))
+                    patient_summary.forget_report(cursor, report)
+            if report:
+                flash('Report deleted successfully!', 'success')
+            else:
+                flash('Report not found or unauthorized!', 'error')
+        else:
+            flash('Doctor not found!', 'error')
+
+    except db.Error as e:
+        print(f"Delete report error: {e}")
+        flash('Error deleting report', 'error')
+
+    return redirect(request.referrer or url_for('doctor.dashboard'))
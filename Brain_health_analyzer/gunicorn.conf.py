@@ -0,0 +1,100 @@
+"""
+Gunicorn settings for production.
+
+    gunicorn -c Brain_health_analyzer/gunicorn.conf.py
+
+The master imports the app once (preload_app), runs schema migrations,
+and freezes the garbage collector before forking. Workers then share the
+model, compiled templates and other start-up data with the master
+copy-on-write instead of each loading their own copy. Each worker
+re-creates its database pool and other per-process state after the fork.
+
+Sizing follows the cores available to this process: WEB_CONCURRENCY
+workers (default 2 x cores + 1) with GUNICORN_THREADS threads each
+(default 4). Each worker's MySQL pool gets one connection per thread.
+"""
+
+import gc
+import itertools
+import os
+import sys
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import ids  # noqa: E402  (small, no app imports)
+
+
+def _cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+wsgi_app = 'wsgi:application'
+pythonpath = APP_DIR
+
+bind = os.getenv('GUNICORN_BIND', f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', 5000)}")
+workers = int(os.getenv('WEB_CONCURRENCY', 2 * _cores() + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot grow without bound
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+accesslog = '-'
+
+# Each worker creates ids as worker number ID_WORKER + its slot. A reload
+# (HUP) starts the new workers before the old ones exit, so up to twice
+# `workers` slots can be live at once; they must all fit in the id.
+ID_WORKER = int(os.getenv('ID_WORKER', 0))
+if not 0 <= ID_WORKER <= ids.MAX_WORKER - 2 * workers:
+    raise SystemExit(f"ID_WORKER={ID_WORKER} with {workers} workers needs worker numbers up to "
+                     f"{ID_WORKER + 2 * workers}; the most is {ids.MAX_WORKER}. Lower ID_WORKER "
+                     f"or WEB_CONCURRENCY.")
+
+# Settings the app reads at import, before preload. Gunicorn workers are
+# already processes, so EEG jobs run inline on the model preloaded in the
+# master rather than in extra per-worker process pools.
+os.environ.setdefault('FLASK_ENV', 'production')
+os.environ.setdefault('INFERENCE_WORKERS', '0')
+os.environ.setdefault('DB_POOL_SIZE', str(min(threads, 32)))
+
+RUN_MIGRATIONS = os.getenv('RUN_MIGRATIONS', 'true').lower() == 'true'
+
+# This file runs in the master before the app is preloaded. Collections
+# there would only churn pages the workers are about to share; each worker
+# turns the collector back on after the fork.
+gc.disable()
+
+
+def _app_module():
+    import app
+
+    return app
+
+
+def when_ready(server):
+    if RUN_MIGRATIONS:
+        server.log.info("Running schema migrations")
+        _app_module().migrate()
+
+
+def pre_fork(server, worker):
+    # Lowest id slot no live worker holds; the slot is part of every id the
+    # worker generates (see ids.py), so live workers can never collide
+    taken = {getattr(other, 'id_slot', None) for other in server.WORKERS.values()}
+    worker.id_slot = next(slot for slot in itertools.count(1) if slot not in taken)
+    # Move everything allocated so far out of the collector's reach, so
+    # collections in the worker do not write to the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    _app_module().after_fork(id_slot=worker.id_slot)
+    gc.enable()
@@ -0,0 +1,132 @@
+"""
+Request- and process-level cache for identity lookups.
+
+Handlers look up the same doctor/patient/caretaker rows (and the doctor
+list) on almost every page. Results are memoised for the rest of the
+request in flask.g and across requests in a small TTL cache, so the common
+navigation paths cost zero or one query.
+
+Write paths must call invalidate() for the namespace/key they change. The
+process cache is per worker, so other workers may serve a stale row for at
+most IDENTITY_CACHE_TTL seconds; keep it short. Where a user must see
+their own change at once, put a counter from their session (which every
+worker shares) in the key, as the patient's selected doctors do.
+
+Cached values are shared between threads and must be treated as read-only.
+"""
+
+import os
+import threading
+import time
+
+from flask import g, has_app_context
+
+DEFAULT_TTL = float(os.getenv('IDENTITY_CACHE_TTL', 30))
+MAX_ENTRIES = int(os.getenv('IDENTITY_CACHE_SIZE', 4096))
+
+
+class TTLCache:
+    """Thread-safe dict with per-entry expiry and a size cap."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._evict()
+            self._data[key] = (time.monotonic() + (ttl or self.ttl), value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_where(self, predicate):
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self):
+        # Drop expired entries; if still full, drop the oldest half
+        now = time.monotonic()
+        for key in [k for k, (exp, _) in self._data.items() if exp < now]:
+            del self._data[key]
+        if len(self._data) >= self.max_entries:
+            by_expiry = sorted(self._data, key=lambda k: self._data[k][0])
+            for key in by_expiry[:len(by_expiry) // 2]:
+                del self._data[key]
+
+
+_process_cache = TTLCache()
+
+
+def _request_cache():
+    if not has_app_context():
+        return None
+    if '_identity_cache' not in g:
+        g._identity_cache = {}
+    return g._identity_cache
+
+
+def cached(namespace, key, loader, ttl=None):
+    """Return the cached value for (namespace, key), calling loader() on a miss.
+
+    None results are not cached so that freshly created rows show up.
+    """
+    cache_key = (namespace, key)
+
+    request_cache = _request_cache()
+    if request_cache is not None and cache_key in request_cache:
+        return request_cache[cache_key]
+
+    value = _process_cache.get(cache_key)
+    if value is None:
+        value = loader()
+        if value is not None:
+            _process_cache.set(cache_key, value, ttl)
+
+    if request_cache is not None and value is not None:
+        request_cache[cache_key] = value
+    return value
+
+
+def invalidate(namespace, key=None):
+    """Forget one key, or the whole namespace when key is None."""
+    invalidate_where(namespace, lambda k: key is None or k == key)
+
+
+def invalidate_where(namespace, predicate):
+    """Forget every key in namespace for which predicate(key) is true."""
+    match = lambda k: k[0] == namespace and predicate(k[1])
+
+    _process_cache.delete_where(match)
+
+    request_cache = _request_cache()
+    if request_cache is not None:
+        for cache_key in [k for k in request_cache if match(k)]:
+            del request_cache[cache_key]
+
+
+def clear():
+    _process_cache.clear()
+    request_cache = _request_cache()
+    if request_cache is not None:
+        request_cache.clear()
@@ -0,0 +1,119 @@
+"""
+Time-ordered, collision-free ids for doctors, caretakers and prescriptions.
+
+    ids.new('RX')   # 'RX0A90PHM5W0000'
+
+An id is a 63-bit Snowflake-style number, written as 13 Crockford base32
+characters after the prefix:
+
+    41 bits  milliseconds since EPOCH_MS (good until 2093)
+    10 bits  worker number
+    12 bits  sequence within the millisecond (4096 ids/ms per worker)
+
+Ids from one process never repeat and always increase, even if the clock
+steps back (the last timestamp is reused) or a millisecond runs out of
+sequence numbers (the next one is borrowed). Two processes cannot collide
+as long as their worker numbers differ, so an INSERT never needs a
+retry. Because new ids sort after older ones, the UNIQUE index
+grows at its right edge instead of splitting pages at random.
+
+Worker numbers: ID_WORKER (default 0) for this machine; gunicorn workers
+add their slot (1, 2, ...), handed out by gunicorn.conf.py so that no two
+live workers share one. Give each machine, and any CLI import running
+alongside the server, its own ID_WORKER range. Other processes started
+without ID_WORKER (uvicorn --workers N, flask run, a CLI command) take
+their pid mod 1024 and print a warning, since two such pids can clash.
+"""
+
+import os
+import threading
+import time
+
+EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+# Crockford base32: no I, L, O or U, so ids read back unambiguously
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+WIDTH = 13
+
+# None when unset: see worker_number()
+WORKER = int(os.environ['ID_WORKER']) if os.getenv('ID_WORKER') else None
+
+
+class Generator:
+    """Monotonic 63-bit ids for one worker number; thread-safe."""
+
+    def __init__(self, worker, clock=time.time):
+        if not 0 <= worker <= MAX_WORKER:
+            raise ValueError(f"worker must be between 0 and {MAX_WORKER}, got {worker}")
+        self.worker = worker
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def next_int(self):
+        with self._lock:
+            now = max(int(self._clock() * 1000) - EPOCH_MS, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+            return (now << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker << SEQUENCE_BITS) | self._sequence
+
+
+def encode(value):
+    """Fixed-width base32, so string order matches numeric order."""
+    chars = []
+    for _ in range(WIDTH):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def decode(text):
+    value = 0
+    for char in text[-WIDTH:]:
+        value = value * 32 + ALPHABET.index(char)
+    return value
+
+
+def worker_number():
+    """ID_WORKER, or for a process started without one, its pid mod 1024."""
+    if WORKER is not None:
+        return WORKER
+    worker = os.getpid() % (MAX_WORKER + 1)
+    print(f"WARNING: ID_WORKER is not set; ids from this process use worker number {worker} "
+          f"(pid mod {MAX_WORKER + 1}). Give every process that creates ids its own ID_WORKER.")
+    return worker
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def new(prefix=''):
+    """A new id such as DR0A90PHM5W0000."""
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                _generator = Generator(worker_number())
+    return prefix + encode(_generator.next_int())
+
+
+def after_fork(slot=0):
+    """Fresh generator (and lock) in a forked worker, under worker number ID_WORKER + slot.
+
+    Without a slot the worker picks its number on first use, like any
+    other process.
+    """
+    global _generator, _generator_lock
+    _generator = Generator((WORKER or 0) + slot) if slot else None
+    _generator_lock = threading.Lock()
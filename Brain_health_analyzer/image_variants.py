@@ -0,0 +1,118 @@
+"""
+Downscaled variants of prescription images.
+
+The signed original is never modified. Next to it we write
+
+    <file>.thumb.webp    list/preview thumbnails (320 px)
+    <file>.display.webp  compressed full-page view (1600 px)
+
+on a small background pool after the upload commits, so the request does
+not wait for decoding and resizing. Until a variant exists the original is
+served instead.
+
+Variants are only generated for files on local disk.
+"""
+
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+IMAGE_TYPES = {'png', 'jpg', 'jpeg', 'gif'}
+
+# name -> (longest side in px, WebP quality)
+VARIANTS = {
+    'thumb': (320, 70),
+    'display': (1600, 80),
+}
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_image(file_type):
+    return (file_type or '').lower() in IMAGE_TYPES
+
+
+def variant_path(original_path, name):
+    """Where the named variant of original_path is stored.
+
+    The original's extension is kept, so x.jpg and x.png get separate variants.
+    """
+    return f"{original_path}.{name}.webp"
+
+
+def _write_atomic(image, dest, quality):
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(dest) or '.', prefix='.variant-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            image.save(out, 'WEBP', quality=quality, method=4)
+        os.replace(temp_path, dest)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def generate(original_path):
+    """Write every missing variant for an image. Returns the names written."""
+    from PIL import Image, ImageOps
+
+    todo = {name: spec for name, spec in VARIANTS.items()
+            if not os.path.exists(variant_path(original_path, name))}
+    if not todo:
+        return []
+
+    largest = max(size for size, _ in todo.values())
+    with Image.open(original_path) as image:
+        # Let the JPEG decoder downscale while decoding
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        written = []
+        # Largest first, so each smaller variant resizes an already reduced image
+        for name, (size, quality) in sorted(todo.items(), key=lambda item: -item[1][0]):
+            image.thumbnail((size, size), Image.LANCZOS)
+            _write_atomic(image, variant_path(original_path, name), quality)
+            written.append(name)
+    return written
+
+
+def _generate_logged(original_path):
+    try:
+        return generate(original_path)
+    except Exception as e:
+        print(f"Image variant error for {original_path}: {e}")
+        return []
+
+
+def schedule(original_path):
+    """Generate variants on the background pool (inline if IMAGE_WORKERS=0)."""
+    global _executor
+    if IMAGE_WORKERS <= 0:
+        return _generate_logged(original_path)
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS,
+                                           thread_name_prefix='image-variants')
+    return _executor.submit(_generate_logged, original_path)
+
+
+def after_fork():
+    """Drop the parent's pool in a forked child; its threads did not survive."""
+    global _executor, _executor_lock
+    _executor = None
+    _executor_lock = threading.Lock()
+
+
+def delete(original_path):
+    """Remove an original's variants (when the original itself is removed)."""
+    for name in VARIANTS:
+        try:
+            os.remove(variant_path(original_path, name))
+        except FileNotFoundError:
+            pass
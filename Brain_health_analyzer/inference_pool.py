@@ -0,0 +1,191 @@
+"""
+Process-pool offload for EEG parsing and model scoring.
+
+pd.read_csv and clf.predict hold the GIL, so running them on a web thread
+stalls every other request handled by the same worker. Jobs submitted here
+run in child processes that each unpickle the model once at start-up.
+
+The number of queued/running jobs is capped; submissions beyond the cap
+fail fast with InferenceBusy so the caller can answer 503 instead of
+piling up work.
+"""
+
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+CLASS_LABELS = {
+    0: "Normal",
+    1: "Pre-seizure",
+    2: "Seizure",
+    3: "Post-seizure",
+}
+
+FEATURE_COUNT = 85
+
+# Model used by jobs in this process, loaded on first use (sklearn and the
+# unpickled forest take seconds to import, so web workers that only submit
+# jobs to the pool never load it)
+_model = None
+_model_lock = threading.Lock()
+
+
+class InferenceBusy(Exception):
+    """Raised when the pending-job limit has been reached."""
+
+
+def load_model(model_path):
+    """Load the model into this process once. Used as the child initializer."""
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import joblib
+
+                _model = joblib.load(model_path)
+    return _model
+
+
+# -------------------- JOBS (run in child processes) -------------------- #
+
+def analyze_features(features):
+    """Score a feature vector and return the class label or an error string."""
+    if isinstance(features, str):
+        try:
+            features = [float(x.strip()) for x in features.split(',')]
+        except ValueError:
+            return "Error: Invalid input format"
+
+    if not isinstance(features, list):
+        features = list(features)
+
+    if len(features) != FEATURE_COUNT:
+        return f"Error: Expected {FEATURE_COUNT} features, got {len(features)}"
+
+    try:
+        features = [float(f) for f in features]
+    except (TypeError, ValueError):
+        return "Error: All features must be numeric"
+
+    try:
+        Class = _model.predict([features])
+        return CLASS_LABELS.get(Class[0], f"Unknown class: {Class[0]}")
+    except Exception as e:
+        return f"Error during prediction: {str(e)}"
+
+
+def analyze_text(text):
+    """Parse comma-separated values and score them."""
+    features = [float(x.strip()) for x in text.split(',')]
+    return {"result": analyze_features(features), "features": features}
+
+
+def analyze_csv(raw_bytes):
+    """Parse an uploaded CSV, score its first row and render the preview."""
+    import pandas as pd
+
+    df = pd.read_csv(io.BytesIO(raw_bytes))
+
+    row = df.iloc[0].to_dict()
+    features = []
+    for i in range(1, FEATURE_COUNT + 1):
+        key = f"F{i}"
+        if key in row:
+            features.append(float(row[key]))
+        else:
+            features.append(0.0)
+
+    return {
+        "result": analyze_features(features),
+        "features": features,
+        "csv_preview": df.to_html(classes="table table-bordered table-striped"),
+    }
+
+
+# -------------------- POOL -------------------- #
+
+class InferencePool:
+    """Bounded front-end to a ProcessPoolExecutor preloaded with the model.
+
+    With workers=0 jobs run inline on the calling thread, which is handy for
+    development and tests.
+    """
+
+    def __init__(self, model_path, workers=2, max_pending=8, timeout=30):
+        self.model_path = model_path
+        self.workers = workers
+        self.timeout = timeout
+        self._max_pending = max(1, max_pending)
+        self._slots = threading.BoundedSemaphore(self._max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn: never fork a parent that already runs request threads
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn'),
+                        initializer=load_model,
+                        initargs=(self.model_path,),
+                    )
+        return self._executor
+
+    def run(self, fn, *args):
+        """Run fn(*args) in the pool and wait for its result.
+
+        Raises InferenceBusy when too many jobs are pending and
+        concurrent.futures.TimeoutError when the job exceeds the timeout.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise InferenceBusy()
+
+        if self.workers <= 0:
+            try:
+                load_model(self.model_path)
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result(timeout=self.timeout)
+
+    def preload(self):
+        """Load the model now (inline) or start every child and let it load."""
+        if self.workers <= 0:
+            load_model(self.model_path)
+            return
+        executor = self._get_executor()
+        for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def after_fork(self):
+        """Forget the parent's process pool in a forked child (never shut it down)."""
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self._max_pending)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+def pool_from_env(model_path):
+    """Build an InferencePool configured from INFERENCE_* variables."""
+    return InferencePool(
+        model_path,
+        workers=int(os.getenv('INFERENCE_WORKERS', min(2, os.cpu_count() or 1))),
+        max_pending=int(os.getenv('INFERENCE_MAX_PENDING', 8)),
+        timeout=float(os.getenv('INFERENCE_TIMEOUT', 30)),
+    )
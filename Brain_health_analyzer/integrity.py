@@ -0,0 +1,162 @@
+"""
+Prescription file integrity checks.
+
+Digests are cached per (path, mtime, size, inode), so verifying an
+unchanged file costs one stat() instead of a full re-read; any write,
+replace or truncate changes the key and forces a fresh hash.
+
+audit() checks many prescriptions at once on a thread pool. hashlib
+releases the GIL while hashing large buffers, so reads and hashing of
+different files overlap.
+"""
+
+import csv
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from identity_cache import TTLCache
+
+READ_SIZE = 1024 * 1024  # 1 MiB
+AUDIT_WORKERS = int(os.getenv('AUDIT_WORKERS', 8))
+
+# The stat signature in the key already invalidates entries; the TTL only
+# bounds how long unused digests stay in memory
+_digests = TTLCache(ttl=float(os.getenv('INTEGRITY_CACHE_TTL', 3600)),
+                    max_entries=int(os.getenv('INTEGRITY_CACHE_SIZE', 4096)))
+
+VERIFIED = 'verified'
+TAMPERED = 'tampered'
+MISSING = 'missing'
+# The file could not be read (permissions, storage backend down, ...)
+UNREADABLE = 'unreadable'
+
+
+def hash_stream(stream, read_size=READ_SIZE):
+    """SHA-256 of a binary stream read in large chunks. Returns (hexdigest, bytes)."""
+    sha256 = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(read_size), b''):
+        sha256.update(chunk)
+        size += len(chunk)
+    return sha256.hexdigest(), size
+
+
+def hash_file(path, read_size=READ_SIZE):
+    """SHA-256 of a file, reusing one buffer. Returns (hexdigest, bytes)."""
+    sha256 = hashlib.sha256()
+    size = 0
+    buffer = bytearray(read_size)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            sha256.update(view[:n])
+            size += n
+    return sha256.hexdigest(), size
+
+
+def file_digest(path):
+    """Cached SHA-256 of a local file.
+
+    Returns (hexdigest, bytes_read); bytes_read is 0 on a cache hit.
+    Raises FileNotFoundError if the file is gone.
+    """
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size, st.st_ino)
+    digest = _digests.get(key)
+    if digest is not None:
+        return digest, 0
+
+    digest, size = hash_file(path)
+    _digests.set(key, digest)
+    return digest, size
+
+
+def validator(path, expected):
+    """(etag, last_modified) for verifying path against expected, without hashing.
+
+    Changes whenever the file (same key as the digest cache) or the stored
+    signature does. Raises FileNotFoundError if the file is gone.
+    """
+    st = os.stat(path)
+    key = f"{expected}:{st.st_mtime_ns}:{st.st_size}:{st.st_ino}"
+    return hashlib.sha256(key.encode()).hexdigest()[:32], datetime.fromtimestamp(st.st_mtime, timezone.utc)
+
+
+def _digest(path, digest_fn):
+    """(actual_digest, bytes_read, None), or (None, 0, status) when the file cannot be read."""
+    try:
+        return (*digest_fn(path), None)
+    except FileNotFoundError:
+        return None, 0, MISSING
+    except Exception as e:  # OSError, or whatever the blob store's client raises
+        print(f"Integrity check error for {path}: {e!r}")
+        return None, 0, UNREADABLE
+
+
+def verify(path, expected, digest_fn=file_digest):
+    """Compare a file against its stored signature.
+
+    Returns (status, actual_digest, bytes_read); the status is MISSING or
+    UNREADABLE, never an exception, when the file cannot be read.
+    """
+    actual, size, failure = _digest(path, digest_fn)
+    if failure:
+        return failure, None, 0
+    return (VERIFIED if actual == expected else TAMPERED), actual, size
+
+
+def audit(rows, digest_fn=file_digest, workers=AUDIT_WORKERS):
+    """Verify prescription rows (dicts with id, prescription_id, file_path,
+    digital_signature) on a thread pool.
+
+    Files shared by several prescriptions are hashed once, and a file that
+    cannot be read only marks its own rows. Returns (results, bytes_read,
+    seconds) where results holds one dict per row with status and
+    actual_digest added.
+    """
+    by_path = {}
+    for row in rows:
+        by_path.setdefault(row['file_path'], []).append(row)
+
+    def check(path):
+        return path, _digest(path, digest_fn)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        digests = dict(executor.map(check, by_path))
+    elapsed = time.perf_counter() - started
+
+    results = []
+    bytes_read = 0
+    for path, (actual, size, failure) in digests.items():
+        bytes_read += size
+        for row in by_path[path]:
+            if failure:
+                status = failure
+            else:
+                status = VERIFIED if actual == row['digital_signature'] else TAMPERED
+            results.append(dict(row, status=status, actual_digest=actual))
+    return results, bytes_read, elapsed
+
+
+def write_report(results, path):
+    """Write the rows that failed verification as CSV. Returns the count."""
+    failed = [r for r in results if r['status'] != VERIFIED]
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'prescription_id', 'file_path', 'status',
+                         'digital_signature', 'actual_digest'])
+        for r in failed:
+            writer.writerow([r['id'], r['prescription_id'], r['file_path'], r['status'],
+                             r['digital_signature'], r['actual_digest'] or ''])
+    return len(failed)
+
+
+def clear():
+    _digests.clear()
@@ -0,0 +1,84 @@
+"""
+One-time codes in patient_otp.
+
+There is at most one row per (aadhar_id, purpose): issuing a new code
+overwrites the previous one, so the table stays bounded by the number of
+patients and a stale code stops working as soon as a new one is sent.
+Codes are consumed with a single conditional UPDATE served by that unique
+index; rowcount says whether the code was valid. purge() deletes used and
+expired rows in batches for a periodic job.
+
+Doctors and caretakers both verify the patient's PATIENT_ACCESS code, as
+they did before codes had a purpose; it is also the column default, so
+rows written without a purpose are found by consume().
+"""
+
+import secrets
+
+PATIENT_ACCESS = 'patient_access'
+
+CODE_DIGITS = 6
+TTL_MINUTES = 10
+PURGE_BATCH = 1000
+
+CREATE_TABLE = f'''
+    CREATE TABLE IF NOT EXISTS patient_otp (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        aadhar_id VARCHAR(16) NOT NULL,
+        purpose VARCHAR(32) NOT NULL DEFAULT '{PATIENT_ACCESS}',
+        otp VARCHAR(6) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP,
+        is_used BOOLEAN DEFAULT FALSE,
+        UNIQUE KEY uq_patient_otp_purpose (aadhar_id, purpose),
+        INDEX idx_patient_otp_expires (expires_at)
+    )
+'''
+
+
+def generate_code():
+    return ''.join(secrets.choice('0123456789') for _ in range(CODE_DIGITS))
+
+
+def issue(cursor, aadhar_id, purpose, ttl_minutes=TTL_MINUTES):
+    """Create (or replace) the active code for aadhar_id/purpose. Returns the code."""
+    code = generate_code()
+    cursor.execute(f'''
+        INSERT INTO patient_otp (aadhar_id, purpose, otp, expires_at, is_used)
+        VALUES (%s, %s, %s, NOW() + INTERVAL {int(ttl_minutes)} MINUTE, FALSE)
+        ON DUPLICATE KEY UPDATE
+            otp = VALUES(otp),
+            created_at = CURRENT_TIMESTAMP,
+            expires_at = VALUES(expires_at),
+            is_used = FALSE
+    ''', (aadhar_id, purpose, code))
+    return code
+
+
+def consume(cursor, aadhar_id, purpose, code):
+    """Mark the code used if it is valid. Returns True when it was."""
+    cursor.execute('''
+        UPDATE patient_otp SET is_used = TRUE
+        WHERE aadhar_id = %s AND purpose = %s AND otp = %s
+        AND is_used = FALSE AND expires_at > NOW()
+    ''', (aadhar_id, purpose, code))
+    return cursor.rowcount == 1
+
+
+def purge(conn, batch_size=PURGE_BATCH):
+    """Delete used and expired codes, committing every batch. Returns rows deleted."""
+    cursor = conn.cursor()
+    deleted = 0
+    try:
+        while True:
+            cursor.execute('''
+                DELETE FROM patient_otp
+                WHERE is_used = TRUE OR expires_at IS NULL OR expires_at <= NOW()
+                LIMIT %s
+            ''', (batch_size,))
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                return deleted
+    finally:
+        cursor.close()
@@ -0,0 +1,163 @@
+"""
+Password hashing with a work factor calibrated to a latency target.
+
+Hashes are PBKDF2-HMAC-SHA256 (hashlib, no extra dependency) stored as
+
+    pbkdf2_sha256$<iterations>$<salt>$<hash>
+
+The iteration count is measured on first use so one hash costs about
+PASSWORD_HASH_TARGET_MS on this machine (never below MIN_ITERATIONS);
+PASSWORD_ITERATIONS pins it instead. Hashes made with clearly fewer
+iterations (below REHASH_BELOW of the current count), and
+legacy plaintext passwords, verify once and report needs_rehash so the
+caller can upgrade the row on successful login.
+
+Verification runs on a bounded thread pool. hashlib releases the GIL while
+hashing, so PASSWORD_WORKERS logins hash in parallel and a burst beyond
+PASSWORD_MAX_PENDING is rejected with PasswordBusy instead of piling up
+CPU-bound work behind the web threads.
+"""
+
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ALGORITHM = 'pbkdf2_sha256'
+MIN_ITERATIONS = 100_000
+MAX_ITERATIONS = 2_000_000
+REHASH_BELOW = 0.75
+TARGET_MS = float(os.getenv('PASSWORD_HASH_TARGET_MS', 60))
+WORKERS = int(os.getenv('PASSWORD_WORKERS', os.cpu_count() or 2))
+MAX_PENDING = int(os.getenv('PASSWORD_MAX_PENDING', 64))
+WAIT_TIMEOUT = float(os.getenv('PASSWORD_WAIT_TIMEOUT', 5))
+
+_iterations = int(os.getenv('PASSWORD_ITERATIONS', 0)) or None
+_calibrate_lock = threading.Lock()
+
+_executor = None
+_slots = threading.BoundedSemaphore(MAX_PENDING)
+_executor_lock = threading.Lock()
+
+
+class PasswordBusy(Exception):
+    """Too many password checks are already queued."""
+
+
+def _b64(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _derive(password, salt, iterations):
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+
+
+def calibrate(target_ms=TARGET_MS, sample_iterations=20_000, samples=3):
+    """Iterations that take about target_ms for one hash here."""
+    elapsed = float('inf')
+    for _ in range(samples):
+        start = time.perf_counter()
+        _derive('calibration', b'salt' * 4, sample_iterations)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    iterations = int(sample_iterations * (target_ms / 1000) / max(elapsed, 1e-6))
+    # Round to a multiple of 10k so repeated startups agree
+    iterations = round(iterations, -4)
+    return max(MIN_ITERATIONS, min(MAX_ITERATIONS, iterations))
+
+
+def iterations():
+    """Current work factor, calibrated on first use."""
+    global _iterations
+    if _iterations is None:
+        with _calibrate_lock:
+            if _iterations is None:
+                _iterations = calibrate()
+    return _iterations
+
+
+def is_hashed(stored):
+    return bool(stored) and stored.startswith(ALGORITHM + '$')
+
+
+def hash_password(password, rounds=None):
+    rounds = rounds or iterations()
+    salt = secrets.token_bytes(16)
+    return f"{ALGORITHM}${rounds}${_b64(salt)}${_b64(_derive(password, salt, rounds))}"
+
+
+def check_password(password, stored):
+    """Returns (matches, needs_rehash) for a stored hash or legacy plaintext."""
+    if stored is None or password is None:
+        return False, False
+
+    if not is_hashed(stored):
+        # Legacy plaintext row
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8')), True
+
+    try:
+        _, rounds, salt, expected = stored.split('$')
+        rounds = int(rounds)
+        salt = base64.b64decode(salt + '=' * (-len(salt) % 4))
+    except ValueError:
+        return False, False
+    matches = hmac.compare_digest(_b64(_derive(password, salt, rounds)), expected)
+    # Some slack, so calibration noise between restarts does not rehash everyone
+    return matches, matches and rounds < iterations() * REHASH_BELOW
+
+
+def _pool():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, WORKERS),
+                                           thread_name_prefix='password')
+    return _executor
+
+
+def _run(fn, *args):
+    if not _slots.acquire(timeout=WAIT_TIMEOUT):
+        raise PasswordBusy()
+    try:
+        return _pool().submit(fn, *args).result()
+    finally:
+        _slots.release()
+
+
+def after_fork():
+    """Fresh pool and slots in a forked child; the parent's threads did not survive."""
+    global _executor, _slots, _executor_lock
+    _executor = None
+    _slots = threading.BoundedSemaphore(MAX_PENDING)
+    _executor_lock = threading.Lock()
+
+
+def verify(password, stored):
+    """check_password() on the bounded pool. Raises PasswordBusy when saturated."""
+    if WORKERS <= 0:
+        return check_password(password, stored)
+    return _run(check_password, password, stored)
+
+
+def make(password):
+    """hash_password() on the bounded pool."""
+    if WORKERS <= 0:
+        return hash_password(password)
+    return _run(hash_password, password)
+
+
+def make_many(passwords):
+    """hash_password() for a batch (bulk import), WORKERS hashes at a time.
+
+    Values that are already hashes are kept, so exports of this app can be
+    imported without re-hashing.
+    """
+    pending = [p for p in passwords if not is_hashed(p)]
+    if WORKERS <= 0:
+        hashed = iter([hash_password(p) for p in pending])
+    else:
+        hashed = _pool().map(hash_password, pending)
+    return [p if is_hashed(p) else next(hashed) for p in passwords]
@@ -0,0 +1,173 @@
+"""
+Incrementally maintained per-patient summary.
+
+patient_summary holds the latest brain-report class and last prescription
+date for each patient; patient_seizure_days holds seizure counts per day.
+The doctor dashboard reads one summary row plus at most 30 day buckets per
+patient instead of scanning brain_reports and prescriptions.
+
+The record_*/forget_* helpers take the caller's cursor so the summary
+changes commit in the same transaction as the report/prescription write.
+rebuild() recomputes everything from the base tables for repair.
+"""
+
+SEIZURE_RESULT = 'Seizure'
+WINDOW_DAYS = 30
+
+CREATE_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS patient_summary (
+        patient_aadhar VARCHAR(16) PRIMARY KEY,
+        latest_report_id INT,
+        latest_report_result VARCHAR(50),
+        latest_report_at TIMESTAMP NULL,
+        last_prescription_date DATE,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (patient_aadhar) REFERENCES patients(aadhar_id)
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS patient_seizure_days (
+        patient_aadhar VARCHAR(16) NOT NULL,
+        day DATE NOT NULL,
+        seizure_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (patient_aadhar, day)
+    )
+    ''',
+]
+
+# Columns to add to a patient query aliased as p
+SUMMARY_COLUMNS = f'''
+    ps.latest_report_result, ps.latest_report_at, ps.last_prescription_date,
+    (SELECT COALESCE(SUM(sd.seizure_count), 0) FROM patient_seizure_days sd
+     WHERE sd.patient_aadhar = p.aadhar_id
+     AND sd.day >= CURDATE() - INTERVAL {WINDOW_DAYS} DAY) AS seizures_30d
+'''
+SUMMARY_JOIN = 'LEFT JOIN patient_summary ps ON ps.patient_aadhar = p.aadhar_id'
+
+
+def record_report(cursor, aadhar_id, report_id, result):
+    """A new brain report was stored for the patient."""
+    cursor.execute('''
+        INSERT INTO patient_summary (patient_aadhar, latest_report_id, latest_report_result, latest_report_at)
+        VALUES (%s, %s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            latest_report_id = VALUES(latest_report_id),
+            latest_report_result = VALUES(latest_report_result),
+            latest_report_at = VALUES(latest_report_at)
+    ''', (aadhar_id, report_id, result))
+
+    if result == SEIZURE_RESULT:
+        cursor.execute('''
+            INSERT INTO patient_seizure_days (patient_aadhar, day, seizure_count)
+            VALUES (%s, CURDATE(), 1)
+            ON DUPLICATE KEY UPDATE seizure_count = seizure_count + 1
+        ''', (aadhar_id,))
+
+
+def forget_report(cursor, report):
+    """A brain report (dict with id, aadhar_id, result, created_at) was deleted."""
+    aadhar_id = report['aadhar_id']
+
+    if report['result'] == SEIZURE_RESULT:
+        cursor.execute('''
+            UPDATE patient_seizure_days SET seizure_count = GREATEST(seizure_count - 1, 0)
+            WHERE patient_aadhar = %s AND day = DATE(%s)
+        ''', (aadhar_id, report['created_at']))
+
+    # Only the latest report needs a lookup for its replacement
+    cursor.execute('''
+        UPDATE patient_summary ps
+        LEFT JOIN (
+            SELECT id, result, created_at FROM brain_reports
+            WHERE aadhar_id = %s
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+        ) br ON TRUE
+        SET ps.latest_report_id = br.id,
+            ps.latest_report_result = br.result,
+            ps.latest_report_at = br.created_at
+        WHERE ps.patient_aadhar = %s AND ps.latest_report_id = %s
+    ''', (aadhar_id, aadhar_id, report['id']))
+
+
+def record_prescription(cursor, aadhar_id, prescription_date):
+    """A prescription dated prescription_date was created for the patient."""
+    cursor.execute('''
+        INSERT INTO patient_summary (patient_aadhar, last_prescription_date)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE last_prescription_date =
+            GREATEST(COALESCE(last_prescription_date, VALUES(last_prescription_date)),
+                     VALUES(last_prescription_date))
+    ''', (aadhar_id, prescription_date))
+
+
+def forget_prescription(cursor, aadhar_id, prescription_date):
+    """A prescription was deleted; recompute the date only if it was the last one."""
+    cursor.execute('''
+        UPDATE patient_summary
+        SET last_prescription_date = (
+            SELECT MAX(prescription_date) FROM prescriptions WHERE patient_aadhar = %s
+        )
+        WHERE patient_aadhar = %s AND last_prescription_date <= %s
+    ''', (aadhar_id, aadhar_id, prescription_date))
+
+
+def rebuild(conn):
+    """Recompute both tables from brain_reports and prescriptions.
+
+    Returns (summary_rows, seizure_day_rows).
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute('DELETE FROM patient_seizure_days')
+        cursor.execute('DELETE FROM patient_summary')
+
+        cursor.execute('''
+            INSERT INTO patient_summary (patient_aadhar, latest_report_id, latest_report_result,
+                                         latest_report_at, last_prescription_date)
+            SELECT p.aadhar_id, br.id, br.result, br.created_at, rx.last_date
+            FROM patients p
+            LEFT JOIN (
+                SELECT id, aadhar_id, result, created_at,
+                       ROW_NUMBER() OVER (PARTITION BY aadhar_id ORDER BY created_at DESC, id DESC) AS rn
+                FROM brain_reports
+            ) br ON br.aadhar_id = p.aadhar_id AND br.rn = 1
+            LEFT JOIN (
+                SELECT patient_aadhar, MAX(prescription_date) AS last_date
+                FROM prescriptions GROUP BY patient_aadhar
+            ) rx ON rx.patient_aadhar = p.aadhar_id
+            WHERE br.id IS NOT NULL OR rx.last_date IS NOT NULL
+        ''')
+        summary_rows = cursor.rowcount
+
+        cursor.execute(f'''
+            INSERT INTO patient_seizure_days (patient_aadhar, day, seizure_count)
+            SELECT aadhar_id, DATE(created_at), COUNT(*)
+            FROM brain_reports
+            WHERE result = %s AND created_at >= CURDATE() - INTERVAL {WINDOW_DAYS} DAY
+            GROUP BY aadhar_id, DATE(created_at)
+        ''', (SEIZURE_RESULT,))
+        day_rows = cursor.rowcount
+
+        conn.commit()
+        return summary_rows, day_rows
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def prune(conn):
+    """Drop day buckets that have left the window. Returns rows deleted."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f'''
+            DELETE FROM patient_seizure_days
+            WHERE day < CURDATE() - INTERVAL {WINDOW_DAYS} DAY
+        ''')
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
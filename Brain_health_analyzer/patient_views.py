@@ -0,0 +1,361 @@
+"""
+Patient routes: signup/login, dashboard, selected doctors, profile,
+prescriptions and the brain-signal analysis they send to their doctors.
+"""
+
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+
+import accounts
+import dashboard_data
+import db
+import inference_pool
+import passwords
+import patient_summary
+import prescription_store
+from app import (account_changed, delete_prescription_file, rate_limited, revoke_sessions, role_required,
+                 rotate_session, run_inference, session_user_key)
+from totp_views import check_second_factor
+
+bp = Blueprint('patient', __name__)
+
+
+@bp.route('/patient/signup', methods=['GET', 'POST'])
+def signup():
+    if request.method == 'POST':
+        aadhar_id = request.form['aadhar_id']
+        name = request.form['name']
+        email = request.form['email']
+        password = request.form['password']  # hashed before storing
+        phone = request.form['phone']
+        date_of_birth = request.form['date_of_birth']
+        address = request.form['address']
+        blood_group = request.form['blood_group']
+        emergency_contact = request.form['emergency_contact']
+
+        try:
+            with db.transaction() as cursor:
+                cursor.execute('''
+                    INSERT INTO patients (aadhar_id, name, email, password, phone, date_of_birth, address, blood_group, emergency_contact)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ''', (aadhar_id, name, email, passwords.make(password), phone, date_of_birth, address, blood_group, emergency_contact))
+            accounts.invalidate('patient', aadhar_id)
+            flash('Patient registered successfully! Please login.', 'success')
+            return redirect(url_for('patient.login'))
+        except db.Error as e:
+            flash('Error during registration. Patient might already exist.', 'error')
+
+    return render_template('patient_signup.html')
+
+
+@bp.route('/patient/login', methods=['GET', 'POST'])
+@rate_limited('login', lambda: request.form.get('aadhar_id'), template='patient_login.html')
+def login():
+    if request.method == 'POST':
+        aadhar_id = request.form['aadhar_id']
+        password = request.form['password']
+        totp_code = request.form.get('totp_code', '')
+        backup_code = request.form.get('backup_code', '')
+
+        with db.transaction(dictionary=True, prepared=True) as cursor:
+            patient = accounts.load(cursor, 'patient', aadhar_id)
+
+            if not patient:
+                flash("User not found! Please sign up first.", "error")
+                return render_template("patient_login.html")
+
+            if not accounts.password_matches(cursor, 'patient', aadhar_id, password, patient["password"]):
+                flash("Incorrect password!", "error")
+                return render_template("patient_login.html")
+
+            error = check_second_factor(cursor, 'patient', patient, totp_code, backup_code)
+            if error:
+                flash(error, "error")
+                return render_template("patient_login.html", show_totp=True)
+
+        # Login successful
+        rotate_session()
+        session["user_type"] = "patient"
+        session["patient_aadhar"] = aadhar_id
+        flash("Login successful!", "success")
+        return redirect(url_for("patient.dashboard"))
+
+    return render_template("patient_login.html")
+
+
+@bp.route('/patient/dashboard')
+@role_required('patient')
+def dashboard():
+    # Doctors, prescriptions and summary counts in one round trip; the
+    # doctor directory is fetched on demand from /api/doctors
+    try:
+        with db.connection() as conn:
+            data = dashboard_data.patient_dashboard(conn, session['patient_aadhar'])
+    except db.Error as e:
+        print(f"Patient dashboard error: {e}")
+        flash('Database error occurred', 'error')
+        data = {'selected_doctors': [], 'prescriptions': [], 'summary': {'reports_sent': 0, 'recent_seizures': 0, 'prescriptions_this_month': 0}}
+
+    return render_template('patient_dashboard.html',
+                           patient_aadhar=session['patient_aadhar'],
+                           selected_doctors=data['selected_doctors'],
+                           prescriptions=data['prescriptions'],
+                           summary=data['summary'])
+
+
+def doctors_changed():
+    """New key for the patient's cached doctor list, seen by every worker via the session."""
+    session['doctors_version'] = session.get('doctors_version', 0) + 1
+
+
+@bp.route('/patient/select-doctor', methods=['POST'])
+@role_required('patient')
+def select_doctor():
+    doctor_id = request.form['doctor_id']
+
+    try:
+        with db.transaction() as cursor:
+            cursor.execute('''
+                SELECT id FROM patient_doctors
+                WHERE patient_aadhar = %s AND doctor_id = %s
+            ''', (session['patient_aadhar'], doctor_id))
+            existing = cursor.fetchone()
+
+            if not existing:
+                cursor.execute('''
+                    INSERT INTO patient_doctors (patient_aadhar, doctor_id)
+                    VALUES (%s, %s)
+                ''', (session['patient_aadhar'], doctor_id))
+        if not existing:
+            doctors_changed()
+            flash('Doctor added successfully!', 'success')
+        else:
+            flash('Doctor is already in your list!', 'warning')
+    except db.Error as e:
+        print(f"Select doctor error: {e}")
+        flash('Error selecting doctor', 'error')
+
+    return redirect(url_for('patient.dashboard'))
+
+
+@bp.route('/patient/remove-doctor/<doctor_id>')
+@role_required('patient')
+def remove_doctor(doctor_id):
+    try:
+        with db.transaction() as cursor:
+            cursor.execute('''
+                DELETE FROM patient_doctors
+                WHERE patient_aadhar = %s AND doctor_id = %s
+            ''', (session['patient_aadhar'], doctor_id))
+        doctors_changed()
+        flash('Doctor removed successfully!', 'success')
+    except db.Error as e:
+        print(f"Remove doctor error: {e}")
+        flash('Error removing doctor', 'error')
+
+    return redirect(url_for('patient.dashboard'))
+
+
+@bp.route('/patient/profile', methods=['GET', 'POST'])
+@role_required('patient')
+def profile():
+    if request.method == 'POST':
+        # Get form data
+        name = request.form.get('name')
+        email = request.form.get('email')
+        phone = request.form.get('phone')
+        address = request.form.get('address')
+        emergency_contact = request.form.get('emergency_contact')
+        current_password = request.form.get('current_password')
+        new_password = request.form.get('new_password')
+
+        try:
+            with db.transaction() as cursor:
+                changes = dict(name=name, email=email, phone=phone, address=address,
+                               emergency_contact=emergency_contact)
+
+                # Verify current password if changing password
+                if new_password:
+                    cursor.execute('SELECT password FROM patients WHERE aadhar_id = %s', (session['patient_aadhar'],))
+                    result = cursor.fetchone()
+                    if not (result and passwords.verify(current_password, result[0])[0]):
+                        flash('Current password is incorrect!', 'error')
+                        return redirect(url_for('patient.profile'))
+                    changes['password'] = passwords.make(new_password)
+
+                accounts.update(cursor, 'patient', session['patient_aadhar'], **changes)
+
+            account_changed()
+            if new_password:
+                revoke_sessions(session_user_key(session))
+            flash('Profile updated successfully!', 'success')
+
+        except db.Error as e:
+            print(f"Profile update error: {e}")
+            flash('Error updating profile', 'error')
+
+        return redirect(url_for('patient.profile'))
+
+    # GET request - show profile
+    try:
+        patient = accounts.get('patient', session['patient_aadhar'], version=session.get('account_version', 0))
+    except db.Error as e:
+        print(f"Profile fetch error: {e}")
+        patient = None
+
+    return render_template('patient_profile.html', patient=patient)
+
+
+@bp.route('/patient/delete-prescription/<int:prescription_id>', methods=['POST'])
+@role_required('patient')
+def delete_prescription(prescription_id):
+    try:
+        with db.transaction(dictionary=True) as cursor:
+            # Get prescription details to delete file
+            cursor.execute('SELECT file_path, patient_aadhar, prescription_date FROM prescriptions WHERE id = %s', (prescription_id,))
+            prescription = cursor.fetchone()
+
+            if prescription and prescription['patient_aadhar'] == session['patient_aadhar']:
+                # Delete from database
+                cursor.execute('DELETE FROM prescriptions WHERE id = %s', (prescription_id,))
+                patient_summary.forget_prescription(cursor, prescription['patient_aadhar'],
+                                                    prescription['prescription_date'])
+
+                # Remove the file only with its last reference (untracked legacy
+                # files belong to this prescription alone), and only once the
+                # delete has committed
+                file_path = prescription['file_path']
+                if file_path and prescription_store.release(cursor, file_path) is not False:
+                    db.after_commit(lambda: delete_prescription_file(file_path))
+                flash('Prescription deleted successfully!', 'success')
+            else:
+                flash('Unauthorized to delete this prescription!', 'error')
+
+    except db.Error as e:
+        print(f"Delete prescription error: {e}")
+        flash('Error deleting prescription', 'error')
+
+    return redirect(url_for('patient.dashboard'))
+
+
+# -------------------- BRAIN SIGNAL ANALYSIS -------------------- #
+
+@bp.route("/brain_signal_ai/<aadhar_id>", methods=["GET", "POST"])
+def brain_signal_ai(aadhar_id):
+    if request.method == "POST":
+
+        # Get patient's selected doctors
+        selected_doctors = accounts.get_selected_doctors(session['patient_aadhar'],
+                                                         session.get('doctors_version', 0))
+        # ------------------------------
+        # MANUAL F1–F85 ENTRIES
+        # ------------------------------
+        manual_features = {}
+        for i in range(1, 86):   # F1 to F85
+            value = request.form.get(f"F{i}")
+            if value and value.strip() != "":
+                manual_features[f"F{i}"] = float(value.strip())
+
+        # If manual fields exist → process them
+        if manual_features:
+            result, busy = run_inference(inference_pool.analyze_features, list(manual_features.values()))
+            if busy:
+                return busy
+            return render_template(
+                "brain_result.html",
+                result=result,
+                manual_features=manual_features,   # <-- PASS TO TEMPLATE
+                csv_preview=None,
+                features=list(manual_features.values()),
+                doctors=selected_doctors,
+                aadhar_id=aadhar_id
+            )
+
+        # ------------------------------
+        # TEXT-BASED INPUT
+        # ------------------------------
+        text = request.form.get("signal_text")
+        if text and text.strip() != "":
+            # Parse comma-separated values
+            try:
+                analysis, busy = run_inference(inference_pool.analyze_text, text)
+                if busy:
+                    return busy
+                return render_template(
+                    "brain_result.html",
+                    result=analysis["result"],
+                    manual_features=None,
+                    csv_preview=None,
+                    features=analysis["features"],
+                    doctors=selected_doctors,
+                    aadhar_id=aadhar_id
+                )
+            except Exception as e:
+                return f"Text input error: {str(e)}. Please provide 85 comma-separated numeric values."
+
+        # ------------------------------
+        # FILE UPLOAD (CSV)
+        # ------------------------------
+        file = request.files.get("signal_file")
+        if file and file.filename != "":
+            filename = file.filename.lower()
+
+            if filename.endswith(".csv"):
+                try:
+                    # Parsing and scoring run in the inference pool
+                    analysis, busy = run_inference(inference_pool.analyze_csv, file.read())
+                    if busy:
+                        return busy
+
+                    return render_template(
+                        "brain_result.html",
+                        result=analysis["result"],
+                        csv_preview=analysis["csv_preview"],
+                        features=analysis["features"],       # <-- SEND ORDERED FEATURE VECTOR
+                        manual_features=None,
+                        doctors=selected_doctors,
+                        aadhar_id=aadhar_id
+                    )
+
+                except Exception as e:
+                    return f"CSV parse error: {str(e)}"
+
+        return "No data provided"
+
+    return render_template("brain_signal_ai.html", aadhar_id=aadhar_id)
+
+
+@bp.route("/send_brain_report/<aadhar_id>", methods=["POST"])
+def send_brain_report(aadhar_id):
+    try:
+        doctor_email = request.form.get("doctor_email")
+        result = request.form.get("result")
+        features = request.form.get("features")
+        graph_image = request.form.get("graph_image")  # Base64 encoded graph image
+
+        if not doctor_email:
+            flash("Please select a doctor to send the report.", "error")
+            return redirect(request.referrer or url_for('patient.dashboard'))
+
+        # Store report in database with graph image
+        with db.transaction(dictionary=True) as cursor:
+            # The summary rows reference the patient; an unknown id would roll back the report
+            if accounts.load(cursor, 'patient', aadhar_id, projection=accounts.CARD) is None:
+                flash("Patient not found.", "error")
+                return redirect(request.referrer or url_for('patient.dashboard'))
+            cursor.execute("""
+                INSERT INTO brain_reports (aadhar_id, doctor_email, result, features, graph_image)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (aadhar_id, doctor_email, result, features, graph_image))
+            patient_summary.record_report(cursor, aadhar_id, cursor.lastrowid, result)
+
+        # OPTIONAL: Email to doctor
+        # send_email(doctor_email, "Brain Signal Report", f"Result:\n{result}")
+
+        flash("Brain signal report with EEG graph successfully sent to the doctor!", "success")
+        return render_template(
+            "success.html",
+            message="Brain signal report with EEG graph successfully sent to the doctor!"
+        )
+    except Exception as e:
+        flash(f"Error sending report: {str(e)}", "error")
+        return redirect(request.referrer or url_for('patient.dashboard'))
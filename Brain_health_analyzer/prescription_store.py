@@ -0,0 +1,220 @@
+"""
+Content-addressed, deduplicated storage for prescription files.
+
+Files are keyed by their SHA-256 digest and sharded into two directory
+levels (ab/cd/abcd....pdf), so no directory grows without bound and the
+same scan uploaded twice is stored once. The location string returned by
+a store is what goes into prescriptions.file_path.
+
+prescription_blobs counts how many prescriptions reference each location.
+The count changes in the same transaction as the prescriptions row, and a
+blob is removed only when its last reference goes:
+
+    create:  acquire() -> commit -> store.put()
+             (if put fails: delete the row and release() again)
+    delete:  release() -> commit -> is_referenced()? -> store.delete() -> commit
+
+The file is deleted only after the prescription's delete has committed, in
+a second transaction that first locks the location with is_referenced().
+An upload of the same file either committed its acquire() before that
+(the blob is kept) or waits in acquire() until the file is gone and then
+places it again, so it cannot lose its blob.
+
+Backends: LocalBlobStore (default) and S3BlobStore for S3-compatible
+services such as a local MinIO. Select with PRESCRIPTION_STORE=local|s3.
+"""
+
+import os
+
+CREATE_TABLE = '''
+    CREATE TABLE IF NOT EXISTS prescription_blobs (
+        location VARCHAR(500) PRIMARY KEY,
+        digest CHAR(64) NOT NULL,
+        size BIGINT,
+        ref_count INT NOT NULL DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+'''
+
+
+def shard_key(digest, extension):
+    """ab/cd/<digest>.<ext> for a hex digest."""
+    name = f"{digest}.{extension}" if extension else digest
+    return f"{digest[:2]}/{digest[2:4]}/{name}"
+
+
+class BlobStore:
+    """Interface for prescription blob backends."""
+
+    # Directory for upload temp files before they are placed
+    spool_dir = None
+
+    def location_for(self, digest, extension):
+        raise NotImplementedError
+
+    def put(self, temp_path, location):
+        """Move a finished temp file to location (consumes temp_path)."""
+        raise NotImplementedError
+
+    def open(self, location):
+        """Readable binary file object for a stored blob.
+
+        Raises FileNotFoundError if there is no such blob, whatever the backend.
+        """
+        raise NotImplementedError
+
+    def delete(self, location):
+        raise NotImplementedError
+
+    def exists(self, location):
+        raise NotImplementedError
+
+    def local_path(self, location):
+        """Filesystem path of the blob, or None if it is not on local disk."""
+        return None
+
+
+class LocalBlobStore(BlobStore):
+    """Sharded directories under the upload folder."""
+
+    def __init__(self, root):
+        self.root = root.replace("\\", "/").rstrip('/')
+        self.spool_dir = self.root
+        os.makedirs(self.root, exist_ok=True)
+
+    def location_for(self, digest, extension):
+        return f"{self.root}/{shard_key(digest, extension)}"
+
+    def put(self, temp_path, location):
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        # Same digest means same bytes, so replacing an existing blob is safe
+        os.replace(temp_path, location)
+
+    def open(self, location):
+        return open(location, 'rb')
+
+    def delete(self, location):
+        try:
+            os.remove(location)
+        except FileNotFoundError:
+            pass
+
+    def exists(self, location):
+        return os.path.exists(location)
+
+    def local_path(self, location):
+        return location
+
+
+class S3BlobStore(BlobStore):
+    """Blobs in an S3-compatible bucket (AWS, MinIO, ...); needs boto3."""
+
+    SCHEME = 's3://'
+    NOT_FOUND = ('NoSuchKey', '404')
+
+    def __init__(self, bucket, spool_dir, endpoint_url=None, prefix='prescriptions'):
+        import boto3
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.spool_dir = spool_dir
+        self.client = boto3.client('s3', endpoint_url=endpoint_url)
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def _key(self, location):
+        return location[len(self.SCHEME) + len(self.bucket) + 1:]
+
+    def location_for(self, digest, extension):
+        return f"{self.SCHEME}{self.bucket}/{self.prefix}/{shard_key(digest, extension)}"
+
+    def put(self, temp_path, location):
+        try:
+            self.client.upload_file(temp_path, self.bucket, self._key(location))
+        finally:
+            os.unlink(temp_path)
+
+    def open(self, location):
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(location))['Body']
+        except self.client.exceptions.ClientError as e:
+            if e.response.get('Error', {}).get('Code') in self.NOT_FOUND:
+                raise FileNotFoundError(location) from e
+            raise
+
+    def delete(self, location):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(location))
+
+    def presigned_url(self, location, download_name=None, expires=300):
+        """Short-lived URL for a blob; the bucket then handles Range/ETag itself."""
+        params = {'Bucket': self.bucket, 'Key': self._key(location)}
+        if download_name:
+            params['ResponseContentDisposition'] = f'attachment; filename="{download_name}"'
+        return self.client.generate_presigned_url('get_object', Params=params, ExpiresIn=expires)
+
+    def exists(self, location):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(location))
+            return True
+        except self.client.exceptions.ClientError:
+            return False
+
+
+def store_from_env(upload_folder):
+    """Build the store selected by PRESCRIPTION_STORE."""
+    backend = os.getenv('PRESCRIPTION_STORE', 'local')
+    if backend == 's3':
+        return S3BlobStore(
+            bucket=os.environ['S3_BUCKET'],
+            spool_dir=upload_folder,
+            endpoint_url=os.getenv('S3_ENDPOINT_URL') or None,
+        )
+    return LocalBlobStore(upload_folder)
+
+
+def is_local_location(location):
+    return bool(location) and not location.startswith(S3BlobStore.SCHEME)
+
+
+# -------------------- REFERENCE COUNTS -------------------- #
+
+def acquire(cursor, location, digest, size):
+    """Count one more prescription referencing location."""
+    cursor.execute('''
+        INSERT INTO prescription_blobs (location, digest, size, ref_count)
+        VALUES (%s, %s, %s, 1)
+        ON DUPLICATE KEY UPDATE ref_count = ref_count + 1
+    ''', (location, digest, size))
+
+
+def release(cursor, location):
+    """Drop one reference to location (locks the row until commit).
+
+    Returns True if that was the last reference, False if others remain and
+    None if the location is not tracked (files stored before this table).
+    """
+    cursor.execute('SELECT ref_count FROM prescription_blobs WHERE location = %s FOR UPDATE',
+                   (location,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+
+    ref_count = row['ref_count'] if isinstance(row, dict) else row[0]
+    if ref_count <= 1:
+        cursor.execute('DELETE FROM prescription_blobs WHERE location = %s', (location,))
+        return True
+
+    cursor.execute('UPDATE prescription_blobs SET ref_count = ref_count - 1 WHERE location = %s',
+                   (location,))
+    return False
+
+
+def is_referenced(cursor, location):
+    """Whether any prescription references location (checked before deleting it).
+
+    SELECT ... FOR UPDATE locks the row, or under InnoDB's default
+    REPEATABLE READ the gap where it would be, so acquire() of the same
+    location waits until the caller commits.
+    """
+    cursor.execute('SELECT ref_count FROM prescription_blobs WHERE location = %s FOR UPDATE',
+                   (location,))
+    return cursor.fetchone() is not None
@@ -0,0 +1,137 @@
+"""
+Token-bucket rate limiting for logins and one-time-code checks.
+
+Each rule has a burst capacity and a refill rate. An attempt takes one
+token from the bucket of the client IP and one from the bucket of the
+account it targets; when either is empty the attempt is rejected before
+the view runs, so a credential-stuffing burst never reaches MySQL.
+
+Buckets live in a small SQLite file (WAL mode) so every worker process on
+the host shares them. Each check is one short BEGIN IMMEDIATE transaction
+that also bumps per-rule allowed/rejected counters, readable with
+counters() or the rate-limit-stats CLI command.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+Rule = namedtuple('Rule', 'capacity refill_per_second')
+
+# Defaults: a few quick retries, then roughly one attempt a minute per
+# account; IPs get more room for shared NATs
+RULES = {
+    'login:ip': Rule(capacity=30, refill_per_second=0.5),
+    'login:account': Rule(capacity=5, refill_per_second=1 / 60),
+    'otp:ip': Rule(capacity=30, refill_per_second=0.5),
+    'otp:account': Rule(capacity=5, refill_per_second=1 / 60),
+    'totp:account': Rule(capacity=5, refill_per_second=1 / 60),
+}
+
+
+class SQLiteBuckets:
+    """Token buckets shared across processes through one SQLite file."""
+
+    def __init__(self, path, rules=None):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.rules = dict(RULES if rules is None else rules)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                bucket TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_counters (
+                rule TEXT PRIMARY KEY,
+                allowed INTEGER NOT NULL DEFAULT 0,
+                rejected INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def after_fork(self):
+        # SQLite connections must not cross a fork
+        self._local = threading.local()
+
+    def hit(self, checks, now=None):
+        """Take one token for each (rule, key) in checks.
+
+        Either every bucket is charged or none is. Returns (allowed,
+        retry_after_seconds).
+        """
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            updates = []
+            exhausted = set()
+            retry_after = 0.0
+            for rule_name, key in checks:
+                rule = self.rules[rule_name]
+                bucket = f"{rule_name}:{key}"
+                row = conn.execute('SELECT tokens, updated_at FROM rate_buckets WHERE bucket = ?',
+                                   (bucket,)).fetchone()
+                tokens = rule.capacity if row is None else min(
+                    rule.capacity, row[0] + (now - row[1]) * rule.refill_per_second)
+                if tokens < 1:
+                    exhausted.add(rule_name)
+                    retry_after = max(retry_after, (1 - tokens) / rule.refill_per_second)
+                updates.append((bucket, tokens))
+
+            allowed = retry_after == 0
+            for bucket, tokens in updates:
+                conn.execute('''
+                    INSERT INTO rate_buckets (bucket, tokens, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT(bucket) DO UPDATE SET tokens = excluded.tokens,
+                                                      updated_at = excluded.updated_at
+                ''', (bucket, tokens - 1 if allowed else tokens, now))
+
+            # Rejections are counted against the rules that ran out
+            column = 'allowed' if allowed else 'rejected'
+            for rule_name in ({name for name, _ in checks} if allowed else exhausted):
+                conn.execute(f'''
+                    INSERT INTO rate_counters (rule, {column}) VALUES (?, 1)
+                    ON CONFLICT(rule) DO UPDATE SET {column} = {column} + 1
+                ''', (rule_name,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return allowed, retry_after
+
+    def counters(self):
+        """{rule: {'allowed': n, 'rejected': n}} across all workers."""
+        rows = self._conn().execute('SELECT rule, allowed, rejected FROM rate_counters ORDER BY rule')
+        return {rule: {'allowed': allowed, 'rejected': rejected} for rule, allowed, rejected in rows}
+
+    def prune(self, now=None):
+        """Drop buckets that have refilled completely. Returns rows deleted."""
+        now = time.time() if now is None else now
+        deleted = 0
+        conn = self._conn()
+        for rule_name, rule in self.rules.items():
+            full_after = rule.capacity / rule.refill_per_second
+            cur = conn.execute('DELETE FROM rate_buckets WHERE bucket LIKE ? AND updated_at < ?',
+                               (rule_name + ':%', now - full_after))
+            deleted += cur.rowcount
+        return deleted
+
+
+def buckets_from_env(instance_path):
+    path = os.getenv('RATE_LIMIT_DB_PATH') or os.path.join(instance_path, 'rate_limit.sqlite3')
+    return SQLiteBuckets(path)
@@ -0,0 +1,331 @@
+"""
+Server-side sessions.
+
+The cookie carries only a random session id; the session data lives in a
+store (SQLite by default, or Redis) and is read through a short in-process
+cache, so most requests neither decode a signed cookie payload nor touch
+the store. Because the data is server-side, sessions can be revoked: one
+at a time, or every session of a user (e.g. after a password change).
+
+Expired rows are swept in small batches, opportunistically from requests
+and in full from the sweep-sessions CLI command.
+
+Other workers may keep serving a revoked session from their cache for up
+to SESSION_CACHE_TTL seconds; keep it short.
+"""
+
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from identity_cache import TTLCache
+
+SWEEP_BATCH = 500
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict that remembers its id and whether it changed."""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the data to a fresh id (call on login to prevent fixation)."""
+        if self.previous_sid is None and not self.new:
+            self.previous_sid = self.sid
+        self.sid = _new_sid()
+        self.modified = True
+
+
+def _new_sid():
+    return secrets.token_urlsafe(32)
+
+
+# -------------------- STORES -------------------- #
+
+class SQLiteSessionStore:
+    """Sessions in a local SQLite file shared by all workers on the host."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                sid TEXT PRIMARY KEY,
+                user_key TEXT,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_user ON sessions (user_key)')
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def after_fork(self):
+        # SQLite connections must not cross a fork
+        self._local = threading.local()
+
+    def load(self, sid):
+        row = self._conn().execute(
+            'SELECT data FROM sessions WHERE sid = ? AND expires_at > ?', (sid, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, sid, data, expires_at, user_key=None):
+        self._conn().execute('''
+            INSERT INTO sessions (sid, user_key, data, expires_at) VALUES (?, ?, ?, ?)
+            ON CONFLICT(sid) DO UPDATE SET
+                user_key = excluded.user_key, data = excluded.data, expires_at = excluded.expires_at
+        ''', (sid, user_key, json.dumps(data), expires_at))
+
+    def delete(self, sid):
+        self._conn().execute('DELETE FROM sessions WHERE sid = ?', (sid,))
+
+    def sids_for_user(self, user_key):
+        rows = self._conn().execute('SELECT sid FROM sessions WHERE user_key = ?', (user_key,))
+        return [row[0] for row in rows]
+
+    def sweep(self, batch_size=SWEEP_BATCH, max_batches=None):
+        """Delete expired sessions batch by batch. Returns rows deleted."""
+        conn = self._conn()
+        deleted = batches = 0
+        while max_batches is None or batches < max_batches:
+            cur = conn.execute('''
+                DELETE FROM sessions WHERE sid IN (
+                    SELECT sid FROM sessions WHERE expires_at <= ? LIMIT ?
+                )
+            ''', (time.time(), batch_size))
+            deleted += cur.rowcount
+            batches += 1
+            if cur.rowcount < batch_size:
+                break
+        return deleted
+
+
+class RedisSessionStore:
+    """Sessions in Redis (or a compatible server); expiry is native."""
+
+    def __init__(self, url, prefix='session:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._scan_cursor = 0
+
+    def load(self, sid):
+        raw = self.client.get(self.prefix + sid)
+        return json.loads(raw) if raw else None
+
+    def save(self, sid, data, expires_at, user_key=None):
+        ttl = max(1, int(expires_at - time.time()))
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + sid, json.dumps(data), ex=ttl)
+        if user_key:
+            pipe.sadd(f"{self.prefix}user:{user_key}", sid)
+        pipe.execute()
+
+    def delete(self, sid):
+        self.client.delete(self.prefix + sid)
+
+    def sids_for_user(self, user_key):
+        return [sid.decode() for sid in self.client.smembers(f"{self.prefix}user:{user_key}")]
+
+    def sweep(self, batch_size=SWEEP_BATCH, max_batches=None):
+        """Prune user index sets of expired sids, one SCAN page per batch.
+
+        Keys expire on their own. The SCAN cursor is kept between calls, so
+        repeated max_batches=1 sweeps walk the whole keyspace page by page;
+        without max_batches the sweep runs until the cursor wraps around.
+        """
+        deleted = batches = 0
+        while max_batches is None or batches < max_batches:
+            self._scan_cursor, keys = self.client.scan(
+                self._scan_cursor, match=f"{self.prefix}user:*", count=batch_size)
+            batches += 1
+            deleted += self._prune(keys)
+            if self._scan_cursor == 0:
+                break
+        return deleted
+
+    def _prune(self, keys):
+        if not keys:
+            return 0
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.smembers(key)
+        members = [(key, sid) for key, sids in zip(keys, pipe.execute()) for sid in sids]
+        if not members:
+            return 0
+
+        for _, sid in members:
+            pipe.exists(self.prefix + sid.decode())
+        stale = [member for member, alive in zip(members, pipe.execute()) if not alive]
+        for key, sid in stale:
+            pipe.srem(key, sid)
+        pipe.execute()
+        return len(stale)
+
+
+class CachedStore:
+    """Read-through/write-through in-process cache in front of a store."""
+
+    def __init__(self, store, ttl):
+        self.store = store
+        self._cache = TTLCache(ttl=ttl) if ttl > 0 else None
+
+    def load(self, sid):
+        data = self._cache.get(sid) if self._cache is not None else None
+        if data is None:
+            data = self.store.load(sid)
+            if data is None:
+                return None
+            if self._cache is not None:
+                self._cache.set(sid, data)
+        if data.get('_expires_at', 0) <= time.time():
+            return None
+        return dict(data)
+
+    def save(self, sid, data, expires_at, user_key=None):
+        self.store.save(sid, data, expires_at, user_key)
+        if self._cache is not None:
+            self._cache.set(sid, dict(data))
+
+    def delete(self, sid):
+        self.store.delete(sid)
+        if self._cache is not None:
+            self._cache.delete(sid)
+
+    def revoke_user(self, user_key, keep_sid=None):
+        """Delete every session of a user, optionally except one. Returns the count."""
+        revoked = 0
+        for sid in self.store.sids_for_user(user_key):
+            if sid != keep_sid:
+                self.delete(sid)
+                revoked += 1
+        return revoked
+
+    def sweep(self, batch_size=SWEEP_BATCH, max_batches=None):
+        return self.store.sweep(batch_size, max_batches)
+
+    def after_fork(self):
+        # redis-py reconnects by itself after a fork
+        if hasattr(self.store, 'after_fork'):
+            self.store.after_fork()
+
+
+# -------------------- FLASK INTERFACE -------------------- #
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface backed by a CachedStore.
+
+    user_key(session) names the user a session belongs to (or None), so
+    all of a user's sessions can be revoked together. Expiry is extended
+    at most once per refresh_interval, so reading a page does not rewrite
+    the session every time.
+    """
+
+    def __init__(self, store, user_key=None, refresh_interval=300, sweep_interval=60):
+        self.store = store
+        self.user_key = user_key or (lambda session: None)
+        self.refresh_interval = refresh_interval
+        self.sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+        self._sweep_lock = threading.Lock()
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime.total_seconds()
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.load(sid)
+            if data is not None:
+                expires_at = data.pop('_expires_at', 0)
+                session = ServerSession(data, sid=sid)
+                session.expires_at = expires_at
+                return session
+        session = ServerSession(sid=_new_sid(), new=True)
+        session.expires_at = 0
+        return session
+
+    def save_session(self, app, session, response):
+        self._maybe_sweep()
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+
+        if not session:
+            if not session.new:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = time.time()
+        needs_refresh = session.expires_at - now < self._lifetime(app) - self.refresh_interval
+        if session.modified or session.new or needs_refresh:
+            expires_at = now + self._lifetime(app)
+            self.store.save(session.sid, dict(session, _expires_at=expires_at), expires_at,
+                            self.user_key(session))
+            session.expires_at = expires_at
+
+        if session.new or session.previous_sid:
+            response.vary.add('Cookie')
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain, path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+    def _maybe_sweep(self):
+        if time.monotonic() - self._last_sweep < self.sweep_interval:
+            return
+        if not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_sweep = time.monotonic()
+            self.store.sweep(max_batches=1)
+        except Exception as e:
+            print(f"Session sweep error: {e}")
+        finally:
+            self._sweep_lock.release()
+
+
+def store_from_env(instance_path):
+    """Build the session store selected by SESSION_BACKEND (sqlite|redis)."""
+    backend = os.getenv('SESSION_BACKEND', 'sqlite')
+    if backend == 'redis':
+        store = RedisSessionStore(os.getenv('SESSION_REDIS_URL', 'redis://localhost:6379/0'))
+    else:
+        path = os.getenv('SESSION_DB_PATH') or os.path.join(instance_path, 'sessions.sqlite3')
+        store = SQLiteSessionStore(path)
+    return CachedStore(store, ttl=float(os.getenv('SESSION_CACHE_TTL', 5)))
@@ -0,0 +1,84 @@
+"""
+Template compilation and fragment caching.
+
+In production templates are compiled once: precompile() loads every
+template at startup, and a FileSystemBytecodeCache keeps the compiled code
+on disk, so new workers skip Jinja's parser. Bytecode is keyed by the
+template source's checksum, so an edited template is never served stale.
+
+The {% cache %} tag stores the rendered HTML of a block:
+
+    {% cache 'doctor_options', doctors %}
+        ...expensive loop...
+    {% endcache %}
+
+The key is the tag's position in its template plus the given values, so
+pass whatever the block depends on, normally the (small) data itself. Do
+not key on a per-process counter: other workers would not see it change.
+Entries expire after FRAGMENT_CACHE_TTL seconds like the identity cache
+they mirror. Setting env.fragment_cache to None (development) renders the
+block every time.
+"""
+
+import os
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+
+from identity_cache import TTLCache
+
+FRAGMENT_TTL = float(os.getenv('FRAGMENT_CACHE_TTL', os.getenv('IDENTITY_CACHE_TTL', 30)))
+FRAGMENT_MAX_ENTRIES = int(os.getenv('FRAGMENT_CACHE_SIZE', 2048))
+
+
+def _freeze(value):
+    """Hashable stand-in for lists/dicts passed as key parts."""
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class FragmentCacheExtension(Extension):
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=TTLCache(ttl=FRAGMENT_TTL, max_entries=FRAGMENT_MAX_ENTRIES))
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        # Number the tags so two on one line get separate keys
+        parser.fragment_count = getattr(parser, 'fragment_count', 0) + 1
+        position = f"{parser.name}:{lineno}:{parser.fragment_count}"
+        parts = [nodes.Const(position), parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = _freeze(parts)
+        html = cache.get(key)
+        if html is None:
+            html = caller()
+            cache.set(key, html)
+        return html
+
+
+def bytecode_cache(directory):
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory)
+
+
+def precompile(env):
+    """Compile every template into env's cache (and bytecode cache). Returns the count."""
+    names = env.list_templates(filter_func=lambda name: name.endswith('.html'))
+    for name in names:
+        env.get_template(name)
+    return len(names)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for the ASGI entry point
+Run with: python -m pytest test_asgi.py
+"""
+
+import asyncio
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import asgiref
+import pytest
+from asgiref.sync import SyncToAsync
+from asgiref.wsgi import WsgiToAsgiInstance
+
+import app as app_module
+
+
+@pytest.fixture(scope='module')
+def asgi():
+    # asgi.py builds the app at import; skip loading the model for that
+    preload, app_module.preload = app_module.preload, lambda: None
+    try:
+        import asgi
+    finally:
+        app_module.preload = preload
+    return asgi
+
+
+def http_scope(path='/'):
+    return {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+            'http_version': '1.1', 'headers': [], 'server': ('testserver', 80)}
+
+
+async def call(application, scope):
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await application(scope, receive, send)
+    return sent
+
+
+def thread_name_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [threading.current_thread().name.encode()]
+
+
+def test_installed_asgiref_is_the_pinned_one():
+    """asgi.py relies on asgiref internals; test against the version it is pinned to"""
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'requirements.txt')) as f:
+        pins = dict(line.strip().split('==') for line in f if '==' in line)
+    assert asgiref.__version__ == pins['asgiref']
+
+
+def test_asgiref_internals_still_match(asgi):
+    """The wrapped sync body that asgi.py reuses is still there, as (self, body)"""
+    assert isinstance(WsgiToAsgiInstance.__dict__['run_wsgi_app'], SyncToAsync)
+    assert list(inspect.signature(asgi._run_wsgi_app).parameters) == ['self', 'body']
+
+
+def test_views_run_on_the_view_pool(asgi):
+    sent = asyncio.run(call(asgi.ConcurrentWsgiToAsgi(thread_name_app), http_scope()))
+    assert sent[0]['type'] == 'http.response.start' and sent[0]['status'] == 200
+    assert sent[1]['body'].startswith(b'asgi-view')
+
+
+def test_requests_run_concurrently(asgi):
+    """Two requests that wait for each other only finish if they overlap"""
+    barrier = threading.Barrier(2, timeout=5)
+
+    def waiting_app(environ, start_response):
+        barrier.wait()
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+    application = asgi.ConcurrentWsgiToAsgi(waiting_app)
+
+    async def both():
+        return await asyncio.gather(call(application, http_scope()), call(application, http_scope()))
+
+    for sent in asyncio.run(both()):
+        assert sent[0]['status'] == 200
+
+
+def test_lifespan_startup_and_shutdown(asgi, monkeypatch):
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(asgi, '_executor', executor)
+    messages = iter([{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi.ConcurrentWsgiToAsgi(thread_name_app)({'type': 'lifespan'}, receive, send))
+    assert [m['type'] for m in sent] == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    with pytest.raises(RuntimeError):
+        executor.submit(int)
+
+
+def test_application_serves_the_flask_app(asgi):
+    sent = asyncio.run(call(asgi.application, http_scope('/')))
+    assert sent[0]['status'] == 200
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for fingerprinted static assets
+Run with: python -m pytest test_assets.py
+"""
+
+import gzip
+import os
+
+import assets
+
+
+def make_static(tmp_path):
+    (tmp_path / 'style.css').write_text('body { color: #123; }\n' * 50)
+    (tmp_path / 'img').mkdir()
+    (tmp_path / 'img' / 'logo.png').write_bytes(b'\x89PNG fake')
+    (tmp_path / 'uploads').mkdir()
+    (tmp_path / 'uploads' / 'secret.pdf').write_bytes(b'%PDF')
+    return tmp_path
+
+
+def test_build_fingerprints_and_compresses(tmp_path):
+    static = make_static(tmp_path)
+    manifest = assets.build(str(static))
+
+    assert set(manifest) == {'style.css', 'img/logo.png'}
+    css = static / manifest['style.css']
+    assert css.name.startswith('style.') and css.suffix == '.css'
+    assert gzip.decompress((static / (manifest['style.css'] + '.gz')).read_bytes()) == css.read_bytes()
+    # Binary formats are not recompressed
+    assert not os.path.exists(static / (manifest['img/logo.png'] + '.gz'))
+
+
+def test_build_is_deterministic_and_tracks_changes(tmp_path):
+    static = make_static(tmp_path)
+    first = assets.build(str(static))
+    gz = (static / (first['style.css'] + '.gz')).read_bytes()
+    assert assets.build(str(static)) == first
+    assert (static / (first['style.css'] + '.gz')).read_bytes() == gz
+
+    (static / 'style.css').write_text('body { color: #456; }\n')
+    assert assets.build(str(static))['style.css'] != first['style.css']
+
+
+def test_dev_fallback_versions_by_content(tmp_path):
+    static = make_static(tmp_path)
+    resolver = assets.Assets(str(static))
+    path, version = resolver.path_for('style.css')
+    assert path == 'style.css' and len(version) == 12
+
+    (static / 'style.css').write_text('changed')
+    os.utime(static / 'style.css', ns=(1, 1))
+    assert resolver.path_for('style.css')[1] != version
+    assert resolver.path_for('missing.css') == ('missing.css', None)
+
+
+def test_manifest_takes_precedence(tmp_path):
+    static = make_static(tmp_path)
+    resolver = assets.Assets(str(static), assets.build(str(static)))
+    path, version = resolver.path_for('style.css')
+    assert path.startswith('dist/style.') and version is None
+
+
+def test_negotiate_prefers_available_encodings(tmp_path):
+    target = tmp_path / 'app.abc.js'
+    target.write_text('x')
+    (tmp_path / 'app.abc.js.gz').write_bytes(b'gz')
+    (tmp_path / 'app.abc.js.br').write_bytes(b'br')
+
+    assert assets.negotiate(str(target), 'gzip, deflate, br') == (str(target) + '.br', 'br')
+    assert assets.negotiate(str(target), 'gzip') == (str(target) + '.gz', 'gzip')
+    assert assets.negotiate(str(target), '') == (str(target), None)
+    os.remove(str(target) + '.br')
+    assert assets.negotiate(str(target), 'br') == (str(target), None)
+
+
+def test_css_urls_point_at_fingerprinted_files(tmp_path):
+    (tmp_path / 'vendor' / 'webfonts').mkdir(parents=True)
+    (tmp_path / 'vendor' / 'webfonts' / 'icons.woff2').write_bytes(b'font')
+    (tmp_path / 'vendor' / 'icons.css').write_text(
+        '@font-face{src:url(webfonts/icons.woff2) format("woff2"),url("webfonts/icons.woff2?v=1#x")}'
+        '.a{background:url(data:image/png;base64,AA==)}.b{background:url(/abs.png)}')
+    manifest = assets.build(str(tmp_path))
+
+    font = os.path.basename(manifest['vendor/webfonts/icons.woff2'])
+    css = (tmp_path / manifest['vendor/icons.css']).read_text()
+    assert f'url(webfonts/{font}) format("woff2")' in css
+    assert f'url(webfonts/{font}?v=1#x)' in css
+    assert 'url(data:image/png;base64,AA==)' in css and 'url(/abs.png)' in css
+
+    # A new font changes the stylesheet's fingerprint too
+    (tmp_path / 'vendor' / 'webfonts' / 'icons.woff2').write_bytes(b'font v2')
+    assert assets.build(str(tmp_path))['vendor/icons.css'] != manifest['vendor/icons.css']
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Tests for the import-time profile and lazy heavy imports
+Run with: python -m pytest test_boot_profile.py
+"""
+
+import boot_profile
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      1500 |       9000 | flask
+import time:       800 |      12000 | app
+"""
+
+
+def test_parse_importtime():
+    modules = boot_profile.parse_importtime(SAMPLE)
+    assert modules == {'_io': (120, 120), 'flask': (1500, 9000), 'app': (800, 12000)}
+
+
+def test_app_import_skips_heavy_modules(monkeypatch, tmp_path):
+    monkeypatch.setenv('SESSION_DB_PATH', str(tmp_path / 'sessions.sqlite3'))
+    monkeypatch.setenv('RATE_LIMIT_DB_PATH', str(tmp_path / 'rate_limit.sqlite3'))
+    modules, _, heavy = boot_profile.profile()
+    assert 'app' in modules
+    assert heavy == []
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for the bulk account import
+Run with: python -m pytest test_bulk_import.py
+"""
+
+import json
+
+import pandas as pd
+import pytest
+
+import bulk_import
+import db
+import passwords
+
+PATIENTS = """aadhar_id,name,email,password,phone,date_of_birth,blood_group,doctor_ids
+111122223333,Asha,asha@example.com,pw1,98450,1990-04-01,b+,DR1;DR2
+111122223334,Ravi,ravi@example.com,pw2,98451,,,
+12345,Bad Id,bad@example.com,pw3,,,,
+111122223335,No Mail,not-an-email,pw4,,,,
+111122223336,Late,late@example.com,pw5,,1990-13-45,,
+111122223333,Again,again@example.com,pw6,,,,
+"""
+
+
+@pytest.fixture
+def database(fake_db, monkeypatch):
+    # email -> aadhar_id of patients already in the database
+    fake_db.registered = {}
+    fake_db.on('WHERE email IN', lambda emails: [
+        {'aadhar_id': fake_db.registered[email.lower()], 'email': email}
+        for email in emails if email.lower() in fake_db.registered])
+    # Only DR1 exists when links are resolved
+    fake_db.rows = [{'doctor_id': 'DR1'}]
+    monkeypatch.setattr(passwords, 'make_many', lambda values: [f'hashed:{v}' for v in values])
+    return fake_db
+
+
+def test_validate_rejects_bad_rows_with_reasons(tmp_path):
+    path = tmp_path / 'patients.csv'
+    path.write_text(PATIENTS)
+    frame = next(bulk_import.read_chunks(str(path), 100))
+    valid, rejected = bulk_import.validate('patient', frame)
+
+    assert valid['aadhar_id'].tolist() == ['111122223333', '111122223334']
+    assert valid['blood_group'].tolist() == ['B+', None]
+    assert rejected['reason'].tolist() == [
+        'invalid aadhar_id', 'invalid email', 'invalid date_of_birth', 'duplicate aadhar_id in file']
+    assert 'password' not in rejected.columns
+
+
+def test_missing_required_column_fails_the_import():
+    with pytest.raises(ValueError, match='password'):
+        bulk_import.validate('doctor', pd.DataFrame({'doctor_id': ['DR1'], 'name': ['A'], 'email': ['a@b.c']}))
+
+
+def test_jsonl_chunks_skip_rows(tmp_path):
+    path = tmp_path / 'doctors.jsonl'
+    path.write_text(''.join(json.dumps({'doctor_id': f'DR{i}', 'phone': i}) + '\n' for i in range(5)))
+    chunks = list(bulk_import.read_chunks(str(path), 2, skip=3))
+    assert pd.concat(chunks)['doctor_id'].tolist() == ['DR3', 'DR4']
+    assert chunks[0]['phone'].tolist() == ['3']
+
+
+def test_import_batches_links_and_checkpoint(tmp_path, database):
+    path = tmp_path / 'patients.csv'
+    path.write_text(PATIENTS)
+    totals = bulk_import.import_file('patient', str(path), batch_size=10)
+
+    inserts = database.statements('INSERT INTO patients')
+    assert [len(rows) for _, rows in inserts] == [2]
+    assert inserts[0][1][0][:4] == ('111122223333', 'Asha', 'asha@example.com', 'hashed:pw1')
+    assert 'ON DUPLICATE KEY UPDATE aadhar_id = aadhar_id' in inserts[0][0]
+
+    links = [rows for _, rows in database.statements('INSERT INTO patient_doctors')]
+    assert links == [[('111122223333', 'DR1')]]
+    assert totals['unknown_links'] == {'DR2'}
+    assert totals['read'] == 6 and totals['inserted'] == 2 and totals['rejected'] == 4
+    assert database.log.count('commit') == 1
+    assert (tmp_path / 'patients.csv.rejects.csv').exists()
+    assert not (tmp_path / 'patients.csv.import-state.json').exists()
+
+
+def test_resume_skips_committed_rows(tmp_path, database):
+    path = tmp_path / 'patients.csv'
+    path.write_text(PATIENTS)
+    bulk_import.Checkpoint(str(path) + '.import-state.json', 'patient').save(3)
+
+    totals = bulk_import.import_file('patient', str(path), batch_size=10)
+    assert totals['resumed_at'] == 3 and totals['read'] == 3
+    # Only the last row is valid; a key seen before the checkpoint is left to
+    # ON DUPLICATE KEY in the database
+    inserts = [rows for _, rows in database.statements('INSERT INTO patients')]
+    assert [row[1] for row in inserts[0]] == ['Again']
+    assert totals['rejected'] == 2
+
+
+def test_doctors_without_id_get_generated_ids():
+    frame = pd.DataFrame({'doctor_id': ['DR1', ''], 'name': ['A', 'B'], 'email': ['a@b.co', 'b@b.co'],
+                          'password': ['x', 'y']})
+    valid, rejected = bulk_import.validate('doctor', frame)
+    assert rejected.empty
+    assert valid['doctor_id'].iloc[0] == 'DR1'
+    assert valid['doctor_id'].iloc[1].startswith('DR') and len(valid['doctor_id'].iloc[1]) == 15
+
+    # No doctor_id column at all
+    valid, _ = bulk_import.validate('doctor', frame.drop(columns='doctor_id'))
+    assert valid['doctor_id'].is_unique and len(valid) == 2
+
+
+def test_emails_of_other_accounts_are_rejected_not_linked(tmp_path, database):
+    """A taken email rejects the row; its links and the 'already present' count skip it"""
+    database.registered.update({'asha@example.com': '999988887777', 'ravi@example.com': '111122223334'})
+    path = tmp_path / 'patients.csv'
+    path.write_text(PATIENTS)
+    totals = bulk_import.import_file('patient', str(path), batch_size=10)
+
+    inserts = [rows for _, rows in database.statements('INSERT INTO patients')]
+    assert [row[0] for row in inserts[0]] == ['111122223334']  # Ravi's email is his own
+    assert not database.statements('INSERT INTO patient_doctors')
+    assert totals['rejected'] == 5 and totals['linked'] == 0 and totals['unknown_links'] == set()
+    rejects = pd.read_csv(tmp_path / 'patients.csv.rejects.csv', dtype=str)
+    assert rejects.set_index('name').loc['Asha', 'reason'] == 'email already used by another account'
+
+
+def test_database_error_rejects_the_chunk_and_moves_on(tmp_path, database):
+    """A chunk the database refuses goes to the rejects file; later chunks still load"""
+    path = tmp_path / 'patients.csv'
+    path.write_text(PATIENTS)
+
+    def fail_first_insert(rows):
+        if rows[0][1] == 'Asha':
+            raise db.Error('Data too long')
+        return []
+
+    database.on('INSERT INTO patients', fail_first_insert)
+    totals = bulk_import.import_file('patient', str(path), batch_size=3)
+
+    assert database.log.count('rollback') == 1 and database.log.count('commit') == 1
+    assert totals['inserted'] == 1 and totals['existing'] == 0 and totals['linked'] == 0
+    rejects = pd.read_csv(tmp_path / 'patients.csv.rejects.csv', dtype=str)
+    failed = rejects[rejects['reason'].str.startswith('database error')]
+    assert failed['aadhar_id'].tolist() == ['111122223333', '111122223334']
+    assert 'password' not in rejects.columns
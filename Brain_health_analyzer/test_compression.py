@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for the response compression middleware
+Run with: python -m pytest test_compression.py
+"""
+
+import gzip
+
+from werkzeug.test import Client
+from werkzeug.wrappers import Request, Response
+
+import compression
+
+PAGE = '<html>' + '<td>0.1234</td>' * 400 + '</html>'
+
+
+def make_client(response_factory, **options):
+    @Request.application
+    def app(request):
+        return response_factory(request)
+    return Client(compression.CompressionMiddleware(app, **options))
+
+
+def html_page(request):
+    response = Response(PAGE, mimetype='text/html')
+    response.set_etag('v1')
+    return response.make_conditional(request)
+
+
+def test_gzip_when_accepted():
+    response = make_client(html_page).get('/', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert response.headers['ETag'] == '"v1-gzip"'
+    assert 'Content-Length' not in response.headers
+    assert gzip.decompress(response.get_data()).decode() == PAGE
+
+
+def test_plain_without_accept_encoding_or_with_q0():
+    client = make_client(html_page)
+    for headers in ({}, {'Accept-Encoding': 'gzip;q=0, identity'}, {'Accept-Encoding': 'gzip;level=1;q=0'},
+                    {'Accept-Encoding': 'gzip;q=high'}):
+        response = client.get('/', headers=headers)
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_data(as_text=True) == PAGE
+
+
+def test_skips_small_binary_and_encoded_responses():
+    small = make_client(lambda r: Response('{"ok": 1}', mimetype='application/json'))
+    assert 'Content-Encoding' not in small.get('/', headers={'Accept-Encoding': 'gzip'}).headers
+
+    pdf = make_client(lambda r: Response(b'%PDF' * 1000, mimetype='application/pdf'))
+    response = pdf.get('/', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers and 'Vary' not in response.headers
+
+    def precompressed(request):
+        response = Response(gzip.compress(PAGE.encode()), mimetype='text/css')
+        response.headers['Content-Encoding'] = 'gzip'
+        return response
+    body = make_client(precompressed).get('/', headers={'Accept-Encoding': 'gzip'}).get_data()
+    assert gzip.decompress(body).decode() == PAGE  # not compressed twice
+
+
+def test_revalidation_with_suffixed_etag():
+    response = make_client(html_page).get('/', headers={'Accept-Encoding': 'gzip',
+                                                         'If-None-Match': '"v1-gzip"'})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == '"v1-gzip"'
+
+
+def test_streamed_and_lazy_responses():
+    def streamed(request):
+        return Response((PAGE[i:i + 100] for i in range(0, len(PAGE), 100)), mimetype='text/html')
+    response = make_client(streamed).get('/', headers={'Accept-Encoding': 'gzip'})
+    assert gzip.decompress(response.get_data()).decode() == PAGE
+
+    def lazy_app(environ, start_response):
+        # start_response is only called when the body is first iterated
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        yield PAGE.encode()
+    response = Client(compression.CompressionMiddleware(lazy_app)).get('/', headers={'Accept-Encoding': 'gzip'})
+    assert gzip.decompress(response.get_data()).decode() == PAGE
+
+
+def test_accepts_reads_the_q_parameter_wherever_it_is():
+    assert compression._accepts('br;q=0.5, gzip', 'br')
+    assert compression._accepts('gzip;level=1', 'gzip')
+    assert compression._accepts('GZIP ; Q=1.0', 'gzip')
+    assert not compression._accepts('gzip;level=1;q=0', 'gzip')
+    assert not compression._accepts('gzip;q=0.000', 'gzip')
+    assert not compression._accepts('gzip;q=', 'gzip')
+    assert not compression._accepts('gzip;q=nan', 'gzip')
+    assert not compression._accepts('deflate', 'gzip')
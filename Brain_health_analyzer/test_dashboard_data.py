@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Tests for the one-round-trip dashboard queries
+Run with: python -m pytest test_dashboard_data.py
+"""
+
+import os
+
+import pytest
+from flask import template_rendered
+
+import app
+import dashboard_data
+import db
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+        self.with_rows = rows is not None
+
+    def fetchall(self):
+        return self.rows
+
+
+class BatchCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=(), multi=False):
+        self.conn.log.append((sql, params, multi))
+        return iter(Result(rows) for rows in self.conn.results)
+
+    def close(self):
+        pass
+
+
+class BatchConn:
+    def __init__(self, results):
+        self.results = results
+        self.log = []
+
+    def cursor(self, dictionary=False, prepared=False):
+        return BatchCursor(self)
+
+    def close(self):
+        pass
+
+
+def test_run_batch_names_each_result_set():
+    conn = BatchConn([[{'a': 1}], None, [{'b': 2}]])  # None: a statement without rows
+    results = dashboard_data.run_batch(conn, [('first', 'SELECT a;', (1,)), ('second', 'SELECT b', (2, 3))])
+    assert results == {'first': [{'a': 1}], 'second': [{'b': 2}]}
+    sql, params, multi = conn.log[0]
+    assert sql == 'SELECT a;\nSELECT b' and params == (1, 2, 3) and multi
+
+
+DASHBOARDS = [
+    (dashboard_data.patient_dashboard, '111122223333', 3),  # (builder, key, statements)
+    (dashboard_data.doctor_dashboard, 'DR1', 2),
+    (dashboard_data.caretaker_dashboard, 'CT1', 2),
+]
+
+
+@pytest.mark.parametrize('build, key, statements', DASHBOARDS)
+def test_dashboards_take_one_round_trip(build, key, statements):
+    summary = {'recent_seizures': 2}
+    conn = BatchConn([[]] * (statements - 1) + [[summary]])
+    assert build(conn, key)['summary'] == summary
+    assert len(conn.log) == 1
+    sql, params, _ = conn.log[0]
+    assert set(params) == {key} and len(params) == sql.count('%s')
+
+
+@pytest.mark.parametrize('build, key, statements', DASHBOARDS)
+def test_seizure_counts_read_day_buckets_not_reports(build, key, statements):
+    conn = BatchConn([[]] * (statements - 1) + [[{}]])
+    build(conn, key)
+    sql = conn.log[0][0]
+    assert "result = 'Seizure'" not in sql
+    assert 'FROM patient_seizure_days sd' in sql
+
+
+@pytest.mark.parametrize('path, session_keys, template', [
+    ('/patient/dashboard', {'user_type': 'patient', 'patient_aadhar': '111122223333'}, 'patient_dashboard.html'),
+    ('/doctor/dashboard', {'user_type': 'doctor', 'doctor_id': 'DR1'}, 'doctor_dashboard.html'),
+    ('/caretaker/dashboard', {'user_type': 'caretaker', 'caretaker_id': 'CT1'}, 'caretaker_dashboard.html'),
+])
+def test_database_error_renders_empty_dashboard(monkeypatch, path, session_keys, template):
+    def down():
+        raise db.Error('down')
+
+    rendered = []
+    monkeypatch.setattr(db, 'get_connection', down)
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(session_keys)
+
+    with template_rendered.connected_to(lambda sender, template, context: rendered.append(context)):
+        response = client.get(path)
+    assert response.status_code == 200
+    summary = rendered[0]['summary']
+    assert set(summary.values()) == {0}
+    # The fallback carries exactly the counts the template shows
+    with open(os.path.join(app.app.root_path, 'templates', template)) as f:
+        source = f.read()
+    assert {k for k in summary if f'summary.{k}' in source} == set(summary)
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared database helpers and the accounts repository
+Run with: python -m pytest test_db.py
+"""
+
+import pytest
+
+import accounts
+import db
+import identity_cache
+
+
+@pytest.fixture
+def log(fake_db):
+    return fake_db.log
+
+
+def test_transaction_commits_then_runs_hooks(log):
+    """Hooks queued inside a transaction run after the commit"""
+    with db.transaction() as cur:
+        cur.execute('UPDATE t SET a = %s', (1,))
+        db.after_commit(lambda: log.append('hook'))
+        assert 'hook' not in log
+    assert log == ['cursor', ('UPDATE t SET a = %s', (1,)), 'commit', 'close cursor', 'close', 'hook']
+
+
+def test_transaction_rolls_back_and_drops_hooks(log):
+    """An exception rolls back and the queued hooks never run"""
+    with pytest.raises(db.Error):
+        with db.transaction() as cur:
+            db.after_commit(lambda: log.append('hook'))
+            raise db.Error('boom')
+    assert 'rollback' in log and 'commit' not in log and 'hook' not in log
+    # Outside a transaction hooks run immediately again
+    db.after_commit(lambda: log.append('now'))
+    assert log[-1] == 'now'
+
+
+def test_cursor_never_commits(log):
+    with db.cursor() as cur:
+        cur.execute('SELECT 1')
+    assert 'commit' not in log and log[-1] == 'close'
+
+
+def test_batches():
+    assert list(db.batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(db.batches([], 2)) == []
+
+
+def test_fetch_in_dedupes_and_batches(log):
+    db.fetch_in('SELECT * FROM doctors WHERE doctor_id IN ({keys}) AND x = %s',
+                ['A', 'B', 'A', 'C'], params=(1,), batch_size=2)
+    queries = [entry for entry in log if isinstance(entry, tuple)]
+    assert queries == [
+        ('SELECT * FROM doctors WHERE doctor_id IN (%s, %s) AND x = %s', ('A', 'B', 1)),
+        ('SELECT * FROM doctors WHERE doctor_id IN (%s) AND x = %s', ('C', 1)),
+    ]
+
+
+def test_fetch_in_without_keys_skips_the_database(log):
+    assert db.fetch_in('SELECT 1 WHERE a IN ({keys})', []) == []
+    assert log == []
+
+
+def test_execute_many_counts_rows(log):
+    with db.transaction() as cur:
+        count = db.execute_many(cur, 'INSERT INTO t VALUES (%s)', [(i,) for i in range(5)], batch_size=2)
+    assert count == 5
+    assert [len(entry[1]) for entry in log if isinstance(entry, tuple)] == [2, 2, 1]
+
+
+def test_account_update_invalidates_after_commit(log):
+    """A cached account is dropped only once the UPDATE commits"""
+    identity_cache.clear()
+    key = ('DR1', accounts.PROFILE, 0)
+    identity_cache.cached('doctor', key, lambda: {'doctor_id': 'DR1', 'name': 'Old'})
+    with db.transaction() as cur:
+        accounts.update(cur, 'doctor', 'DR1', name='New', phone='1')
+        assert identity_cache.cached('doctor', key, lambda: None)['name'] == 'Old'
+    assert ('UPDATE doctors SET name = %s, phone = %s WHERE doctor_id = %s', ('New', '1', 'DR1')) in log
+    assert identity_cache.cached('doctor', key, lambda: {'name': 'New'})['name'] == 'New'
+
+
+def test_account_lookups_project_columns(fake_db):
+    """Lookups name their columns and only LOGIN carries secrets"""
+    fake_db.rows = [{'email': 'a@b'}]
+    entries = fake_db.log
+    identity_cache.clear()
+    assert accounts.get('patient', 'A1', accounts.CARD) == {'email': 'a@b'}
+    assert entries[0] == 'prepared cursor'
+    assert entries[1] == ('SELECT aadhar_id, name, email, phone, blood_group FROM patients '
+                          'WHERE aadhar_id = %s', ('A1',))
+    for role in accounts.ROLES:
+        for projection in (accounts.CARD, accounts.PROFILE):
+            names = accounts.ROLES[role].projections[projection]
+            assert not {'password', 'totp_secret', 'backup_codes'} & set(names)
+    assert accounts.columns('doctor', accounts.CARD, 'd').startswith('d.doctor_id, d.name')
+
+
+def test_measure_subtracts_status_overhead(fake_db):
+    """Bytes per query exclude the SHOW STATUS reads around the run"""
+    counter = iter([1000, 1100, 3100])
+    fake_db.on('Bytes_sent', lambda params: [('Bytes_sent', str(next(counter)))])
+    sent, seconds = db.measure('SELECT 1 WHERE a = %s', [(1,), (2,)])
+    assert sent == 950 and seconds >= 0
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the searchable doctor directory API
+Run with: python -m pytest test_doctor_directory.py
+"""
+
+import pytest
+
+import accounts
+import app
+import db
+import identity_cache
+
+
+@pytest.fixture
+def queries(monkeypatch):
+    """Every directory query, answered with three doctors."""
+    identity_cache.clear()
+    log = []
+
+    def fetch_all(sql, params=(), prepared=False):
+        log.append((' '.join(sql.split()), params))
+        return [{'doctor_id': f'DR{i}', 'name': f'Dr {i}', 'specialization': 'Neurology'} for i in range(3)]
+
+    monkeypatch.setattr(db, 'fetch_all', fetch_all)
+    return log
+
+
+@pytest.fixture
+def client():
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_type'] = 'patient'
+        sess['patient_aadhar'] = '111122223333'
+    return client
+
+
+def test_login_required(queries):
+    response = app.app.test_client().get('/api/doctors')
+    assert response.status_code == 401 and queries == []
+
+
+def test_page_has_more_and_size_cap(client, queries):
+    body = client.get('/api/doctors?per_page=2').get_json()
+    assert [d['doctor_id'] for d in body['doctors']] == ['DR0', 'DR1']
+    assert body['has_more'] is True and body['page'] == 1
+    sql, params = queries[0]
+    assert sql.startswith('SELECT doctor_id, name, specialization FROM doctors ORDER BY name')
+    assert params == (3, 0)
+
+    body = client.get('/api/doctors?per_page=500&page=3').get_json()
+    assert body['per_page'] == app.DOCTOR_DIRECTORY_MAX_PAGE_SIZE and body['has_more'] is False
+    assert queries[1][1] == (app.DOCTOR_DIRECTORY_MAX_PAGE_SIZE + 1, 2 * app.DOCTOR_DIRECTORY_MAX_PAGE_SIZE)
+
+
+def test_short_queries_use_escaped_prefix_like(queries):
+    accounts.search_doctors('ne_', 1, 10)
+    sql, params = queries[0]
+    assert 'WHERE name LIKE %s OR specialization LIKE %s' in sql
+    assert params[:2] == ('ne\\_%', 'ne\\_%')
+
+
+def test_long_queries_use_fulltext_prefix_terms(queries):
+    accounts.search_doctors('Neuro  surg!', 1, 10)
+    sql, params = queries[0]
+    assert 'MATCH(name, specialization) AGAINST (%s IN BOOLEAN MODE)' in sql
+    assert params[:2] == ('+Neuro* +surg*', '+Neuro* +surg*')
+
+
+def test_pages_are_cached_until_a_doctor_changes(queries):
+    accounts.search_doctors('neuro', 1, 10)
+    accounts.search_doctors('NEURO', 1, 10)
+    assert len(queries) == 1
+    accounts.invalidate('doctor', 'DR1')
+    accounts.search_doctors('neuro', 1, 10)
+    assert len(queries) == 2
+
+
+def test_database_error_is_a_500(client, monkeypatch):
+    identity_cache.clear()
+
+    def failing(sql, params=(), prepared=False):
+        raise db.Error('down')
+
+    monkeypatch.setattr(db, 'fetch_all', failing)
+    response = client.get('/api/doctors?q=x')
+    assert response.status_code == 500 and response.get_json()['status'] == 'error'
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Tests for the gunicorn deployment profile and post-fork resets
+Run with: python -m pytest test_gunicorn_conf.py
+"""
+
+import gc
+import importlib.util
+import os
+
+import pytest
+
+import ids
+import passwords
+import rate_limit
+import server_session
+from inference_pool import InferencePool
+
+CONF_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+
+def load_conf(monkeypatch, **env):
+    # Keep the defaults the file sets from leaking into other tests
+    for name in ('FLASK_ENV', 'INFERENCE_WORKERS', 'DB_POOL_SIZE'):
+        monkeypatch.setenv(name, os.environ.get(name, 'unset'))
+    for name, value in env.items():
+        if value is None:
+            monkeypatch.delenv(name, raising=False)
+        else:
+            monkeypatch.setenv(name, value)
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', CONF_PATH)
+    conf = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(conf)
+    finally:
+        gc.enable()
+    return conf
+
+
+def test_sizing_follows_cores(monkeypatch):
+    conf = load_conf(monkeypatch, WEB_CONCURRENCY=None, GUNICORN_THREADS=None)
+    assert conf.workers == 2 * conf._cores() + 1
+    assert conf.threads == 4
+    assert conf.preload_app and conf.worker_class == 'gthread'
+
+    conf = load_conf(monkeypatch, WEB_CONCURRENCY='3', GUNICORN_THREADS='8')
+    assert (conf.workers, conf.threads) == (3, 8)
+
+
+def test_id_worker_range_is_checked_at_startup(monkeypatch):
+    conf = load_conf(monkeypatch, ID_WORKER='1000', WEB_CONCURRENCY='11')
+    assert conf.ID_WORKER + 2 * conf.workers == ids.MAX_WORKER - 1
+
+    with pytest.raises(SystemExit, match='ID_WORKER=1000 with 12 workers'):
+        load_conf(monkeypatch, ID_WORKER='1000', WEB_CONCURRENCY='12')
+    with pytest.raises(SystemExit):
+        load_conf(monkeypatch, ID_WORKER='-1', WEB_CONCURRENCY='1')
+
+
+def test_fork_hooks(monkeypatch):
+    conf = load_conf(monkeypatch)
+    calls = []
+
+    class FakeApp:
+        def after_fork(self, id_slot):
+            calls.append(('after_fork', id_slot))
+
+        def migrate(self):
+            calls.append('migrate')
+
+    class FakeWorker:
+        pass
+
+    class FakeServer:
+        class log:
+            info = staticmethod(lambda message: None)
+
+        # Slot 1 is live, slot 2 was freed by a worker that exited
+        WORKERS = {101: FakeWorker(), 103: FakeWorker()}
+        WORKERS[101].id_slot = 1
+        WORKERS[103].id_slot = 3
+
+    monkeypatch.setattr(conf, '_app_module', FakeApp)
+    monkeypatch.setattr(conf, 'RUN_MIGRATIONS', True)
+    try:
+        conf.when_ready(FakeServer)
+        worker = FakeWorker()
+        conf.pre_fork(FakeServer, worker)
+        assert gc.get_freeze_count() > 0
+        gc.disable()
+        conf.post_fork(FakeServer, worker)
+        assert gc.isenabled()
+    finally:
+        gc.unfreeze()
+        gc.enable()
+    assert worker.id_slot == 2
+    assert calls == ['migrate', ('after_fork', 2)]
+
+
+def test_after_fork_drops_parent_state(tmp_path):
+    sessions = server_session.SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3'))
+    buckets = rate_limit.SQLiteBuckets(str(tmp_path / 'rate.sqlite3'))
+    parent_connections = (sessions._conn(), buckets._conn())
+    sessions.after_fork()
+    buckets.after_fork()
+    assert sessions._conn() is not parent_connections[0]
+    assert buckets._conn() is not parent_connections[1]
+    assert sessions.load('missing') is None
+
+    pool = InferencePool('unused.pkl', workers=1)
+    pool._executor = object()
+    pool.after_fork()
+    assert pool._executor is None
+
+    passwords._executor = object()
+    passwords.after_fork()
+    assert passwords._executor is None
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Tests for the identity lookup cache
+Run with: python -m pytest test_identity_cache.py
+"""
+
+import time
+
+import pytest
+from flask import Flask
+
+import accounts
+import app
+import db
+import identity_cache
+
+
+def test_loader_called_once_per_key():
+    """Repeated lookups are served from the cache"""
+    identity_cache.clear()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return {'doctor_id': 'DR1', 'email': 'a@example.com'}
+
+    for _ in range(3):
+        row = identity_cache.cached('doctor', 'DR1', loader)
+    assert row['email'] == 'a@example.com'
+    assert len(calls) == 1
+
+
+def test_none_is_not_cached():
+    """Missing rows are looked up again so new signups appear"""
+    identity_cache.clear()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return None
+
+    identity_cache.cached('patient', 'X', loader)
+    identity_cache.cached('patient', 'X', loader)
+    assert len(calls) == 2
+
+
+def test_invalidate_key_and_namespace():
+    """Invalidation drops one key or a whole namespace"""
+    identity_cache.clear()
+    identity_cache.cached('doctor', 'DR1', lambda: {'name': 'old'})
+    identity_cache.cached('doctor', 'DR2', lambda: {'name': 'other'})
+
+    identity_cache.invalidate('doctor', 'DR1')
+    assert identity_cache.cached('doctor', 'DR1', lambda: {'name': 'new'})['name'] == 'new'
+    assert identity_cache.cached('doctor', 'DR2', lambda: {'name': 'x'})['name'] == 'other'
+
+    identity_cache.invalidate('doctor')
+    assert identity_cache.cached('doctor', 'DR2', lambda: {'name': 'x'})['name'] == 'x'
+
+
+def test_entries_expire():
+    """Entries older than the TTL are reloaded"""
+    cache = identity_cache.TTLCache(ttl=0.01)
+    cache.set('k', 'v')
+    assert cache.get('k') == 'v'
+    time.sleep(0.02)
+    assert cache.get('k') is None
+
+
+def test_request_cache_survives_process_invalidation_of_other_keys():
+    """Within a request the value is memoised in flask.g"""
+    identity_cache.clear()
+    app = Flask(__name__)
+    with app.app_context():
+        identity_cache.cached('caretaker', 'CT1', lambda: {'name': 'a'})
+        identity_cache._process_cache.clear()
+        assert identity_cache.cached('caretaker', 'CT1', lambda: {'name': 'b'})['name'] == 'a'
+
+
+def test_selected_doctors_follow_the_session_version(monkeypatch):
+    """A worker holding an old list reloads once the shared session counter moves"""
+    identity_cache.clear()
+    lists = iter([[{'doctor_id': 'DR1'}], [{'doctor_id': 'DR1'}, {'doctor_id': 'DR2'}]])
+    monkeypatch.setattr(db, 'fetch_all', lambda sql, params, prepared=False: next(lists))
+
+    assert len(accounts.get_selected_doctors('111122223333', 0)) == 1
+    # The patient selected DR2 on another worker, which bumped doctors_version
+    assert len(accounts.get_selected_doctors('111122223333', 0)) == 1
+    assert len(accounts.get_selected_doctors('111122223333', 1)) == 2
+
+
+def test_own_profile_follows_the_session_version(monkeypatch):
+    """Another worker's cached profile is not served after the user edits it"""
+    identity_cache.clear()
+    rows = iter([{'name': 'Old'}, {'name': 'New'}])
+    monkeypatch.setattr(db, 'fetch_one', lambda sql, params, prepared=False: next(rows))
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(user_type='caretaker', caretaker_id='CT1')
+
+    assert b'Old' in client.get('/caretaker/profile').data
+    # The caretaker saved their profile on another worker, which bumped account_version
+    with client.session_transaction() as sess:
+        sess['account_version'] = 1
+    assert b'New' in client.get('/caretaker/profile').data
+
+
+def test_account_invalidation_drops_every_version_and_projection():
+    """accounts.invalidate() forgets all of one user's rows and nobody else's"""
+    identity_cache.clear()
+    for key in (('CT1', accounts.CARD, 0), ('CT1', accounts.PROFILE, 3), ('CT2', accounts.CARD, 0)):
+        identity_cache.cached('caretaker', key, lambda: {'name': 'old'})
+
+    accounts.invalidate('caretaker', 'CT1')
+    assert identity_cache.cached('caretaker', ('CT1', accounts.PROFILE, 3), lambda: {'name': 'new'})['name'] == 'new'
+    assert identity_cache.cached('caretaker', ('CT2', accounts.CARD, 0), lambda: {'name': 'new'})['name'] == 'old'
+
+
+def test_missing_doctor_row_is_not_a_crash(monkeypatch):
+    """Views that look up the signed-in doctor cope with a deleted account"""
+    identity_cache.clear()
+    monkeypatch.setattr(db, 'fetch_one', lambda sql, params, prepared=False: None)
+    monkeypatch.setattr(db, 'get_connection', lambda: pytest.fail('no report query without a doctor'))
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(user_type='doctor', doctor_id='DR404')
+
+    response = client.get('/doctor/view_reports/111122223333')
+    assert response.status_code == 200
+    assert b'Doctor not found!' in response.data
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for time-ordered id generation
+Run with: python -m pytest test_ids.py
+"""
+
+import threading
+
+import pytest
+
+import ids
+
+
+def test_ids_are_unique_and_sorted_across_threads():
+    generated = []
+
+    def mint():
+        generated.extend(ids.new('RX') for _ in range(2000))
+
+    threads = [threading.Thread(target=mint) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(generated)) == len(generated)
+    assert all(len(value) == 2 + ids.WIDTH for value in generated)
+    ordered = sorted(generated)
+    assert [ids.decode(v) for v in ordered] == sorted(ids.decode(v) for v in generated)
+
+
+def test_clock_going_back_and_sequence_overflow_stay_monotonic():
+    now = [1_800_000_000.0]
+    gen = ids.Generator(5, clock=lambda: now[0])
+    values = [gen.next_int() for _ in range(ids.MAX_SEQUENCE + 3)]
+    now[0] -= 10  # NTP steps the clock back
+    values += [gen.next_int() for _ in range(3)]
+    assert values == sorted(values) and len(set(values)) == len(values)
+    assert all((v >> ids.SEQUENCE_BITS) & ids.MAX_WORKER == 5 for v in values)
+
+
+def test_workers_never_share_ids():
+    clock = lambda: 1_800_000_000.0
+    first, second = ids.Generator(1, clock), ids.Generator(2, clock)
+    assert not {first.next_int() for _ in range(100)} & {second.next_int() for _ in range(100)}
+
+
+def test_encoding_roundtrip_and_bounds():
+    assert ids.decode(ids.encode(2 ** 63 - 1)) == 2 ** 63 - 1
+    assert ids.encode(1) < ids.encode(32) < ids.encode(2 ** 40)
+    with pytest.raises(ValueError):
+        ids.Generator(ids.MAX_WORKER + 1)
+
+
+def test_process_without_id_worker_uses_its_pid(monkeypatch, capsys):
+    monkeypatch.setattr(ids, 'WORKER', None)
+    monkeypatch.setattr(ids, '_generator', None)
+    monkeypatch.setattr(ids.os, 'getpid', lambda: 5 * 1024 + 37)
+    value = ids.decode(ids.new('RX'))
+    assert (value >> ids.SEQUENCE_BITS) & ids.MAX_WORKER == 37
+    assert 'ID_WORKER is not set' in capsys.readouterr().out
+
+    ids.new('RX')
+    assert capsys.readouterr().out == ''  # warned once per process
+
+
+def test_forked_workers_add_their_slot(monkeypatch, capsys):
+    monkeypatch.setattr(ids, 'WORKER', None)
+    monkeypatch.setattr(ids, '_generator', None)
+    ids.after_fork(3)
+    assert (ids.decode(ids.new()) >> ids.SEQUENCE_BITS) & ids.MAX_WORKER == 3
+
+    monkeypatch.setattr(ids, 'WORKER', 100)
+    ids.after_fork(3)
+    assert (ids.decode(ids.new()) >> ids.SEQUENCE_BITS) & ids.MAX_WORKER == 103
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests for prescription image variants
+Run with: python -m pytest test_image_variants.py
+"""
+
+import os
+
+from PIL import Image
+
+import image_variants
+
+
+def test_generate_downscales_without_touching_original(tmp_path):
+    """Variants are WebP within their size limit; the original is unchanged"""
+    original = tmp_path / 'rx.jpg'
+    Image.new('RGB', (2400, 1200), 'white').save(original, 'JPEG')
+    before = original.read_bytes()
+
+    assert sorted(image_variants.generate(str(original))) == ['display', 'thumb']
+    assert image_variants.generate(str(original)) == []  # already present
+
+    for name, (size, _) in image_variants.VARIANTS.items():
+        with Image.open(image_variants.variant_path(str(original), name)) as variant:
+            assert variant.format == 'WEBP'
+            assert max(variant.size) == size
+    assert original.read_bytes() == before
+
+    image_variants.delete(str(original))
+    assert os.listdir(tmp_path) == ['rx.jpg']
+
+
+def test_originals_differing_only_by_extension_keep_separate_variants(tmp_path):
+    jpg, png = tmp_path / 'rx.jpg', tmp_path / 'rx.png'
+    Image.new('RGB', (400, 400), 'white').save(jpg, 'JPEG')
+    Image.new('RGB', (400, 200), 'black').save(png, 'PNG')
+
+    assert image_variants.variant_path(str(jpg), 'thumb') != image_variants.variant_path(str(png), 'thumb')
+    image_variants.generate(str(jpg))
+    assert sorted(image_variants.generate(str(png))) == ['display', 'thumb']
+
+    image_variants.delete(str(jpg))
+    assert sorted(os.listdir(tmp_path)) == ['rx.jpg', 'rx.png', 'rx.png.display.webp', 'rx.png.thumb.webp']
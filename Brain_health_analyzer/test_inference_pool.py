@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded EEG inference pool
+Run with: python -m pytest test_inference_pool.py
+"""
+
+import os
+import time
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+
+import joblib
+import pytest
+
+import app
+import inference_pool
+
+
+class FixedModel:
+    def predict(self, rows):
+        return [2 for _ in rows]
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / 'model.pkl'
+    joblib.dump({'stand-in': True}, path)
+    return str(path)
+
+
+def test_inline_pool_rejects_beyond_max_pending(model_path):
+    pool = inference_pool.InferencePool(model_path, workers=0, max_pending=1)
+
+    def nested():
+        with pytest.raises(inference_pool.InferenceBusy):
+            pool.run(int)
+        return 'outer'
+
+    assert pool.run(nested) == 'outer'
+    assert pool.run(int, '7') == 7  # the slot was released
+
+
+def test_timeout_keeps_the_slot_until_the_job_ends(model_path):
+    pool = inference_pool.InferencePool(model_path, workers=1, max_pending=1, timeout=0.2)
+    try:
+        pool.preload()
+        with pytest.raises(FuturesTimeoutError):
+            pool.run(time.sleep, 1)
+        # The timed-out job still runs in the child and still counts
+        with pytest.raises(inference_pool.InferenceBusy):
+            pool.run(os.getpid)
+        time.sleep(1.5)
+        assert pool.run(os.getpid) != os.getpid()
+    finally:
+        pool.shutdown()
+
+
+def test_run_inference_answers_503(monkeypatch):
+    class Busy:
+        def run(self, fn, *args):
+            raise inference_pool.InferenceBusy()
+
+    class Slow:
+        def run(self, fn, *args):
+            raise FuturesTimeoutError()
+
+    for executor, message in ((Busy(), 'queue is full'), (Slow(), 'timed out')):
+        monkeypatch.setattr(app, 'inference_executor', executor)
+        value, response = app.run_inference(inference_pool.analyze_text, '1, 2')
+        assert value is None
+        assert message in response[0]
+        assert response[1:] == (503, {'Retry-After': '5'})
+
+
+def test_analyze_features(monkeypatch):
+    monkeypatch.setattr(inference_pool, '_model', FixedModel())
+    assert inference_pool.analyze_features(','.join(['0.5'] * 85)) == 'Seizure'
+    assert inference_pool.analyze_features([1.0, 2.0]) == 'Error: Expected 85 features, got 2'
+    assert inference_pool.analyze_features('a, b') == 'Error: Invalid input format'
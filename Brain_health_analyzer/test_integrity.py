@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Tests for cached prescription integrity checks
+Run with: python -m pytest test_integrity.py
+"""
+
+import hashlib
+import os
+
+import pytest
+
+import app
+import db
+import integrity
+import prescription_store
+
+
+def test_digest_cached_until_file_changes(tmp_path):
+    """An unchanged file is not re-read; a rewrite is detected"""
+    integrity.clear()
+    path = tmp_path / 'rx.pdf'
+    path.write_bytes(b'original')
+    expected = hashlib.sha256(b'original').hexdigest()
+
+    assert integrity.verify(str(path), expected) == (integrity.VERIFIED, expected, 8)
+    assert integrity.verify(str(path), expected)[2] == 0  # cache hit
+
+    path.write_bytes(b'tampered!')
+    status, actual, size = integrity.verify(str(path), expected)
+    assert status == integrity.TAMPERED
+    assert size == 9
+
+    os.remove(path)
+    assert integrity.verify(str(path), expected)[0] == integrity.MISSING
+
+
+def test_audit_reports_failures(tmp_path):
+    """Shared files are hashed once and only failures reach the report"""
+    integrity.clear()
+    good = tmp_path / 'good.pdf'
+    good.write_bytes(b'x' * (integrity.READ_SIZE + 5))
+    digest = hashlib.sha256(good.read_bytes()).hexdigest()
+    rows = [
+        {'id': 1, 'prescription_id': 'RX1', 'file_path': str(good), 'digital_signature': digest},
+        {'id': 2, 'prescription_id': 'RX2', 'file_path': str(good), 'digital_signature': digest},
+        {'id': 3, 'prescription_id': 'RX3', 'file_path': str(good), 'digital_signature': 'bad'},
+        {'id': 4, 'prescription_id': 'RX4', 'file_path': str(tmp_path / 'gone'), 'digital_signature': digest},
+    ]
+
+    results, bytes_read, _ = integrity.audit(rows, workers=2)
+    statuses = {r['id']: r['status'] for r in results}
+    assert statuses == {1: 'verified', 2: 'verified', 3: 'tampered', 4: 'missing'}
+    assert bytes_read == integrity.READ_SIZE + 5
+
+    report = tmp_path / 'report.csv'
+    assert integrity.write_report(results, str(report)) == 2
+    assert len(report.read_text().splitlines()) == 3
+
+
+def test_validator_tracks_file_and_signature(tmp_path):
+    path = tmp_path / 'rx.pdf'
+    path.write_bytes(b'%PDF one')
+    etag, last_modified = integrity.validator(str(path), 'sig')
+    assert integrity.validator(str(path), 'sig')[0] == etag
+    assert integrity.validator(str(path), 'other')[0] != etag
+    assert last_modified.tzinfo is not None
+
+    path.write_bytes(b'%PDF changed')
+    assert integrity.validator(str(path), 'sig')[0] != etag
+
+
+class StoreError(Exception):
+    """Stands in for a storage client's error (e.g. botocore's ClientError)."""
+
+
+def test_unreadable_files_mark_only_their_rows():
+    digest = hashlib.sha256(b'ok').hexdigest()
+
+    def digest_fn(path):
+        if path == 'denied':
+            raise PermissionError(path)
+        if path == 's3://bucket/down':
+            raise StoreError('connection reset')
+        if path == 's3://bucket/gone':
+            raise FileNotFoundError(path)
+        return digest, 2
+
+    rows = [{'id': i, 'prescription_id': f'RX{i}', 'file_path': path, 'digital_signature': digest}
+            for i, path in enumerate(['ok', 'denied', 's3://bucket/down', 's3://bucket/gone'])]
+    results, bytes_read, _ = integrity.audit(rows, digest_fn, workers=2)
+    assert {r['file_path']: r['status'] for r in results} == {
+        'ok': 'verified', 'denied': 'unreadable', 's3://bucket/down': 'unreadable', 's3://bucket/gone': 'missing'}
+    assert bytes_read == 2
+    assert integrity.verify('denied', digest, digest_fn) == (integrity.UNREADABLE, None, 0)
+
+
+def test_s3_missing_key_is_file_not_found():
+    class ClientError(Exception):
+        def __init__(self, code):
+            self.response = {'Error': {'Code': code}}
+
+    class Client:
+        class exceptions:
+            pass
+
+        def __init__(self, code):
+            self.code = code
+
+        def get_object(self, Bucket, Key):
+            raise ClientError(self.code)
+
+    Client.exceptions.ClientError = ClientError
+    store = object.__new__(prescription_store.S3BlobStore)
+    store.bucket = 'bucket'
+    for code, error in (('NoSuchKey', FileNotFoundError), ('404', FileNotFoundError), ('AccessDenied', ClientError)):
+        store.client = Client(code)
+        with pytest.raises(error):
+            store.open('s3://bucket/prescriptions/ab/cd/abcd.pdf')
+
+
+def test_verify_route_answers_when_the_store_fails(monkeypatch):
+    class BrokenStore:
+        def open(self, location):
+            raise StoreError('timeout')
+
+    monkeypatch.setattr(app, 'blob_store', BrokenStore())
+    monkeypatch.setattr(db, 'fetch_one', lambda sql, params: {'file_path': 's3://bucket/rx.pdf',
+                                                              'digital_signature': 'a' * 64})
+    response = app.app.test_client().get('/verify-signature/1')
+    assert response.status_code == 503
+    assert response.get_json() == {'status': 'error', 'message': 'File could not be read'}
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the OTP store
+Run with: python -m pytest test_otp_store.py
+"""
+
+import pytest
+
+import app
+import otp_store
+
+
+def test_issue_replaces_the_active_code(fake_db):
+    """Issuing upserts on (aadhar_id, purpose) with a fresh numeric code"""
+    code = otp_store.issue(fake_db.cursor(), '123412341234', otp_store.PATIENT_ACCESS)
+
+    assert len(code) == otp_store.CODE_DIGITS and code.isdigit()
+    sql, params = fake_db.statements()[0]
+    assert 'ON DUPLICATE KEY UPDATE' in sql
+    assert params == ('123412341234', otp_store.PATIENT_ACCESS, code)
+
+
+def test_consume_is_one_conditional_update(fake_db):
+    """Validity comes from rowcount of a single guarded UPDATE"""
+    rowcounts = iter([1, 0])
+    fake_db.on('UPDATE patient_otp', lambda params: [()] * next(rowcounts))
+    cursor = fake_db.cursor()
+    assert otp_store.consume(cursor, '1', otp_store.PATIENT_ACCESS, '111111')
+    assert not otp_store.consume(cursor, '1', otp_store.PATIENT_ACCESS, '111111')
+
+    sql, _ = fake_db.statements()[0]
+    assert sql.startswith('UPDATE patient_otp SET is_used = TRUE')
+    assert 'AND is_used = FALSE AND expires_at > NOW()' in sql
+    assert len(fake_db.statements()) == 2
+
+
+def test_purge_runs_in_batches(fake_db):
+    """Purging commits each batch and stops on a short one"""
+    rowcounts = iter([10, 10, 3])
+    fake_db.on('DELETE FROM patient_otp', lambda params: [()] * next(rowcounts))
+
+    assert otp_store.purge(fake_db.connect(), batch_size=10) == 23
+    assert fake_db.log.count('commit') == 3
+    assert all(params == (10,) for _, params in fake_db.statements())
+
+
+def code_table(fake_db):
+    """patient_otp as the issue/consume statements see it."""
+    codes = {}
+
+    def issue(params):
+        aadhar_id, purpose, code = params
+        codes[aadhar_id, purpose] = code
+        return []
+
+    def consume(params):
+        aadhar_id, purpose, code = params
+        if codes.get((aadhar_id, purpose)) != code:
+            return []
+        del codes[aadhar_id, purpose]
+        return [()]
+
+    fake_db.on('INSERT INTO patient_otp', issue).on('UPDATE patient_otp', consume)
+
+
+@pytest.mark.parametrize('path, session_keys, destination', [
+    ('/doctor/verify-otp', {'user_type': 'doctor', 'doctor_id': 'DR1', 'search_aadhar': 'A1'},
+     '/doctor/patient-details'),
+    ('/caretaker/verify-otp', {'user_type': 'caretaker', 'caretaker_id': 'CT1', 'caretaker_aadhar': 'A1'},
+     '/caretaker/view-prescriptions'),
+])
+def test_issued_code_is_accepted_once(monkeypatch, fake_db, path, session_keys, destination):
+    """A code issued for the patient verifies a doctor or a caretaker, once"""
+    code_table(fake_db)
+    monkeypatch.setattr(app, 'rate_buckets', None)  # throttling has its own tests
+    code = otp_store.issue(fake_db.cursor(), 'A1', otp_store.PATIENT_ACCESS)
+
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(session_keys)
+    response = client.post(path, data={'otp': code})
+    assert response.status_code == 302 and response.headers['Location'] == destination
+    assert not otp_store.consume(fake_db.cursor(), 'A1', otp_store.PATIENT_ACCESS, code)  # spent
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for password hashing
+Run with: python -m pytest test_passwords.py
+"""
+
+import passwords
+
+
+def test_hash_roundtrip_and_salting():
+    """Hashes verify, differ per call and reject wrong passwords"""
+    first = passwords.hash_password('s3cret', rounds=1000)
+    second = passwords.hash_password('s3cret', rounds=1000)
+
+    assert first.startswith('pbkdf2_sha256$1000$')
+    assert first != second
+    assert passwords.check_password('s3cret', first)[0]
+    assert not passwords.check_password('wrong', first)[0]
+
+
+def test_legacy_and_weak_hashes_need_rehash():
+    """Plaintext rows and under-strength hashes are flagged for upgrade"""
+    assert passwords.check_password('plain', 'plain') == (True, True)
+    assert passwords.check_password('nope', 'plain') == (False, True)
+
+    weak = passwords.hash_password('s3cret', rounds=1000)
+    assert passwords.check_password('s3cret', weak) == (True, True)
+
+    current = passwords.hash_password('s3cret')
+    assert passwords.verify('s3cret', current) == (True, False)
+
+
+def test_calibration_is_bounded():
+    """Calibrated iterations stay inside the configured range"""
+    assert passwords.calibrate(target_ms=0.001) == passwords.MIN_ITERATIONS
+    assert passwords.calibrate(target_ms=10**9) == passwords.MAX_ITERATIONS
+
+
+def test_make_many_keeps_existing_hashes(monkeypatch):
+    """Bulk hashing preserves order and leaves imported hashes alone"""
+    monkeypatch.setattr(passwords, '_iterations', 1000)
+    existing = passwords.hash_password('old', rounds=1000)
+    hashed = passwords.make_many(['a', existing, 'b'])
+    assert hashed[1] == existing
+    assert passwords.check_password('a', hashed[0])[0]
+    assert passwords.check_password('b', hashed[2])[0]
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the incrementally maintained patient summary
+Run with: python -m pytest test_patient_summary.py
+"""
+
+import datetime
+
+import pytest
+
+import app
+import db
+import patient_summary
+
+
+def statements(fake_db):
+    """Statement heads and transaction ends, in order."""
+    return [entry[0].split(' (')[0] if isinstance(entry, tuple) else entry
+            for entry in fake_db.log if isinstance(entry, tuple) or entry in ('commit', 'rollback')]
+
+
+def test_only_seizures_fill_day_buckets(fake_db):
+    log = fake_db.log
+    patient_summary.record_report(fake_db.cursor(), 'A1', 7, 'Normal')
+    assert statements(fake_db) == ['INSERT INTO patient_summary']
+    assert log[0][1] == ('A1', 7, 'Normal')
+
+    patient_summary.record_report(fake_db.cursor(), 'A1', 8, 'Seizure')
+    assert statements(fake_db)[1:] == ['INSERT INTO patient_summary', 'INSERT INTO patient_seizure_days']
+    assert 'seizure_count = seizure_count + 1' in log[2][0]
+
+
+def test_forgetting_a_report_touches_its_day_and_only_a_latest_summary(fake_db):
+    log = fake_db.log
+    created = datetime.datetime(2026, 10, 1, 9, 30)
+    patient_summary.forget_report(fake_db.cursor(), {'id': 8, 'aadhar_id': 'A1', 'result': 'Seizure',
+                                                         'created_at': created})
+    bucket, summary = log
+    assert 'GREATEST(seizure_count - 1, 0)' in bucket[0] and bucket[1] == ('A1', created)
+    assert summary[0].endswith('WHERE ps.patient_aadhar = %s AND ps.latest_report_id = %s')
+    assert summary[1] == ('A1', 'A1', 8)
+
+    log.clear()
+    patient_summary.forget_report(fake_db.cursor(), {'id': 9, 'aadhar_id': 'A1', 'result': 'Normal',
+                                                         'created_at': created})
+    assert len(log) == 1 and log[0][0].startswith('UPDATE patient_summary ps')
+
+
+def test_prescription_dates_only_move_forward_or_get_recomputed(fake_db):
+    log = fake_db.log
+    day = datetime.date(2026, 10, 1)
+    patient_summary.record_prescription(fake_db.cursor(), 'A1', day)
+    assert 'GREATEST(' in log[0][0] and log[0][1] == ('A1', day)
+    patient_summary.forget_prescription(fake_db.cursor(), 'A1', day)
+    assert log[1][0].endswith('WHERE patient_aadhar = %s AND last_prescription_date <= %s')
+    assert log[1][1] == ('A1', 'A1', day)
+
+
+def test_rebuild_replaces_both_tables_in_one_transaction(fake_db):
+    fake_db.on('INSERT INTO patient_summary', [()] * 3).on('INSERT INTO patient_seizure_days', [()] * 4)
+    assert patient_summary.rebuild(fake_db.connect()) == (3, 4)
+    assert statements(fake_db) == ['DELETE FROM patient_seizure_days', 'DELETE FROM patient_summary',
+                               'INSERT INTO patient_summary', 'INSERT INTO patient_seizure_days', 'commit']
+
+    fake_db.log.clear()
+    fake_db.fail_on = 'INSERT INTO patient_seizure_days'
+    with pytest.raises(db.Error):
+        patient_summary.rebuild(fake_db.connect())
+    assert statements(fake_db)[-1] == 'rollback' and 'commit' not in fake_db.log
+
+
+def test_prune_drops_buckets_outside_the_window(fake_db):
+    patient_summary.prune(fake_db.connect())
+    sql, _ = fake_db.statements()[0]
+    assert f'INTERVAL {patient_summary.WINDOW_DAYS} DAY' in sql and statements(fake_db)[-1] == 'commit'
+
+
+def test_sending_a_report_updates_the_summary_in_the_same_transaction(fake_db):
+    fake_db.lastrowid = 41
+    fake_db.on('FROM patients', [{'aadhar_id': 'A1'}])
+    client = app.app.test_client()
+    response = client.post('/send_brain_report/A1', data={'doctor_email': 'd@example.com', 'result': 'Seizure',
+                                                          'features': '[]'})
+    assert response.status_code == 200
+    assert statements(fake_db)[1:] == ['INSERT INTO brain_reports', 'INSERT INTO patient_summary',
+                                       'INSERT INTO patient_seizure_days', 'commit']
+    assert fake_db.statements('INSERT INTO patient_summary')[0][1] == ('A1', 41, 'Seizure')
+
+
+def test_report_for_an_unknown_patient_is_refused(fake_db):
+    fake_db.on('FROM patients', [])
+    client = app.app.test_client()
+    response = client.post('/send_brain_report/A9', data={'doctor_email': 'd@example.com', 'result': 'Seizure',
+                                                          'features': '[]'})
+    assert response.status_code == 302
+    assert fake_db.statements('INSERT') == []
+    with client.session_transaction() as sess:
+        assert ('error', 'Patient not found.') in sess['_flashes']
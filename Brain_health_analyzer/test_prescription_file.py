@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for the authenticated prescription download route
+Run with: python -m pytest test_prescription_file.py
+"""
+
+import hashlib
+
+import pytest
+
+import app
+
+DATA = b'%PDF-1.4 prescription body'
+SIGNATURE = hashlib.sha256(DATA).hexdigest()
+
+
+def linked(fake_db, prescription=None, links=()):
+    """Answer the prescription lookup and the patient_doctors/caretaker_patients checks."""
+    links = set(links)
+    fake_db.on('FROM prescriptions', [prescription] if prescription else [])
+    fake_db.on('', lambda params: [(1,)] if tuple(params) in links else [])
+    return fake_db
+
+
+def prescription(file_path='unused', **values):
+    row = {'patient_aadhar': 'A1', 'doctor_id': 'DR1', 'file_name': 'scan.pdf',
+           'file_path': file_path, 'digital_signature': SIGNATURE}
+    row.update(values)
+    return row
+
+
+@pytest.mark.parametrize('session_values, links, allowed', [
+    ({'user_type': 'patient', 'patient_aadhar': 'A1'}, (), True),
+    ({'user_type': 'patient', 'patient_aadhar': 'A2'}, (), False),
+    ({'user_type': 'doctor', 'doctor_id': 'DR1'}, (), True),            # wrote it
+    ({'user_type': 'doctor', 'doctor_id': 'DR2', 'verified_aadhar': 'A1'}, (), True),  # OTP consent
+    ({'user_type': 'doctor', 'doctor_id': 'DR2'}, [('DR2', 'A1')], True),  # selected by the patient
+    ({'user_type': 'doctor', 'doctor_id': 'DR3'}, [('DR2', 'A1')], False),
+    ({'user_type': 'caretaker', 'caretaker_id': 'CT1'}, [('CT1', 'A1')], True),
+    ({'user_type': 'caretaker', 'caretaker_id': 'CT2'}, [('CT1', 'A1')], False),
+    ({}, (), False),
+])
+def test_can_access_prescription(fake_db, session_values, links, allowed):
+    cursor = linked(fake_db, links=links).cursor()
+    with app.app.test_request_context():
+        app.session.update(session_values)
+        assert app.can_access_prescription(cursor, prescription()) is allowed
+
+
+@pytest.fixture
+def stored(monkeypatch, fake_db, tmp_path):
+    path = tmp_path / 'ab' / 'cd' / f'{SIGNATURE}.pdf'
+    path.parent.mkdir(parents=True)
+    path.write_bytes(DATA)
+    row = prescription(str(path))
+    linked(fake_db, row)
+    monkeypatch.setattr(app, 'FILE_SEND_MODE', 'direct')
+    return row
+
+
+def client_for(**session_values):
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess.update(session_values)
+    return client
+
+
+def test_anonymous_and_unrelated_users_get_nothing(stored):
+    assert app.app.test_client().get('/prescriptions/1/file').status_code == 302
+    other = client_for(user_type='patient', patient_aadhar='A2')
+    assert other.get('/prescriptions/1/file').status_code == 404
+
+
+def test_owner_gets_file_with_signature_etag(stored):
+    client = client_for(user_type='patient', patient_aadhar='A1')
+    response = client.get('/prescriptions/1/file')
+    assert response.status_code == 200 and response.data == DATA
+    assert response.headers['ETag'] == f'"{SIGNATURE}"'
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert response.headers['Content-Disposition'].startswith('inline')
+
+    response = client.get('/prescriptions/1/file?download=1')
+    assert response.headers['Content-Disposition'] == 'attachment; filename=scan.pdf'
+
+
+def test_conditional_and_range_requests(stored):
+    client = client_for(user_type='patient', patient_aadhar='A1')
+    response = client.get('/prescriptions/1/file', headers={'If-None-Match': f'"{SIGNATURE}"'})
+    assert response.status_code == 304 and response.data == b''
+
+    response = client.get('/prescriptions/1/file', headers={'Range': 'bytes=0-3'})
+    assert response.status_code == 206 and response.data == DATA[:4]
+    assert response.headers['Content-Range'] == f'bytes 0-3/{len(DATA)}'
+
+
+def test_x_accel_hands_the_body_to_nginx(stored, monkeypatch):
+    monkeypatch.setattr(app, 'FILE_SEND_MODE', 'x-accel')
+    monkeypatch.setitem(app.app.config, 'UPLOAD_FOLDER', str(stored['file_path']).rsplit('/ab/', 1)[0])
+    client = client_for(user_type='patient', patient_aadhar='A1')
+    response = client.get('/prescriptions/1/file')
+    assert response.headers['X-Accel-Redirect'] == f'{app.X_ACCEL_PREFIX}ab/cd/{SIGNATURE}.pdf'
+    assert response.data == b''
+    response = client.get('/prescriptions/1/file', headers={'If-None-Match': f'"{SIGNATURE}"'})
+    assert response.status_code == 304
+
+
+def test_remote_blobs_redirect_to_a_presigned_url(monkeypatch, fake_db):
+    class Store:
+        def presigned_url(self, location, download_name=None):
+            return f'https://bucket.example/{location[5:]}?name={download_name}'
+
+    row = prescription('s3://bucket/prescriptions/rx.pdf')
+    linked(fake_db, row)
+    monkeypatch.setattr(app, 'blob_store', Store())
+    response = client_for(user_type='patient', patient_aadhar='A1').get('/prescriptions/1/file?download=1')
+    assert response.status_code == 302
+    assert response.headers['Location'] == 'https://bucket.example/bucket/prescriptions/rx.pdf?name=scan.pdf'
+
+
+def test_uploads_are_not_served_as_static_files():
+    response = app.app.test_client().get('/static/uploads/prescriptions/anything.pdf')
+    assert response.status_code == 404
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Tests for content-addressed prescription storage
+Run with: python -m pytest test_prescription_store.py
+"""
+
+import hashlib
+import io
+import os
+
+import pytest
+
+import prescription_store
+import uploads
+
+
+def tables(fake_db):
+    """prescriptions and prescription_blobs as dicts, answered through fake_db."""
+    fake_db.prescriptions, fake_db.blobs = prescriptions, blobs = {}, {}
+
+    def acquire(params):
+        blobs[params[0]] = blobs.get(params[0], 0) + 1
+        return []
+
+    def ref_count(params):
+        return [{'ref_count': blobs[params[0]]}] if params[0] in blobs else []
+
+    def decrement(params):
+        blobs[params[0]] -= 1
+        return []
+
+    def insert(params):
+        prescriptions[params[0]] = {'file_path': params[5]}
+        return []
+
+    fake_db.on('INSERT INTO prescription_blobs', acquire)
+    fake_db.on('SELECT ref_count FROM prescription_blobs', ref_count)
+    fake_db.on('DELETE FROM prescription_blobs', lambda params: [blobs.pop(params[0])])
+    fake_db.on('UPDATE prescription_blobs', decrement)
+    fake_db.on('SELECT file_path, patient_aadhar, prescription_date FROM prescriptions',
+               lambda params: [prescriptions[params[0]]] if params[0] in prescriptions else [])
+    fake_db.on('INSERT INTO prescriptions', insert)
+    fake_db.on('DELETE FROM prescriptions',
+               lambda params: [prescriptions.pop(params[0])] if params[0] in prescriptions else [])
+    return fake_db
+
+
+def test_identical_uploads_share_one_sharded_blob(tmp_path):
+    """Same bytes map to one ab/cd/<digest>.<ext> file"""
+    store = prescription_store.LocalBlobStore(str(tmp_path))
+    data = b'%PDF-1.4 prescription'
+    digest = hashlib.sha256(data).hexdigest()
+
+    locations = []
+    for _ in range(2):
+        temp_path, size, sha256 = uploads.spool_stream(io.BytesIO(data), store.spool_dir)
+        location = store.location_for(sha256, 'pdf')
+        store.put(temp_path, location)
+        locations.append(location)
+
+    assert locations[0] == locations[1]
+    assert locations[0] == f"{tmp_path}/{digest[:2]}/{digest[2:4]}/{digest}.pdf"
+    assert open(locations[0], 'rb').read() == data
+    # Only the shard directory remains at the top level; no temp files
+    assert os.listdir(tmp_path) == [digest[:2]]
+
+
+def test_release_reports_last_reference(fake_db):
+    """release() is False while references remain, True for the last, None if untracked"""
+    cursor = tables(fake_db).cursor()
+    prescription_store.acquire(cursor, 'loc', 'd' * 64, 10)
+    prescription_store.acquire(cursor, 'loc', 'd' * 64, 10)
+
+    assert prescription_store.release(cursor, 'loc') is False
+    assert prescription_store.release(cursor, 'loc') is True
+    assert prescription_store.release(cursor, 'loc') is None
+    assert fake_db.blobs == {}
+
+
+# -------------------- VIEWS -------------------- #
+
+@pytest.fixture
+def database(monkeypatch, fake_db, tmp_path):
+    import app
+    import doctor_views
+
+    store = prescription_store.LocalBlobStore(str(tmp_path))
+    for module in (app, doctor_views):
+        monkeypatch.setattr(module, 'blob_store', store)
+    fake_db.store = store
+    return tables(fake_db)
+
+
+def logged_in(role, **values):
+    import app
+
+    client = app.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_type'] = role
+        sess.update(values)
+    return client
+
+
+def stored_blob(database, tmp_path, references=1):
+    location = f"{tmp_path}/ab/cd/abcd.pdf"
+    os.makedirs(os.path.dirname(location))
+    with open(location, 'wb') as f:
+        f.write(b'%PDF')
+    database.blobs[location] = references
+    database.prescriptions[7] = {'file_path': location, 'patient_aadhar': 'A1', 'prescription_date': None}
+    return location
+
+
+def test_file_is_deleted_only_after_the_delete_commits(database, tmp_path):
+    location = stored_blob(database, tmp_path)
+    logged_in('patient', patient_aadhar='A1').post('/patient/delete-prescription/7')
+
+    assert not os.path.exists(location) and database.blobs == {} and 7 not in database.prescriptions
+    after_commit = database.log[database.log.index('commit'):]
+    # Re-checked under lock in a second transaction
+    assert [entry for entry in after_commit if isinstance(entry, tuple)][0][0].startswith(
+        'SELECT ref_count FROM prescription_blobs')
+
+
+def test_failed_commit_keeps_the_file(database, tmp_path):
+    location = stored_blob(database, tmp_path)
+    database.fail_commit = True
+    logged_in('patient', patient_aadhar='A1').post('/patient/delete-prescription/7')
+    assert os.path.exists(location) and 'rollback' in database.log
+
+
+def test_file_referenced_again_before_deletion_is_kept(database, tmp_path):
+    import app
+
+    location = stored_blob(database, tmp_path)
+    app.delete_prescription_file(location)  # an upload re-acquired it after the delete
+    assert os.path.exists(location)
+    del database.blobs[location]
+    app.delete_prescription_file(location)
+    assert not os.path.exists(location)
+
+
+def test_failed_put_withdraws_the_prescription(database, monkeypatch):
+    def broken_put(temp_path, location):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(database.store, 'put', broken_put)
+    client = logged_in('doctor', doctor_id='DR1', verified_aadhar='A1')
+    response = client.post('/doctor/create-prescription', data={
+        'diagnosis': 'x', 'instructions': 'y',
+        'prescription_file': (io.BytesIO(b'%PDF-1.4 scan'), 'scan.pdf'),
+    }, content_type='multipart/form-data')
+
+    assert response.status_code == 302
+    assert database.prescriptions == {} and database.blobs == {}
+    # The insert, its withdrawal, then the unreferenced-file check
+    assert database.log.count('commit') == 3
+    # No spooled temp file is left behind
+    assert [name for name in os.listdir(database.store.root) if not os.path.isdir(
+        os.path.join(database.store.root, name))] == []
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Tests for the login rate limiter
+Run with: python -m pytest test_rate_limit.py
+"""
+
+import rate_limit
+
+
+def make_buckets(tmp_path):
+    return rate_limit.SQLiteBuckets(str(tmp_path / 'rate.sqlite3'), rules={
+        'login:ip': rate_limit.Rule(capacity=10, refill_per_second=1),
+        'login:account': rate_limit.Rule(capacity=2, refill_per_second=0.5),
+    })
+
+
+def test_bucket_empties_and_refills(tmp_path):
+    """Burst capacity is enforced, then tokens return at the refill rate"""
+    buckets = make_buckets(tmp_path)
+    checks = [('login:ip', '1.2.3.4'), ('login:account', 'alice')]
+
+    assert buckets.hit(checks, now=100)[0]
+    assert buckets.hit(checks, now=100)[0]
+    allowed, retry_after = buckets.hit(checks, now=100)
+    assert not allowed
+    assert retry_after == 2
+
+    assert buckets.hit(checks, now=102)[0]
+    # Other accounts from the same IP are unaffected
+    assert buckets.hit([('login:ip', '1.2.3.4'), ('login:account', 'bob')], now=102)[0]
+
+
+def test_rejection_charges_nothing_and_is_counted(tmp_path):
+    """A rejected attempt does not drain the other buckets"""
+    buckets = make_buckets(tmp_path)
+    for _ in range(2):
+        buckets.hit([('login:account', 'alice')], now=0)
+    for _ in range(5):
+        assert not buckets.hit([('login:ip', 'x'), ('login:account', 'alice')], now=0)[0]
+
+    # The IP bucket still has its full burst
+    for _ in range(10):
+        assert buckets.hit([('login:ip', 'x')], now=0)[0]
+
+    assert buckets.counters() == {
+        'login:account': {'allowed': 2, 'rejected': 5},
+        'login:ip': {'allowed': 10, 'rejected': 0},
+    }
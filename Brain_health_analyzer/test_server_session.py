@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Tests for server-side sessions
+Run with: python -m pytest test_server_session.py
+"""
+
+import time
+
+import pytest
+
+import app
+import passwords
+import server_session
+
+
+def make_store(tmp_path):
+    return server_session.CachedStore(
+        server_session.SQLiteSessionStore(str(tmp_path / 'sessions.sqlite3')), ttl=30)
+
+
+def test_revoke_user_drops_cached_sessions(tmp_path):
+    """Revoked sessions disappear even though they were cached"""
+    store = make_store(tmp_path)
+    expires_at = time.time() + 60
+    for sid in ('a', 'b'):
+        store.save(sid, {'user_type': 'doctor', '_expires_at': expires_at}, expires_at, 'doctor:D1')
+    store.save('c', {'_expires_at': expires_at}, expires_at, 'doctor:D2')
+    assert store.load('a')['user_type'] == 'doctor'
+
+    assert store.revoke_user('doctor:D1', keep_sid='b') == 1
+    assert store.load('a') is None
+    assert store.load('b') is not None
+    assert store.load('c') is not None
+
+
+def test_sweep_deletes_expired_in_batches(tmp_path):
+    """Expired rows go in batches; live rows stay"""
+    store = make_store(tmp_path)
+    past, future = time.time() - 1, time.time() + 60
+    for i in range(25):
+        store.save(f"old{i}", {'_expires_at': past}, past)
+    store.save('live', {'_expires_at': future}, future)
+
+    assert store.sweep(batch_size=10, max_batches=1) == 10
+    assert store.sweep(batch_size=10) == 15
+    assert store.load('old0') is None
+    assert store.load('live') is not None
+
+
+class FakeRedis:
+    """The few Redis commands the sweep uses; counts round trips."""
+
+    def __init__(self, sets, live):
+        self.sets = sets
+        self.live = live
+        self.round_trips = 0
+
+    def scan(self, cursor, match=None, count=10):
+        self.round_trips += 1
+        keys = sorted(self.sets)
+        page = keys[cursor:cursor + count]
+        return (cursor + count if cursor + count < len(keys) else 0), page
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def smembers(self, key):
+        self.calls.append(lambda: set(self.client.sets[key]))
+
+    def exists(self, key):
+        self.calls.append(lambda: int(key in self.client.live))
+
+    def srem(self, key, sid):
+        self.calls.append(lambda: self.client.sets[key].discard(sid))
+
+    def execute(self):
+        self.client.round_trips += 1
+        calls, self.calls = self.calls, []
+        return [call() for call in calls]
+
+
+def test_redis_sweep_pages_through_user_sets():
+    """Each batch is one SCAN page; the cursor carries over between sweeps"""
+    sets = {f'session:user:u{i}'.encode(): {f'old{i}'.encode(), f'live{i}'.encode()} for i in range(5)}
+    client = FakeRedis(sets, live={f'session:live{i}' for i in range(5)})
+    store = object.__new__(server_session.RedisSessionStore)
+    store.client, store.prefix, store._scan_cursor = client, 'session:', 0
+
+    assert store.sweep(batch_size=2, max_batches=1) == 2
+    assert client.round_trips == 4  # SCAN, SMEMBERS, EXISTS and SREM pipelines
+    assert sets[b'session:user:u0'] == {b'live0'} and b'old2' in sets[b'session:user:u2']
+
+    assert store.sweep(batch_size=2, max_batches=1) == 2
+    assert b'old2' not in sets[b'session:user:u2'] and b'old4' in sets[b'session:user:u4']
+
+    assert store.sweep(batch_size=2) == 1  # runs until the cursor wraps
+    assert store._scan_cursor == 0
+    assert sets == {key: {f'live{i}'.encode()} for i, key in enumerate(sorted(sets))}
+    assert store.sweep(batch_size=2) == 0
+
+
+@pytest.mark.parametrize('path, session_keys', [
+    ('/patient/profile', {'user_type': 'patient', 'patient_aadhar': '111122223333'}),
+    ('/doctor/profile', {'user_type': 'doctor', 'doctor_id': 'DR1'}),
+    ('/caretaker/profile', {'user_type': 'caretaker', 'caretaker_id': 'CT1'}),
+])
+def test_password_change_logs_out_other_browsers(fake_db, path, session_keys):
+    """The browser that changed the password stays signed in; the others do not"""
+    fake_db.rows = [(passwords.hash_password('old-pass'),)]
+    browsers = [app.app.test_client() for _ in range(2)]
+    for client in browsers:
+        with client.session_transaction() as sess:
+            sess.update(session_keys)
+    here, elsewhere = browsers
+
+    here.post(path, data={'name': 'N', 'current_password': 'old-pass', 'new_password': 'new-pass'})
+
+    with here.session_transaction() as sess:
+        assert sess.get('user_type') == session_keys['user_type']
+    with elsewhere.session_transaction() as sess:
+        assert 'user_type' not in sess
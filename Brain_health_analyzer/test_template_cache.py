@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for template precompilation and fragment caching
+Run with: python -m pytest test_template_cache.py
+"""
+
+from jinja2 import DictLoader, Environment
+
+import template_cache
+
+
+def make_env(templates, **options):
+    env = Environment(loader=DictLoader(templates), extensions=[template_cache.FragmentCacheExtension],
+                      autoescape=True, **options)
+    calls = []
+    env.globals['expensive'] = lambda value: calls.append(value) or value
+    return env, calls
+
+
+def test_fragment_is_rendered_once_per_key():
+    env, calls = make_env({'page.html': '{% cache "grid", version %}<b>{{ expensive(name) }}</b>{% endcache %}'})
+    page = env.get_template('page.html')
+
+    assert page.render(version=1, name='<x>') == '<b>&lt;x&gt;</b>'
+    assert page.render(version=1, name='ignored') == '<b>&lt;x&gt;</b>'
+    assert page.render(version=2, name='new') == '<b>new</b>'
+    assert calls == ['<x>', 'new']
+
+
+def test_keys_include_position_and_accept_lists():
+    env, calls = make_env({
+        'a.html': '{% cache "x", rows %}{{ expensive(1) }}{% endcache %}{% cache "x", rows %}{{ expensive(2) }}{% endcache %}',
+    })
+    rows = [{'doctor_id': 'DR1', 'name': 'A'}]
+    assert env.get_template('a.html').render(rows=rows) == '12'
+    assert env.get_template('a.html').render(rows=[dict(rows[0])]) == '12'
+    assert calls == [1, 2]
+
+
+def test_disabled_cache_always_renders():
+    env, calls = make_env({'page.html': '{% cache "grid" %}{{ expensive(1) }}{% endcache %}'})
+    env.fragment_cache = None
+    env.get_template('page.html').render()
+    env.get_template('page.html').render()
+    assert calls == [1, 1]
+
+
+def test_precompile_fills_bytecode_cache(tmp_path):
+    templates = {'a.html': '{{ 1 + 1 }}', 'b.html': '{% extends "a.html" %}', 'notes.txt': 'skip'}
+    env, _ = make_env(templates, bytecode_cache=template_cache.bytecode_cache(str(tmp_path / 'bc')))
+    assert template_cache.precompile(env) == 2
+    assert len(list((tmp_path / 'bc').iterdir())) == 2
+
+    # A fresh environment loads from bytecode without recompiling
+    fresh, _ = make_env(templates, bytecode_cache=template_cache.bytecode_cache(str(tmp_path / 'bc')))
+    fresh.compile = None
+    assert fresh.get_template('a.html').render() == '2'
+
+
+def test_doctor_options_follow_the_doctor_list():
+    """brain_result.html keys its doctor options on the rows, not a per-worker counter"""
+    from flask import render_template, session
+
+    import app
+
+    env = app.app.jinja_env
+    saved, env.fragment_cache = env.fragment_cache, template_cache.TTLCache()
+    try:
+        with app.app.test_request_context():
+            session['patient_aadhar'] = '111122223333'
+            for name in ('Asha', 'Ravi'):
+                html = render_template('brain_result.html', aadhar_id='111122223333', result='Normal',
+                                       features=[0.1] * 85,
+                                       doctors=[{'email': 'd@example.com', 'name': name, 'specialization': 'Neuro'}])
+                assert f'{name} - Neuro' in html
+    finally:
+        env.fragment_cache = saved
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for single-pass upload storage
+Run with: python -m pytest test_uploads.py
+"""
+
+import base64
+import hashlib
+import io
+import os
+
+import uploads
+
+
+def test_spool_stream_hashes_while_writing(tmp_path):
+    """Size and SHA-256 match the content, written to one temp file"""
+    data = os.urandom(uploads.CHUNK_SIZE * 2 + 123)
+
+    temp_path, size, digest = uploads.spool_stream(io.BytesIO(data), str(tmp_path))
+
+    assert size == len(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert open(temp_path, 'rb').read() == data
+    assert os.listdir(tmp_path) == [os.path.basename(temp_path)]
+
+
+def test_spool_base64_in_slices(tmp_path):
+    """Slice-wise decoding matches a one-shot decode, including wrapped input"""
+    data = os.urandom(10_000)
+    encoded = base64.encodebytes(data).decode()  # 76-char lines
+
+    temp_path, size, digest = uploads.spool_base64(encoded, str(tmp_path), slice_size=400)
+
+    assert size == len(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert open(temp_path, 'rb').read() == data
+
+
+def test_spool_file_detach_and_discard(tmp_path):
+    """Detached spools are kept for the caller; abandoned ones are removed"""
+    spool = uploads.HashingSpoolFile(str(tmp_path))
+    spool.write(b'hello ')
+    spool.write(b'world')
+    spool.seek(0)
+    assert spool.read() == b'hello world'
+    temp_path, size, digest = spool.detach()
+    assert (size, digest) == (11, hashlib.sha256(b'hello world').hexdigest())
+    spool.close()
+
+    abandoned = uploads.HashingSpoolFile(str(tmp_path))
+    abandoned.write(b'junk')
+    abandoned.close()
+
+    assert os.listdir(tmp_path) == [os.path.basename(temp_path)]
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for self-hosted vendor assets
+Run with: python -m pytest test_vendor.py
+"""
+
+import json
+import os
+
+import app
+import vendor
+
+BOOTSTRAP_CSS = (
+    '/*! Bootstrap v5.1.3 */:root{--bs-blue:#0d6efd}body{margin:0}'
+    '.btn{padding:1rem}.btn-primary,.btn-unused{color:#fff}.fade:not(.show){opacity:0}'
+    '@media (min-width:576px){.col-sm-6{width:50%}.col-sm-7{width:58%}}'
+    '.alert-danger{color:red}.alert-success{color:green}.alert-info{color:blue}'
+)
+FA_CSS = (
+    '.fa,.fas{font-weight:900}.fab{font-family:"Font Awesome 6 Brands"}'
+    '.fa-brain:before{content:"\\f5dc"}.fa-moon:before{content:"\\f186"}.fa-sun:before{content:"\\f185"}'
+    '.fa-check-circle:before{content:"\\f058"}.fa-github:before{content:"\\f09b"}'
+    '@font-face{font-family:"Font Awesome 6 Free";font-weight:900;'
+    'src:url(../webfonts/fa-solid-900.woff2) format("woff2"),url(../webfonts/fa-solid-900.ttf) format("truetype")}'
+    '@font-face{font-family:"Font Awesome 6 Brands";font-weight:400;'
+    'src:url(../webfonts/fa-brands-400.woff2) format("woff2")}'
+    '@font-face{font-family:"FontAwesome";src:url(../webfonts/fa-solid-900.woff2) format("woff2")}'
+)
+INTER_CSS = '''
+/* cyrillic */
+@font-face {
+  font-family: 'Inter';
+  font-weight: 400 700;
+  src: url(https://fonts.gstatic.com/s/inter/v13/cyr.woff2) format('woff2');
+}
+/* latin */
+@font-face {
+  font-family: 'Inter';
+  font-weight: 400 700;
+  src: url(https://fonts.gstatic.com/s/inter/v13/latin.woff2) format('woff2');
+}
+'''
+
+
+def make_app(tmp_path):
+    (tmp_path / 'templates').mkdir()
+    (tmp_path / 'templates' / 'base.html').write_text(
+        '<div class="col-sm-6"><a class="btn btn-primary"><i class="fas fa-brain"></i></a>'
+        '<div class="alert alert-{{ \'danger\' if error else \'success\' }}">'
+        '<i class="fas fa-{{ \'check-circle\' }}"></i></div>'
+        '<script>icon.classList.add(\'fa-sun\')</script>'
+        '<p style="font-weight: 600">x</p></div>'
+    )
+    (tmp_path / 'static').mkdir()
+    return tmp_path
+
+
+def fake_fetch(requested):
+    def fetch(url):
+        requested.append(url)
+        if url.endswith('bootstrap.min.css'):
+            return BOOTSTRAP_CSS.encode()
+        if url.endswith('all.min.css'):
+            return FA_CSS.encode()
+        if url.startswith(vendor.GOOGLE_FONTS):
+            return INTER_CSS.encode()
+        return b'binary:' + url.encode()
+    return fetch
+
+
+def test_used_classes_expands_dynamic_classes(tmp_path):
+    (tmp_path / 'templates').mkdir()
+    (tmp_path / 'templates' / 'a.html').write_text(
+        '<i class="fa-{{ \'sun\' if dark else "moon" }}"></i><p class="text-{{ level }}">')
+    words, prefixes = vendor.used_classes(str(tmp_path))
+    assert {'fa-sun', 'fa-moon'} <= words
+    assert prefixes == {'text-'}
+
+
+def test_purge_css_keeps_used_and_runtime_classes():
+    keep = vendor.class_filter({'btn', 'btn-primary', 'col-sm-6', 'alert-danger'})
+    css = vendor.purge_css(BOOTSTRAP_CSS, keep)
+    assert css.startswith('/*! Bootstrap v5.1.3 */')
+    assert ':root{--bs-blue:#0d6efd}' in css and 'body{margin:0}' in css
+    assert '.btn-primary{color:#fff}' in css and 'btn-unused' not in css
+    assert '.fade:not(.show){opacity:0}' in css
+    assert '@media (min-width:576px){.col-sm-6{width:50%}}' in css
+    assert 'alert-success' not in css and 'alert-info' not in css
+
+
+def test_minify_css():
+    css = vendor.minify_css('/* note */\n@media (min-width: 576px) {\n  .a > .b { color:  red; }\n}\n')
+    assert css == '@media (min-width:576px){.a>.b{color:red}}'
+
+
+def test_vendor_all_writes_trimmed_assets(tmp_path):
+    app_folder = make_app(tmp_path)
+    requested = []
+    written = vendor.vendor_all(str(app_folder), fetch=fake_fetch(requested))
+    vendor_dir = app_folder / 'static' / 'vendor'
+
+    bootstrap = (vendor_dir / 'bootstrap.min.css').read_text()
+    assert '.alert-danger' in bootstrap and '.alert-info' not in bootstrap
+
+    fontawesome = (vendor_dir / 'fontawesome.min.css').read_text()
+    assert all(icon in fontawesome for icon in ('fa-brain', 'fa-sun', 'fa-check-circle'))
+    assert 'fa-moon' not in fontawesome and 'fa-github' not in fontawesome
+    # Only the solid face, woff2 only, no v4 alias
+    assert fontawesome.count('@font-face') == 1
+    assert 'src:url(webfonts/fa-solid-900.woff2) format("woff2")' in fontawesome
+    assert 'vendor/webfonts/fa-solid-900.woff2' in written
+    assert 'vendor/webfonts/fa-brands-400.woff2' not in written
+
+    inter = (vendor_dir / 'inter.css').read_text()
+    assert inter.count('@font-face') == 1 and 'gstatic' not in inter
+    font_url = [url for url in requested if url.startswith(vendor.GOOGLE_FONTS)][0]
+    assert 'wght@400;500;600;700&' in font_url
+
+    assert vendor.available(str(app_folder / 'static')) == set(vendor.FILES)
+    assert json.loads((vendor_dir / vendor.SOURCES).read_text())['chart.js'] == vendor.FILES['chart.js'].cdn
+
+
+def test_vendor_all_removes_stale_files(tmp_path):
+    app_folder = make_app(tmp_path)
+    stale = app_folder / 'static' / 'vendor' / 'webfonts' / 'old.woff2'
+    stale.parent.mkdir(parents=True)
+    stale.write_bytes(b'old')
+    vendor.vendor_all(str(app_folder), fetch=fake_fetch([]))
+    assert not os.path.exists(stale)
+
+
+def test_missing_vendor_files_are_reported(monkeypatch, capsys):
+    monkeypatch.setattr(app, 'vendored_assets', set(vendor.FILES) - {'chart.js', 'bootstrap.css'})
+    assert app.warn_missing_vendor_assets() == ['bootstrap.css', 'chart.js']
+    assert 'bootstrap.css, chart.js' in capsys.readouterr().out
+
+    monkeypatch.setattr(app, 'vendored_assets', set(vendor.FILES))
+    assert app.warn_missing_vendor_assets() == []
+    assert capsys.readouterr().out == ''
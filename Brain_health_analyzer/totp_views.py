@@ -0,0 +1,152 @@
+"""
+TOTP setup, disable and backup-code routes for every role.
+
+/patient/setup-totp, /doctor/setup-totp and /caretaker/setup-totp (and the
+disable/regenerate routes) are one set of views; the role in the URL picks
+the account table through accounts.ROLES and must match the logged-in user.
+Endpoints: totp.setup, totp.disable and totp.regenerate_backup_codes, each
+with role=...
+"""
+
+import json
+
+from flask import Blueprint, flash, redirect, render_template, request, session, url_for
+
+import accounts
+import db
+import two_factor
+from app import account_changed, rate_limited, role_required, session_user_key
+
+bp = Blueprint('totp', __name__)
+
+ROLE_PATH = '/<any(patient, doctor, caretaker):role>'
+
+
+def _profile():
+    """Endpoint of the profile page of the role in the URL."""
+    return f"{request.view_args['role']}.profile"
+
+
+def _user_id(role):
+    return session[accounts.ROLES[role].session_key]
+
+
+def check_second_factor(cursor, role, account, totp_code, backup_code):
+    """Check a login's TOTP or backup code.
+
+    Returns None when the account has no TOTP or a code is valid (a used
+    backup code is removed with the caller's transaction), otherwise the
+    error to show.
+    """
+    if not account.get('totp_enabled', False):
+        return None
+    if totp_code and two_factor.verify_totp_code(account.get('totp_secret'), totp_code):
+        return None
+    if backup_code:
+        is_valid, updated_codes = two_factor.verify_backup_code(account.get('backup_codes'), backup_code)
+        if is_valid:
+            accounts.update(cursor, role, account[accounts.ROLES[role].id_column], backup_codes=updated_codes)
+            flash("Backup code used successfully. Please consider regenerating backup codes.", "warning")
+            return None
+        return "Invalid backup code!"
+    return "Please enter TOTP code or backup code!"
+
+
+def _verified_account(cursor, role, password, totp_code, require_totp=False):
+    """The logged-in account if password (and TOTP, when enabled) check out, else None."""
+    user_id = _user_id(role)
+    account = accounts.load(cursor, role, user_id)
+    if not account or not accounts.password_matches(cursor, role, user_id, password, account['password']):
+        flash('Incorrect password!', 'error')
+        return None
+    if require_totp and not account.get('totp_enabled'):
+        flash('TOTP is not enabled!', 'error')
+        return None
+    if account.get('totp_enabled') and not two_factor.verify_totp_code(account.get('totp_secret'), totp_code):
+        flash('Invalid TOTP code!', 'error')
+        return None
+    return account
+
+
+@bp.route(f'{ROLE_PATH}/setup-totp', methods=['GET', 'POST'])
+@rate_limited('totp', lambda: session_user_key(session), redirect_endpoint=_profile)
+@role_required()
+def setup(role):
+    if request.method == 'POST':
+        totp_code = request.form.get('totp_code')
+
+        if 'temp_totp_secret' not in session:
+            flash('TOTP setup session expired. Please try again.', 'error')
+            return redirect(url_for('totp.setup', role=role))
+
+        secret = session['temp_totp_secret']
+
+        if two_factor.verify_totp_code(secret, totp_code):
+            backup_codes = two_factor.generate_backup_codes()
+            try:
+                with db.transaction() as cursor:
+                    accounts.enable_totp(cursor, role, _user_id(role), secret, backup_codes)
+
+                account_changed()
+                session.pop('temp_totp_secret', None)
+                flash('TOTP enabled successfully!', 'success')
+                return render_template('totp_backup_codes.html',
+                                       backup_codes=backup_codes,
+                                       user_type=role)
+            except db.Error as e:
+                flash('Error enabling TOTP. Please try again.', 'error')
+        else:
+            flash('Invalid TOTP code. Please try again.', 'error')
+
+    # Generate new secret and QR code
+    secret = two_factor.generate_totp_secret()
+    session['temp_totp_secret'] = secret
+
+    try:
+        account = accounts.get(role, _user_id(role), accounts.CARD, session.get('account_version', 0))
+        user_email = account['email'] if account else _user_id(role)
+    except db.Error:
+        user_email = _user_id(role)
+
+    return render_template('setup_totp.html',
+                           qr_code=two_factor.generate_qr_code(secret, user_email),
+                           secret=secret,
+                           user_type=role)
+
+
+@bp.route(f'{ROLE_PATH}/disable-totp', methods=['POST'])
+@rate_limited('totp', lambda: session_user_key(session), redirect_endpoint=_profile)
+@role_required()
+def disable(role):
+    try:
+        with db.transaction(dictionary=True, prepared=True) as cursor:
+            if _verified_account(cursor, role, request.form.get('password'), request.form.get('totp_code')):
+                accounts.disable_totp(cursor, role, _user_id(role))
+                account_changed()
+                flash('TOTP disabled successfully!', 'success')
+    except db.Error as e:
+        flash('Error disabling TOTP. Please try again.', 'error')
+
+    return redirect(url_for(_profile()))
+
+
+@bp.route(f'{ROLE_PATH}/regenerate-backup-codes', methods=['POST'])
+@rate_limited('totp', lambda: session_user_key(session), redirect_endpoint=_profile)
+@role_required()
+def regenerate_backup_codes(role):
+    try:
+        with db.transaction(dictionary=True, prepared=True) as cursor:
+            if not _verified_account(cursor, role, request.form.get('password'),
+                                     request.form.get('totp_code'), require_totp=True):
+                return redirect(url_for(_profile()))
+            backup_codes = two_factor.generate_backup_codes()
+            accounts.update(cursor, role, _user_id(role), backup_codes=json.dumps(backup_codes))
+
+        flash('Backup codes regenerated successfully!', 'success')
+        return render_template('totp_backup_codes.html',
+                               backup_codes=backup_codes,
+                               user_type=role)
+    except db.Error as e:
+        flash('Error regenerating backup codes. Please try again.', 'error')
+
+    return redirect(url_for(_profile()))
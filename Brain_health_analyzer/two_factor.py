@@ -0,0 +1,77 @@
+"""
+TOTP (authenticator app) secrets, QR codes and one-time backup codes.
+
+Shared by the login views of every role and the TOTP setup blueprint
+(totp_views.py); see TOTP_README.md for the user-facing flow.
+"""
+
+import base64
+import json
+import random
+from io import BytesIO
+
+import pyotp
+
+
+def generate_totp_secret():
+    """Generate a new TOTP secret for a user."""
+    return pyotp.random_base32()
+
+
+def generate_qr_code(secret, user_email, issuer_name="Healthcare App"):
+    """Generate QR code for TOTP setup."""
+    totp = pyotp.TOTP(secret)
+    provisioning_uri = totp.provisioning_uri(
+        name=user_email,
+        issuer_name=issuer_name
+    )
+
+    import qrcode  # pulls in PIL; only needed on TOTP setup pages
+
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(provisioning_uri)
+    qr.make(fit=True)
+
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    # Convert to base64 for display in HTML
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    buffer.seek(0)
+    qr_code_base64 = base64.b64encode(buffer.getvalue()).decode()
+
+    return qr_code_base64
+
+
+def verify_totp_code(secret, user_code):
+    """Verify TOTP code entered by user."""
+    if not secret or not user_code:
+        return False
+
+    totp = pyotp.TOTP(secret)
+    # Allow for 1 time step tolerance (30 seconds before/after)
+    return totp.verify(user_code, valid_window=1)
+
+
+def generate_backup_codes():
+    """Generate backup codes for account recovery."""
+    codes = []
+    for _ in range(10):
+        code = ''.join([str(random.randint(0, 9)) for _ in range(8)])
+        codes.append(code)
+    return codes
+
+
+def verify_backup_code(stored_codes, entered_code):
+    """Verify and consume a backup code."""
+    if not stored_codes or not entered_code:
+        return False, stored_codes
+
+    try:
+        codes_list = json.loads(stored_codes) if isinstance(stored_codes, str) else stored_codes
+        if entered_code in codes_list:
+            codes_list.remove(entered_code)  # Use code only once
+            return True, json.dumps(codes_list)
+        return False, stored_codes
+    except (json.JSONDecodeError, TypeError):
+        return False, stored_codes
@@ -0,0 +1,137 @@
+"""
+Single-pass upload storage with SHA-256 computed while writing.
+
+Prescription files used to be saved, stat'ed and then re-read in full to
+compute their digital signature. Here the multipart parser writes straight
+into a temporary file in the upload directory (HashingSpoolFile), hashing
+each chunk as it arrives, so an upload costs exactly one write and no
+re-read.
+
+The spool_* functions return (temp_path, size, sha256); the caller moves
+the temp file to a destination chosen from the digest (see
+prescription_store).
+
+Camera photos arrive as base64 data URLs; spool_base64() decodes them in
+slices so the whole decoded image is never held in memory.
+"""
+
+import base64
+import hashlib
+import os
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024  # 1 MiB
+
+# Base64 must be decoded in multiples of 4 characters
+BASE64_SLICE = (CHUNK_SIZE // 3) * 4
+
+
+class HashingSpoolFile:
+    """Writable/readable temp file that hashes and counts bytes as they are written.
+
+    Used as the multipart stream for uploaded files. detach() hands the temp
+    file to the caller; if it is closed without being detached the temp file
+    is removed.
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+        self._sha256 = hashlib.sha256()
+        self.size = 0
+        self._detached = False
+
+    def write(self, data):
+        self._sha256.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+    def detach(self):
+        """Flush and close, handing the temp file over to the caller.
+
+        Returns (temp_path, size, sha256); the file is no longer removed on
+        close().
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._detached = True
+        return self.temp_path, self.size, self.hexdigest()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self._detached and os.path.exists(self.temp_path):
+            os.unlink(self.temp_path)
+
+    def __getattr__(self, name):
+        # read/seek/readline/tell etc. go to the underlying file
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _spool(chunks, directory):
+    """Write byte chunks to a temp file in directory, hashing as it goes."""
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=directory or '.', prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            for chunk in chunks:
+                sha256.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, size, sha256.hexdigest()
+
+
+def _base64_chunks(data, slice_size):
+    # Slices must stay 4-character aligned, so drop any line breaks first
+    if any(c in data for c in ' \r\n\t'):
+        data = ''.join(data.split())
+    for start in range(0, len(data), slice_size):
+        yield base64.b64decode(data[start:start + slice_size])
+
+
+def spool_stream(stream, directory, chunk_size=CHUNK_SIZE):
+    """Copy a readable stream into a temp file. Returns (temp_path, size, sha256)."""
+    return _spool(iter(lambda: stream.read(chunk_size), b''), directory)
+
+
+def spool_upload(file_storage, directory):
+    """Temp file for a werkzeug FileStorage. Returns (temp_path, size, sha256).
+
+    Uploads parsed into a HashingSpoolFile are handed over without copying;
+    anything else is streamed through spool_stream().
+    """
+    stream = file_storage.stream
+    if isinstance(stream, HashingSpoolFile):
+        return stream.detach()
+    stream.seek(0)
+    return spool_stream(stream, directory)
+
+
+def spool_base64(data, directory, slice_size=BASE64_SLICE):
+    """Decode base64 text into a temp file slice by slice.
+
+    Returns (temp_path, size, sha256); raises binascii.Error on malformed
+    input.
+    """
+    return _spool(_base64_chunks(data, slice_size), directory)
+
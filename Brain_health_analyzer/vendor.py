@@ -0,0 +1,320 @@
+"""
+Self-hosted third-party assets.
+
+Pages used to load Bootstrap, Font Awesome, Inter, Chart.js and
+canvas-confetti from four CDNs. The vendor-assets command downloads the
+pinned versions below once and writes trimmed copies to static/vendor/:
+
+- Bootstrap and Font Awesome CSS keep only the rules whose classes appear
+  in templates/ (or that Bootstrap's JS adds at runtime), re-minified.
+- Font Awesome keeps only the icon styles in use, as woff2; the fonts are
+  subset to the glyphs in use when fontTools is installed.
+- Inter is fetched for the weights the templates use, Latin only.
+
+Commit static/vendor/ afterwards; assets.build() fingerprints and
+precompresses it like any other static file. Until vendor-assets has been
+run, vendor_url() keeps pointing at the CDN, and production startup prints
+a warning naming the files that are missing.
+"""
+
+import glob
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import urllib.request
+from collections import namedtuple
+
+VENDOR_DIR = 'vendor'
+SOURCES = 'sources.json'
+
+BOOTSTRAP = 'https://cdn.jsdelivr.net/npm/bootstrap@5.1.3/dist'
+FONT_AWESOME = 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0'
+GOOGLE_FONTS = 'https://fonts.googleapis.com/css2'
+INTER_WEIGHTS = (300, 400, 500, 600, 700, 800)
+
+Vendored = namedtuple('Vendored', 'path cdn')
+
+FILES = {
+    'bootstrap.css': Vendored('vendor/bootstrap.min.css', f'{BOOTSTRAP}/css/bootstrap.min.css'),
+    'bootstrap.js': Vendored('vendor/bootstrap.bundle.min.js', f'{BOOTSTRAP}/js/bootstrap.bundle.min.js'),
+    'fontawesome.css': Vendored('vendor/fontawesome.min.css', f'{FONT_AWESOME}/css/all.min.css'),
+    'inter.css': Vendored('vendor/inter.css', GOOGLE_FONTS + '?family=Inter:wght@'
+                          + ';'.join(map(str, INTER_WEIGHTS)) + '&display=swap'),
+    'chart.js': Vendored('vendor/chart.umd.min.js',
+                         'https://cdn.jsdelivr.net/npm/chart.js@4.4.0/dist/chart.umd.min.js'),
+    'confetti.js': Vendored('vendor/confetti.browser.min.js',
+                            'https://cdn.jsdelivr.net/npm/canvas-confetti@1.6.0/dist/confetti.browser.min.js'),
+}
+
+# Classes Bootstrap's JS toggles, which never appear in a template
+SAFELIST = re.compile(
+    r'^(show|showing|hiding|fade|collapse|collapsing|active|disabled|was-validated|'
+    r'is-(in)?valid|modal-.*|offcanvas-.*|tooltip.*|popover.*|bs-.*|'
+    r'carousel-item-.*|dropdown-menu-.*|dropup|dropend|dropstart|toast.*)$'
+)
+
+# Font Awesome styles: classes that select them -> webfont file
+FA_STYLES = {
+    'fa-solid-900': {'fa', 'fas', 'fa-solid'},
+    'fa-regular-400': {'far', 'fa-regular'},
+    'fa-brands-400': {'fab', 'fa-brands'},
+}
+FONT_SUBSETS = ('latin',)
+
+# Browsers get woff2 from Google Fonts only with a modern user agent
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36'
+
+TOKEN = re.compile(r'[A-Za-z0-9_-]+')
+DYNAMIC_CLASS = re.compile(r'([A-Za-z][\w-]*-)\{\{(.*?)\}\}')
+STRING_LITERAL = re.compile(r'\'([\w-]+)\'|"([\w-]+)"')
+CLASS_SELECTOR = re.compile(r'\.(-?[_a-zA-Z0-9][\w-]*)')
+FONT_WEIGHT = re.compile(r'font-weight\s*:\s*(\d{3}|bold|normal)')
+ICON_CODEPOINT = re.compile(r'(?:content|--fa)\s*:\s*"\\([0-9a-fA-F]+)"')
+
+
+def fetch(url):
+    request = urllib.request.Request(url, headers={'User-Agent': USER_AGENT})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.read()
+
+
+# -------------------- WHAT THE TEMPLATES USE -------------------- #
+
+def _sources(app_folder):
+    patterns = ['templates/**/*.html', 'static/**/*.js', 'static/**/*.css', '*.py']
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(app_folder, pattern), recursive=True):
+            relative = os.path.relpath(path, app_folder).replace(os.sep, '/')
+            if not relative.startswith(('static/dist/', 'static/vendor/', 'static/uploads/')):
+                yield path
+
+
+def used_classes(app_folder):
+    """Every word in templates, static JS/CSS and Python code, plus class prefixes.
+
+    Like PurgeCSS, any word counts as a possible class name. A class built
+    in a template as prefix-{{ ... }} adds prefix+literal for each string
+    literal in the expression, or the bare prefix (keep everything starting
+    with it) when there is none.
+    """
+    words, prefixes = set(), set()
+    for path in _sources(app_folder):
+        with open(path, encoding='utf-8', errors='ignore') as f:
+            text = f.read()
+        words.update(TOKEN.findall(text))
+        for prefix, expression in DYNAMIC_CLASS.findall(text):
+            literals = [a or b for a, b in STRING_LITERAL.findall(expression)]
+            if literals:
+                words.update(prefix + literal for literal in literals)
+            else:
+                prefixes.add(prefix)
+    return words, prefixes
+
+
+def used_font_weights(app_folder, words):
+    """Weights to fetch: Bootstrap's defaults plus any the app sets itself."""
+    weights = {400, 500, 700}  # body, headings, bold
+    if words & {'lead', 'fw-light', 'fw-lighter'} or any(w.startswith('display-') for w in words):
+        weights.add(300)
+    for path in _sources(app_folder):
+        if path.endswith(('.html', '.css')):
+            with open(path, encoding='utf-8', errors='ignore') as f:
+                for value in FONT_WEIGHT.findall(f.read()):
+                    weights.add({'normal': 400, 'bold': 700}.get(value) or int(value))
+    return sorted(weights)
+
+
+def class_filter(words, prefixes=()):
+    prefixes = tuple(prefixes)
+    return lambda name: name in words or name.startswith(prefixes) or bool(SAFELIST.match(name))
+
+
+# -------------------- CSS -------------------- #
+
+def _blocks(css):
+    """Split CSS into top-level (prelude, body) pairs.
+
+    Statements without a block (@charset, @import) and /*! license comments
+    come back with body None; other comments are dropped.
+    """
+    blocks, depth, start, i = [], 0, 0, 0
+    prelude = body_start = None
+    while i < len(css):
+        char = css[i]
+        if char in '"\'':
+            i += 1
+            while css[i] != char:
+                i += 2 if css[i] == '\\' else 1
+        elif css.startswith('/*', i):
+            end = css.index('*/', i) + 2
+            if depth == 0:
+                if css.startswith('/*!', i):
+                    blocks.append((css[i:end], None))
+                start = end
+            i = end
+            continue
+        elif char == '{':
+            if depth == 0:
+                prelude, body_start = css[start:i].strip(), i + 1
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[body_start:i]))
+                start = i + 1
+        elif char == ';' and depth == 0:
+            blocks.append((css[start:i + 1].strip(), None))
+            start = i + 1
+        i += 1
+    return blocks
+
+
+def _split_selectors(prelude):
+    """Split a selector list on commas outside parentheses (:not(.a, .b))."""
+    parts, depth, start = [], 0, 0
+    for i, char in enumerate(prelude):
+        depth += char == '('
+        depth -= char == ')'
+        if char == ',' and depth == 0:
+            parts.append(prelude[start:i].strip())
+            start = i + 1
+    parts.append(prelude[start:].strip())
+    return parts
+
+
+def purge_css(css, keep_class):
+    """Drop selectors naming a class keep_class() rejects, and emptied rules."""
+    out = []
+    for prelude, body in _blocks(css):
+        if body is None:
+            out.append(prelude)
+        elif prelude.startswith(('@media', '@supports', '@layer', '@container')):
+            inner = purge_css(body, keep_class)
+            if inner:
+                out.append(f'{prelude}{{{inner}}}')
+        elif prelude.startswith('@'):
+            out.append(f'{prelude}{{{body}}}')  # @font-face, @keyframes
+        else:
+            selectors = [
+                selector for selector in _split_selectors(prelude)
+                # Attribute values like [href$=".pdf"] are not classes
+                if all(keep_class(name) for name in CLASS_SELECTOR.findall(re.sub(r'\[.*?\]', '', selector)))
+            ]
+            if selectors:
+                out.append(f"{','.join(selectors)}{{{body}}}")
+    return minify_css(''.join(out))
+
+
+def minify_css(css):
+    """Whitespace/comment minification; safe for already-minified input."""
+    licenses = re.findall(r'/\*!.*?\*/', css, flags=re.S)
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return '\n'.join(licenses + [css.strip()])
+
+
+# -------------------- PACKAGES -------------------- #
+
+def vendor_fontawesome(fetch, keep_class, words):
+    """Trimmed Font Awesome CSS plus the webfonts it needs: {path: bytes}."""
+    css = purge_css(fetch(FILES['fontawesome.css'].cdn).decode('utf-8'), keep_class)
+    fonts = {name for name, classes in FA_STYLES.items() if classes & words}
+
+    def font_face(match):
+        body = match.group(1)
+        woff2 = re.search(r'webfonts/([\w-]+)\.woff2', body)
+        # Only Font Awesome 6 faces; the v4 compatibility aliases go
+        if 'Font Awesome 6' not in body or not woff2 or woff2.group(1) not in fonts:
+            return ''
+        src = f'src:url(webfonts/{woff2.group(1)}.woff2) format("woff2")'
+        return '@font-face{' + re.sub(r'src:[^;}]+', src, body) + '}'
+
+    css = re.sub(r'@font-face\{([^}]*)\}', font_face, css)
+    codepoints = {int(value, 16) for value in ICON_CODEPOINT.findall(css)}
+    files = {FILES['fontawesome.css'].path: css.encode('utf-8')}
+    for name in sorted(fonts):
+        data = fetch(f'{FONT_AWESOME}/webfonts/{name}.woff2')
+        files[f'{VENDOR_DIR}/webfonts/{name}.woff2'] = subset_font(data, codepoints)
+    return files
+
+
+def subset_font(data, codepoints):
+    """Keep only the given glyphs; returns data unchanged without fontTools."""
+    try:
+        from fontTools import subset
+        from fontTools.ttLib import TTFont
+    except ImportError:
+        return data
+    try:
+        font = TTFont(io.BytesIO(data))
+        options = subset.Options()
+        options.flavor = 'woff2'
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints)
+        subsetter.subset(font)
+        out = io.BytesIO()
+        font.save(out)
+    except ImportError:
+        return data  # woff2 output needs brotli
+    return out.getvalue()
+
+
+def vendor_google_font(fetch, family, weights, path):
+    """Self-hosted Google Fonts CSS for the given weights: {path: bytes}."""
+    url = f"{GOOGLE_FONTS}?family={family.replace(' ', '+')}:wght@{';'.join(map(str, weights))}&display=swap"
+    css = fetch(url).decode('utf-8')
+    slug = family.lower().replace(' ', '-')
+    files, faces, local_names = {}, [], {}
+    for subset_name, body in re.findall(r'/\*\s*([\w-]+)\s*\*/\s*@font-face\s*\{(.*?)\}', css, flags=re.S):
+        if subset_name not in FONT_SUBSETS:
+            continue
+        font_url = re.search(r'url\((https://[^)]+)\)', body).group(1)
+        if font_url not in local_names:
+            # Variable fonts reuse one file for every weight
+            local_names[font_url] = f"fonts/{slug}-{subset_name}-{hashlib.sha256(font_url.encode()).hexdigest()[:8]}.woff2"
+            files[f'{VENDOR_DIR}/{local_names[font_url]}'] = fetch(font_url)
+        faces.append('@font-face{' + body.replace(font_url, local_names[font_url]) + '}')
+    files[path] = minify_css(''.join(faces)).encode('utf-8')
+    return files
+
+
+def vendor_all(app_folder, fetch=fetch):
+    """Download, trim and write every vendored file. Returns {path: size}."""
+    words, prefixes = used_classes(app_folder)
+    keep_class = class_filter(words, prefixes)
+
+    files = {
+        FILES['bootstrap.css'].path: purge_css(fetch(FILES['bootstrap.css'].cdn).decode('utf-8'),
+                                               keep_class).encode('utf-8'),
+    }
+    # Already minified upstream; their internals are not class-addressable
+    for name in ('bootstrap.js', 'chart.js', 'confetti.js'):
+        files[FILES[name].path] = fetch(FILES[name].cdn)
+    files.update(vendor_fontawesome(fetch, keep_class, words))
+    weights = [w for w in used_font_weights(app_folder, words) if w in INTER_WEIGHTS]
+    files.update(vendor_google_font(fetch, 'Inter', weights, FILES['inter.css'].path))
+
+    # Replace the whole directory so files no longer used do not linger
+    static_folder = os.path.join(app_folder, 'static')
+    shutil.rmtree(os.path.join(static_folder, VENDOR_DIR), ignore_errors=True)
+    for path, data in files.items():
+        target = os.path.join(static_folder, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+    sources = {name: entry.cdn for name, entry in FILES.items()}
+    with open(os.path.join(static_folder, VENDOR_DIR, SOURCES), 'w') as f:
+        json.dump(sources, f, indent=2, sort_keys=True)
+    return {path: len(data) for path, data in files.items()}
+
+
+def available(static_folder):
+    """Names in FILES that have a self-hosted copy."""
+    return {name for name, entry in FILES.items()
+            if os.path.exists(os.path.join(static_folder, entry.path))}
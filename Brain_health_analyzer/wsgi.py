@@ -0,0 +1,16 @@
+"""
+WSGI entry point for production servers.
+
+Run from the repository root (upload paths are relative to it):
+
+    gunicorn -c Brain_health_analyzer/gunicorn.conf.py
+
+gunicorn.conf.py imports this module once in the master process
+(preload_app), so the model, compiled templates and built assets are
+loaded before the workers fork and shared with them copy-on-write. Other
+WSGI servers can point at wsgi:application directly.
+"""
+
+from app import create_app
+
+application = create_app()